@@ -0,0 +1,302 @@
+# Retrieval benchmark over synthetic, scaled-up corpora.
+#
+#   python bench_retrieval.py --sizes 10000 100000 1000000 --index-types flat ivf hnsw
+#   python bench_retrieval.py --compare
+#
+# The real chunks (text + vectors of the live snapshot) seed a synthetic corpus
+# of any size: each synthetic vector mixes two real ones plus noise, and each
+# synthetic text is a rotated window of a real chunk. Indexes are built with
+# the same build_ann_index / write_store code as create_index.py. Every
+# (size, index) run appends one JSON line to outputs/bench_retrieval.jsonl,
+# tagged with the git commit, so results can be compared across commits.
+#
+# Memory: the float32 vectors alone take n * 384 * 4 bytes (~7.7 GB at 5M),
+# plus the index built from them; large sizes need a large machine.
+
+import os
+import sys
+import gc
+import json
+import time
+import platform
+import argparse
+import subprocess
+import tempfile
+import numpy as np
+import faiss
+
+from index_factory import INDEX_TYPES, COMPRESSION_MODES, build_ann_index
+from chunk_store import ChunkStore, write_store, load_chunks
+from embeddings_io import load_embeddings
+from snapshots import OUTPUT_DIR, INDEX_FILE, META_FILE, STORE_FILE, EMBEDDINGS_FILE, snapshot_path
+
+BENCH_FILE = os.path.join(OUTPUT_DIR, "bench_retrieval.jsonl")
+BENCH_SIZES = (10_000, 100_000, 1_000_000)
+BENCH_QUERIES = 200
+BENCH_K = 5
+SYNTH_NOISE = 0.02       # per-dimension gaussian noise on synthetic vectors
+SYNTH_BLOCK = 100_000    # vectors generated per block
+TEXT_WORDS = 190         # words per synthetic chunk text (~CHUNK_TOKENS word-pieces, token_chunker.py)
+
+
+# -- ENVIRONMENT --
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def rss_bytes():
+    """Current resident set size of this process."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss_bytes():
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # KB on Linux
+    except ImportError:
+        return None
+
+
+# -- SEED CORPUS --
+def load_seed(output_dir=OUTPUT_DIR):
+    """Real chunk vectors + metadata from the live snapshot."""
+    path = snapshot_path(output_dir)
+    chunks = list(load_chunks(os.path.join(path, STORE_FILE), os.path.join(path, META_FILE)))
+
+    emb_path = os.path.join(path, EMBEDDINGS_FILE)
+    if os.path.exists(emb_path):
+        vectors, _ = load_embeddings(emb_path)
+    else:
+        # Older builds kept no embeddings file; a flat index stores the vectors exactly
+        index = faiss.read_index(os.path.join(path, INDEX_FILE))
+        try:
+            vectors = index.reconstruct_n(0, index.ntotal)
+        except RuntimeError:
+            sys.exit("The live index cannot return its vectors; rebuild with create_index.py first.")
+
+    return np.ascontiguousarray(vectors, dtype="float32"), chunks
+
+
+# -- SYNTHETIC CORPUS --
+def synth_vectors(seed_vectors, n, seed=0, noise=SYNTH_NOISE):
+    """n unit vectors, each a random mix of two seed vectors plus gaussian noise."""
+    rng = np.random.default_rng(seed)
+    base = seed_vectors / np.linalg.norm(seed_vectors, axis=1, keepdims=True)
+    out = np.empty((n, base.shape[1]), dtype="float32")
+
+    for start in range(0, n, SYNTH_BLOCK):
+        m = min(SYNTH_BLOCK, n - start)
+        a = rng.integers(0, len(base), m)
+        b = rng.integers(0, len(base), m)
+        w = rng.random((m, 1), dtype="float32")
+        block = w * base[a] + (1 - w) * base[b]
+        block += rng.normal(0, noise, block.shape).astype("float32")
+        block /= np.linalg.norm(block, axis=1, keepdims=True)
+        out[start:start + m] = block
+
+    return out
+
+
+def synth_chunks(seed_chunks, n, words=TEXT_WORDS):
+    """Yield n chunk dicts whose text is a rotated window of a real chunk."""
+    split = [(c["pdf_name"], c["text"].split()) for c in seed_chunks]
+    for i in range(n):
+        pdf_name, tokens = split[i % len(split)]
+        shift = (i // len(split)) % max(len(tokens), 1)
+        window = (tokens[shift:] + tokens[:shift])[:words]
+        yield {"pdf_name": pdf_name, "chunk_id": i, "text": " ".join(window)}
+
+
+# -- MEASUREMENTS --
+def percentiles(values, scale=1.0):
+    arr = np.asarray(values) * scale
+    return {f"p{p}": round(float(np.percentile(arr, p)), 4) for p in (50, 95, 99)}
+
+
+def time_queries(index, queries, k):
+    latencies = []
+    for q in queries:
+        start = time.perf_counter()
+        index.search(q[None, :], k)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    _, ids = index.search(queries, k)   # one batched search, as retrieve_many does
+    batch_s = time.perf_counter() - start
+    return ids, latencies, batch_s
+
+
+def recall_at_k(truth, found):
+    k = truth.shape[1]
+    return float(np.mean([len(set(t) & set(f)) / k for t, f in zip(truth, found)]))
+
+
+def time_lookups(store, ids):
+    latencies = []
+    for row in ids:
+        start = time.perf_counter()
+        [store[i] for i in row if i != -1]
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def embed_throughput(texts):
+    """Chunks/sec of the real embedding model over synthetic texts."""
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer("all-MiniLM-L6-v2")
+    model.encode(texts[:8])   # warm-up
+    start = time.perf_counter()
+    model.encode(texts, batch_size=64)
+    return len(texts) / (time.perf_counter() - start)
+
+
+# -- RUN --
+def bench_size(seed_vectors, seed_chunks, n, index_types, compression, k, n_queries, work_dir, options):
+    common = {"commit": git_commit(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "host": platform.node(), "cpus": os.cpu_count(), "faiss": faiss.__version__,
+              "n_chunks": n, "dim": int(seed_vectors.shape[1]), "k": k, "queries": n_queries}
+
+    start = time.perf_counter()
+    vectors = synth_vectors(seed_vectors, n, seed=n)
+    queries = synth_vectors(seed_vectors, n_queries, seed=n + 1)
+    synth_s = time.perf_counter() - start
+
+    store_path = os.path.join(work_dir, f"bench_{n}.store")
+    start = time.perf_counter()
+    write_store(store_path, synth_chunks(seed_chunks, n))
+    store_s = time.perf_counter() - start
+    store = ChunkStore(store_path)
+
+    # Exact ground truth for recall@k, from the same flat builder
+    exact, _ = build_ann_index(vectors, "flat")
+    truth, _, _ = time_queries(exact, queries, k)
+    del exact
+
+    rows = []
+    for kind in index_types:
+        gc.collect()
+        rss_before = rss_bytes()
+
+        start = time.perf_counter()
+        index, config = build_ann_index(vectors, kind, compression=compression, **options)
+        build_s = time.perf_counter() - start
+
+        ids, latencies, batch_s = time_queries(index, queries, k)
+        lookups = time_lookups(store, ids)
+        rss_after = rss_bytes()
+
+        row = dict(common)
+        row.update({
+            "index": {"type": kind, "factory": config["factory"], "compression": compression,
+                      "search_params": config["search_params"]},
+            "synth_s": round(synth_s, 3),
+            "build_s": round(build_s, 3),
+            "index_bytes": int(faiss.serialize_index(index).nbytes),
+            "rss_bytes": rss_after,
+            "rss_delta_bytes": rss_after - rss_before if rss_after and rss_before else None,
+            "peak_rss_bytes": peak_rss_bytes(),
+            "search_ms": percentiles(latencies, 1000),
+            "batch_qps": round(n_queries / batch_s, 1) if batch_s else None,
+            "recall_at_k": recall_at_k(truth, ids),
+            "lookup_us": percentiles(lookups, 1e6),
+            "store_bytes": os.path.getsize(store_path),
+            "store_write_s": round(store_s, 3),
+        })
+        rows.append(row)
+        print(f"{n:>9} {config['factory']:<22} build {build_s:8.2f}s  "
+              f"p50 {row['search_ms']['p50']:8.3f}ms  p99 {row['search_ms']['p99']:8.3f}ms  "
+              f"recall@{k} {row['recall_at_k']:.3f}  lookup p50 {row['lookup_us']['p50']:.1f}us")
+        del index
+
+    store.close()
+    os.remove(store_path)
+    return rows
+
+
+def compare(path=BENCH_FILE):
+    """Print the two most recent commits side by side for matching (size, index) runs."""
+    with open(path, "r", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+
+    commits = []
+    for r in rows:
+        if r["commit"] not in commits:
+            commits.append(r["commit"])
+    if len(commits) < 2:
+        print("Need results from at least two commits to compare.")
+        return
+
+    old, new = commits[-2], commits[-1]
+    latest = {}
+    for r in rows:
+        latest[(r["commit"], r["n_chunks"], r["index"]["factory"])] = r
+
+    print(f"{'n':>9} {'index':<22} {'p50 ms ' + old:>18} {'p50 ms ' + new:>18} {'recall':>14}")
+    for (commit, n, factory), r in sorted(latest.items(), key=lambda x: (x[0][1], x[0][2])):
+        if commit != new or (old, n, factory) not in latest:
+            continue
+        o = latest[(old, n, factory)]
+        print(f"{n:>9} {factory:<22} {o['search_ms']['p50']:>18.3f} {r['search_ms']['p50']:>18.3f} "
+              f"{o['recall_at_k']:>6.3f}->{r['recall_at_k']:.3f}")
+
+
+# MAIN EXECUTION
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark retrieval on synthetic corpora of growing size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(BENCH_SIZES),
+                        help="corpus sizes in chunks (e.g. 10000 100000 1000000 5000000)")
+    parser.add_argument("--index-types", nargs="+", choices=INDEX_TYPES, default=list(INDEX_TYPES))
+    parser.add_argument("--compression", choices=COMPRESSION_MODES, default="none")
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, default=None)
+    parser.add_argument("--ef-search", type=int, default=None)
+    parser.add_argument("--k", type=int, default=BENCH_K)
+    parser.add_argument("--queries", type=int, default=BENCH_QUERIES)
+    parser.add_argument("--embed-sample", type=int, default=0,
+                        help="also time the embedding model on this many synthetic chunks")
+    parser.add_argument("--output", default=BENCH_FILE, help="JSONL file results are appended to")
+    parser.add_argument("--work-dir", default=None, help="where temporary chunk stores are written")
+    parser.add_argument("--compare", action="store_true", help="compare the last two commits in --output")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(args.output)
+        sys.exit()
+
+    options = {key: value for key, value in
+               {"nlist": args.nlist, "nprobe": args.nprobe, "ef_search": args.ef_search}.items()
+               if value is not None}
+
+    seed_vectors, seed_chunks = load_seed()
+    print(f"Seed corpus: {len(seed_chunks)} real chunks, dim {seed_vectors.shape[1]}")
+
+    embed_rate = None
+    if args.embed_sample:
+        texts = [c["text"] for c in synth_chunks(seed_chunks, args.embed_sample)]
+        embed_rate = embed_throughput(texts)
+        print(f"Embedding: {embed_rate:.1f} chunks/sec "
+              f"(~{max(args.sizes) / embed_rate / 3600:.1f} h to embed {max(args.sizes):,} chunks)")
+
+    with tempfile.TemporaryDirectory(dir=args.work_dir) as work_dir:
+        for n in sorted(args.sizes):
+            rows = bench_size(seed_vectors, seed_chunks, n, args.index_types, args.compression,
+                              args.k, args.queries, work_dir, options)
+            with open(args.output, "a", encoding="utf-8") as f:
+                for row in rows:
+                    row["embed_chunks_per_sec"] = embed_rate
+                    f.write(json.dumps(row) + "\n")
+
+    print(f"\nResults appended to {args.output}")
@@ -0,0 +1,183 @@
+import os
+import re
+import mmap
+import json
+import struct
+import numpy as np
+
+# Layout of a BM25 inverted index file:
+#   header   : MAGIC + doc count, term count, posting count, vocab bytes, avgdl, k1, b
+#   vocab    : utf-8 JSON {term: [first posting, document frequency]}, padded to 4 bytes
+#   doc_lens : uint32 token count per document
+#   doc_ids  : uint32 posting lists, one run per term, sorted by doc id
+#   tfs      : uint16 term frequency for each posting
+# Document ids are row positions, i.e. the same ids the FAISS index returns.
+MAGIC = b"SVBM25v1"
+HEADER = struct.Struct("<8sIIQQfff")
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Hybrid retrieval: dense + lexical candidates, scores min-max normalized and mixed
+HYBRID_ALPHA = 0.6        # weight of the dense score (1 - alpha for BM25)
+HYBRID_CANDIDATES = 4     # candidates per side = k * HYBRID_CANDIDATES
+
+# Currency signs, grouped numbers ("30,000" -> "30000") and alphanumeric words
+TOKEN_RE = re.compile(r"[€$£]|\d+(?:[.,]\d+)+|[^\W_]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have if in into is it its of on or that the their "
+    "this to was were will with you your".split()
+)
+
+
+# -- TOKENIZER --
+def tokenize(text):
+    """Lower-cased terms, plus "word number" pairs so "Stamp 4" or "Guide 5256" match as a unit."""
+    terms = []
+    prev = None
+    for tok in TOKEN_RE.findall(text.lower()):
+        if tok[0].isdigit():
+            tok = tok.replace(",", "")
+            if prev and prev.isalpha():
+                terms.append(f"{prev} {tok}")
+        elif tok in STOPWORDS:
+            prev = None
+            continue
+        terms.append(tok)
+        prev = tok
+    return terms
+
+
+# -- WRITER --
+def write_bm25(path, texts, k1=BM25_K1, b=BM25_B):
+    """Build the inverted index over `texts` (in index order) and write it to `path`."""
+    postings = {}
+    doc_lens = []
+
+    for doc_id, text in enumerate(texts):
+        terms = tokenize(text)
+        doc_lens.append(len(terms))
+        counts = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append((doc_id, min(tf, 0xFFFF)))
+
+    vocab = {}
+    doc_ids, tfs = [], []
+    for term in sorted(postings):
+        plist = postings[term]
+        vocab[term] = [len(doc_ids), len(plist)]
+        doc_ids.extend(d for d, _ in plist)
+        tfs.extend(t for _, t in plist)
+
+    vocab_bytes = json.dumps(vocab, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    vocab_bytes += b" " * (-len(vocab_bytes) % 4)
+    avgdl = float(np.mean(doc_lens)) if doc_lens else 0.0
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(doc_lens), len(vocab), len(doc_ids), len(vocab_bytes), avgdl, k1, b))
+        f.write(vocab_bytes)
+        f.write(np.asarray(doc_lens, dtype="<u4").tobytes())
+        f.write(np.asarray(doc_ids, dtype="<u4").tobytes())
+        f.write(np.asarray(tfs, dtype="<u2").tobytes())
+    os.replace(tmp, path)
+
+
+# -- READER --
+class BM25Index:
+    """Read-only, memory-mapped BM25 index; only the vocabulary is loaded into memory."""
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, n_docs, n_terms, n_postings, vocab_len, avgdl, k1, b = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a BM25 index")
+
+        self.n_docs = n_docs
+        self.avgdl = avgdl or 1.0
+        self.k1 = k1
+        self.b = b
+
+        offset = HEADER.size
+        self.vocab = json.loads(self._mm[offset:offset + vocab_len].decode("utf-8"))
+        offset += vocab_len
+        self.doc_lens = np.frombuffer(self._mm, dtype="<u4", count=n_docs, offset=offset)
+        offset += 4 * n_docs
+        self._doc_ids = np.frombuffer(self._mm, dtype="<u4", count=n_postings, offset=offset)
+        offset += 4 * n_postings
+        self._tfs = np.frombuffer(self._mm, dtype="<u2", count=n_postings, offset=offset)
+
+        # Length normalization is per document, so compute it once
+        self._norm = (self.k1 * (1 - self.b + self.b * self.doc_lens / self.avgdl)).astype("float32")
+
+    def __len__(self):
+        return self.n_docs
+
+    def scores(self, query):
+        """BM25 score of every document for `query` (zeros where no term matches)."""
+        scores = np.zeros(self.n_docs, dtype="float32")
+        for term in set(tokenize(query)):
+            entry = self.vocab.get(term)
+            if entry is None:
+                continue
+            start, df = entry
+            ids = self._doc_ids[start:start + df]
+            tf = self._tfs[start:start + df].astype("float32")
+            idf = np.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+            scores[ids] += idf * tf * (self.k1 + 1) / (tf + self._norm[ids])
+        return scores
+
+    def search(self, query, k=5):
+        """Top-k (doc ids, scores) with a non-zero score, best first."""
+        scores = self.scores(query)
+        k = min(k, self.n_docs)
+        if k <= 0:
+            return np.empty(0, dtype="int64"), np.empty(0, dtype="float32")
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        top = top[scores[top] > 0]
+        return top, scores[top]
+
+    def close(self):
+        # Drop the numpy views first, or the mmap refuses to close
+        self.doc_lens = self._doc_ids = self._tfs = self._norm = None
+        self._mm.close()
+        self._file.close()
+
+
+# -- HYBRID FUSION --
+def hybrid_rank(dense_dists, dense_ids, lexical_scores, k=5, alpha=HYBRID_ALPHA,
+                n_candidates=None):
+    """Fuse one query's FAISS hits (L2 distances) with its BM25 scores; returns top-k ids.
+
+    Candidates are the dense hits plus the best BM25 documents. Both scores are
+    min-max normalized to [0, 1] over the candidates and mixed as alpha * dense + (1 - alpha) * bm25;
+    a candidate missing from one side gets 0 for that side.
+    """
+    n_candidates = n_candidates or k * HYBRID_CANDIDATES
+
+    dense = {int(i): -float(d) for d, i in zip(dense_dists, dense_ids) if i != -1}
+    if dense:
+        lo, hi = min(dense.values()), max(dense.values())
+        dense = {i: (s - lo) / (hi - lo) if hi > lo else 1.0 for i, s in dense.items()}
+
+    candidates = set(dense)
+    lexical = {}
+    if len(lexical_scores):
+        m = min(n_candidates, len(lexical_scores))
+        lex_ids = np.argpartition(-lexical_scores, m - 1)[:m]
+        candidates.update(int(i) for i in lex_ids if lexical_scores[i] > 0)
+        # Normalized over the same candidate set as the dense side
+        lexical = {i: float(lexical_scores[i]) for i in candidates if i < len(lexical_scores)}
+        lo, hi = min(lexical.values(), default=0.0), max(lexical.values(), default=0.0)
+        lexical = {i: (s - lo) / (hi - lo) if hi > lo else float(s > 0) for i, s in lexical.items()}
+
+    def fused(i):
+        return alpha * dense.get(i, 0.0) + (1 - alpha) * lexical.get(i, 0.0)
+
+    return sorted(candidates, key=fused, reverse=True)[:k]
@@ -0,0 +1,103 @@
+import os
+import json
+import mmap
+import shutil
+import struct
+
+# Layout of a chunk store file:
+#   header : MAGIC (8 bytes) + chunk count (uint64)
+#   table  : one fixed-width record per chunk -> blob offset, name length, text length, chunk_id
+#   blob   : utf-8 pdf_name immediately followed by utf-8 text, for every chunk
+# Only the table is read on lookup; the blob is decoded lazily, one chunk at a time.
+MAGIC = b"SVCHUNK1"
+HEADER = struct.Struct("<8sQ")
+RECORD = struct.Struct("<QIIQ")
+
+OUTPUT_STORE = "outputs/visa_chunks.store"
+
+
+# -- WRITER --
+def write_store(path, metadata):
+    """Write {"pdf_name", "chunk_id", "text"} dicts (any iterable) as a chunk store.
+
+    Texts are streamed to a side file while the fixed-size record table is
+    collected, so memory stays small for very large corpora.
+    """
+    records = bytearray()
+    count = 0
+    offset = 0
+
+    blob_tmp = path + ".blob.tmp"
+    with open(blob_tmp, "wb") as blob:
+        for item in metadata:
+            name = item["pdf_name"].encode("utf-8")
+            text = item["text"].encode("utf-8")
+            records += RECORD.pack(offset, len(name), len(text), item["chunk_id"])
+            blob.write(name)
+            blob.write(text)
+            offset += len(name) + len(text)
+            count += 1
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f, open(blob_tmp, "rb") as blob:
+        f.write(HEADER.pack(MAGIC, count))
+        f.write(records)
+        shutil.copyfileobj(blob, f, 1 << 20)
+    os.remove(blob_tmp)
+    os.replace(tmp, path)
+
+
+# -- READER --
+class ChunkStore:
+    """Read-only, memory-mapped view of a chunk store.
+
+    Behaves like the old metadata list: len(store), store[i] and iteration all work,
+    and store[i] returns the same {"pdf_name", "chunk_id", "text"} dict.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a chunk store")
+
+        self._count = count
+        self._table = HEADER.size
+        self._blob = HEADER.size + count * RECORD.size
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        i = int(i)
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("chunk index out of range")
+
+        offset, name_len, text_len, chunk_id = RECORD.unpack_from(self._mm, self._table + i * RECORD.size)
+        start = self._blob + offset
+        name = self._mm[start:start + name_len].decode("utf-8")
+        text = self._mm[start + name_len:start + name_len + text_len].decode("utf-8")
+
+        return {"pdf_name": name, "chunk_id": chunk_id, "text": text}
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self[i]
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+
+def load_chunks(store_path, json_path):
+    """Open the chunk store if it exists, otherwise fall back to the metadata JSON."""
+    if os.path.exists(store_path):
+        return ChunkStore(store_path)
+
+    with open(json_path, "r", encoding="utf-8") as f:
+        return json.load(f)
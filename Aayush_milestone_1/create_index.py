@@ -1,34 +1,46 @@
 import os
 import json
-import faiss
+import time
+import argparse
 import numpy as np
 from sentence_transformers import SentenceTransformer
-import PyPDF2
+from pdf_extract import EXTRACTOR_VERSION, extract_pages, extract_text, join_pages
+from text_cache import file_hash
+from chunk_store import write_store
+from bm25_index import write_bm25
+from partitions import write_partitions
+from token_chunker import (TokenChunker, TOKEN_CHUNKER_VERSION, CHUNK_TOKENS, HEADING_MAX_WORDS,
+                           special_tokens, truncation_report, print_truncation_report)
+from embeddings_io import save_embeddings
+from index_factory import (INDEX_TYPES, COMPRESSION_MODES, IVF_NPROBE, HNSW_M, HNSW_EF_SEARCH,
+                           build_ann_index, evaluate_index, print_report, save_index,
+                           compare_compression)
+from snapshots import (OUTPUT_DIR, INDEX_FILE, META_FILE, STORE_FILE, BM25_FILE, EMBEDDINGS_FILE, MANIFEST_FILE,
+                       begin_snapshot, publish_snapshot, mirror_legacy, snapshot_path)
 
 # FOLDERS
+# Each build is published as outputs/snapshots/<generation>/ (see snapshots.py)
+# and mirrored to the flat outputs/ paths for older readers.
 PDF_FOLDER = "pdfs"
-OUTPUT_INDEX = "outputs/visa_index.faiss"
-OUTPUT_META = "outputs/visa_metadata.json"
 
 # MODEL + CHUNK SETTINGS
 EMBED_MODEL = "all-MiniLM-L6-v2"
-CHUNK_SIZE = 300
-OVERLAP = 50
+CHUNKER = "tokens"      # "tokens" = sentence-aware, sized to the model window (token_chunker.py)
+CHUNK_SIZE = 300        # "words" chunker: words per chunk...
+OVERLAP = 50            # ...and words shared with the previous chunk
+EMBED_BATCH_SIZE = 64
+EMBED_WORKERS = 0
+EXTRACT_WORKERS = None  # None = one process per CPU
 
 
 # -- READ PDF --
 def read_pdf(path):
-    text = ""
-    reader = PyPDF2.PdfReader(path)
-    for page in reader.pages:
-        content = page.extract_text()
-        if content:
-            text += " " + content
-    return text.strip()
+    return extract_text(path, sep=" ")
 
 
 # -- CHUNKING LOGIC --
 def chunk_text(text, size=CHUNK_SIZE, overlap=OVERLAP):
+    # Word windows; MiniLM only reads the first ~256 word-pieces of each one
     words = text.split()
     chunks = []
     start = 0
@@ -41,33 +53,171 @@ def chunk_text(text, size=CHUNK_SIZE, overlap=OVERLAP):
     return chunks
 
 
+def build_settings(chunker=CHUNKER, token_chunker=None):
+    # Anything that changes the chunks or vectors of a PDF must be listed here,
+    # otherwise an incremental build would reuse stale embeddings.
+    if chunker == "tokens":
+        token_chunker = token_chunker or TokenChunker()
+        return {
+            "embed_model": EMBED_MODEL,
+            "extractor": EXTRACTOR_VERSION,
+            "chunker": "tokens",
+            "chunker_version": TOKEN_CHUNKER_VERSION,
+            # Effective values: max_tokens is capped by the model window, overlap by max_tokens
+            "chunk_tokens": token_chunker.max_tokens,
+            "overlap_tokens": token_chunker.overlap_tokens,
+            "min_chunk_tokens": token_chunker.min_tokens,
+            "heading_max_words": HEADING_MAX_WORDS,
+        }
+    return {
+        "embed_model": EMBED_MODEL,
+        "extractor": EXTRACTOR_VERSION,
+        "chunk_size": CHUNK_SIZE,
+        "overlap": OVERLAP,
+    }
+
+
+# -- PREVIOUS BUILD (for incremental mode) --
+def load_previous_build():
+    """Return {pdf_name: (manifest_entry, chunks, vectors)} from the live snapshot."""
+    base = snapshot_path(OUTPUT_DIR)
+    manifest_path, meta_path, emb_path = (os.path.join(base, name)
+                                          for name in (MANIFEST_FILE, META_FILE, EMBEDDINGS_FILE))
+    if not all(os.path.exists(p) for p in (manifest_path, meta_path, emb_path)):
+        return {}
+
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    with open(meta_path, "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+    vectors = np.load(emb_path, mmap_mode="r")
+
+    if len(metadata) != len(vectors):
+        print("Stored embeddings do not match metadata, ignoring previous build.")
+        return {}
+
+    rows = {}
+    for row, item in enumerate(metadata):
+        rows.setdefault(item["pdf_name"], []).append(row)
+
+    previous = {}
+    for pdf_name, entry in manifest.get("documents", {}).items():
+        doc_rows = rows.get(pdf_name, [])
+        if len(doc_rows) != entry["chunks"]:
+            continue
+        chunks = [metadata[r]["text"] for r in doc_rows]
+        previous[pdf_name] = (entry, chunks, vectors[doc_rows])
+
+    return previous
+
+
+# -- BATCHED EMBEDDING --
+def embed_chunks(embedder, chunks, batch_size=EMBED_BATCH_SIZE, workers=EMBED_WORKERS):
+    """Encode all chunks in batches, optionally spread over CPU worker processes."""
+    if not chunks:
+        return np.zeros((0, embedder.get_sentence_embedding_dimension()), dtype="float32")
+
+    start = time.perf_counter()
+
+    if workers and workers > 1:
+        pool = embedder.start_multi_process_pool(target_devices=["cpu"] * workers)
+        try:
+            vectors = embedder.encode_multi_process(chunks, pool, batch_size=batch_size)
+        finally:
+            embedder.stop_multi_process_pool(pool)
+    else:
+        vectors = embedder.encode(chunks, batch_size=batch_size, convert_to_numpy=True)
+
+    elapsed = time.perf_counter() - start
+    rate = len(chunks) / elapsed if elapsed > 0 else float("inf")
+    print(f"Embedded {len(chunks)} chunks in {elapsed:.2f}s ({rate:.1f} chunks/sec, "
+          f"batch size {batch_size}, workers {max(workers, 1)})")
+
+    return np.asarray(vectors, dtype="float32")
+
+
 # ------------ MAIN INDEX BUILDER ----------------
-def build_index():
+def build_index(incremental=False, batch_size=EMBED_BATCH_SIZE, workers=EMBED_WORKERS,
+                extract_workers=EXTRACT_WORKERS, index_type="flat", index_options=None,
+                compare_modes=False, chunker=CHUNKER):
     print("Loading embedding model...")
     embedder = SentenceTransformer(EMBED_MODEL)
 
-    metadata = []
-    vectors = []
+    # Chunks must fit the model's input window (special tokens included) or their tail is never embedded
+    window = embedder.max_seq_length
+    token_chunker = TokenChunker(embedder.tokenizer,
+                                 max_tokens=min(CHUNK_TOKENS, window - special_tokens(embedder.tokenizer)))
 
-    chunk_id = 0
+    settings = build_settings(chunker, token_chunker)
+    previous = load_previous_build() if incremental else {}
+
+    # (file, digest, chunks, vectors) - vectors is None until embedded
+    docs = []
+    changed = {}
+    reused = 0
 
     print("Processing PDFs from:", PDF_FOLDER)
 
-    for file in os.listdir(PDF_FOLDER):
+    for file in sorted(os.listdir(PDF_FOLDER)):
         if not file.endswith(".pdf"):
             continue
 
         pdf_path = os.path.join(PDF_FOLDER, file)
-        print(f"\nReading: {file}")
+        digest = file_hash(pdf_path)
 
-        text = read_pdf(pdf_path)
-        chunks = chunk_text(text)
+        old = previous.get(file)
+        if old and old[0]["sha256"] == digest and old[0]["settings"] == settings:
+            # Unchanged PDF: reuse the stored chunks and embeddings as they are
+            _, chunks, doc_vectors = old
+            print(f"Unchanged: {file} ({len(chunks)} chunks reused)")
+            reused += len(chunks)
+            docs.append((file, digest, chunks, doc_vectors))
+        else:
+            changed[pdf_path] = digest
+            docs.append((file, digest, None, None))
 
-        print(f"Total chunks created: {len(chunks)}")
+    # Extract all new/changed PDFs page by page in a process pool
+    # (pages already in the shared text cache are not parsed again)
+    print(f"\nExtracting text from {len(changed)} PDFs...")
+    pages = extract_pages(list(changed), workers=extract_workers, digests=changed)
+
+    pending = []
+    for i, (file, digest, chunks, doc_vectors) in enumerate(docs):
+        if chunks is not None:
+            continue
 
-        for chunk in chunks:
-            # Generate embedding
-            vec = embedder.encode([chunk])[0].astype("float32")
+        # Keep the extractor's line breaks: the token chunker finds headings and paragraphs by line
+        text = join_pages(pages[os.path.join(PDF_FOLDER, file)], sep="\n")
+        chunks = token_chunker.chunk(text) if chunker == "tokens" else chunk_text(text)
+        pending.extend(chunks)
+        docs[i] = (file, digest, chunks, None)
+
+        print(f"Read: {file} -> {len(chunks)} chunks")
+
+    if pending:
+        print_truncation_report(truncation_report(pending, embedder.tokenizer, window))
+        if chunker == "tokens":
+            stats = token_chunker.stats
+            print(f"Sections: {stats['headings']} headings, {stats['sentences']} sentences, "
+                  f"{stats['long_sentences_split']} over-long sentences split between words")
+
+    # Embed every new chunk from every PDF in one batched pass
+    print(f"\nEmbedding {len(pending)} new chunks...")
+    new_vectors = embed_chunks(embedder, pending, batch_size=batch_size, workers=workers)
+
+    metadata = []
+    vectors = []
+    documents = {}
+
+    chunk_id = 0
+    offset = 0
+
+    for file, digest, chunks, doc_vectors in docs:
+        if doc_vectors is None:
+            doc_vectors = new_vectors[offset:offset + len(chunks)]
+            offset += len(chunks)
+
+        for chunk, vec in zip(chunks, doc_vectors):
             vectors.append(vec)
 
             # Save metadata
@@ -79,27 +229,115 @@ def build_index():
 
             chunk_id += 1
 
+        documents[file] = {
+            "sha256": digest,
+            "settings": settings,
+            "chunks": len(chunks)
+        }
+
     # Convert vectors to array
     vectors = np.array(vectors).astype("float32")
 
     # Build FAISS index
     print("\nBuilding FAISS index...")
-    index = faiss.IndexFlatL2(vectors.shape[1])
-    index.add(vectors)
+    index_options = index_options or {}
+    index, index_config = build_ann_index(vectors, index_type, **index_options)
 
-    # Save index
-    os.makedirs("outputs", exist_ok=True)
-    faiss.write_index(index, OUTPUT_INDEX)
+    # Recall@k against exact search + per-query latency for the chosen settings
+    report = evaluate_index(index, vectors)
+    print_report(index_config, report)
+    index_config["evaluation"] = report
 
-    # Save metadata
-    with open(OUTPUT_META, "w", encoding="utf-8") as f:
+    if compare_modes:
+        print("\nRecall loss of every compression mode vs float32:")
+        compare_compression(vectors, index_type, **dict(index_options))
+
+    # Write every file into a staging snapshot, then publish it in one atomic step
+    # so readers never see a new index with old metadata (or a half-written file)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    generation, staging = begin_snapshot(OUTPUT_DIR)
+
+    # Index (its type and search settings go to a config file next to it)
+    save_index(index, index_config, os.path.join(staging, INDEX_FILE))
+
+    # Metadata
+    with open(os.path.join(staging, META_FILE), "w", encoding="utf-8") as f:
         json.dump(metadata, f, indent=2)
 
+    # Compact memory-mapped copy of the metadata for the query side
+    write_store(os.path.join(staging, STORE_FILE), metadata)
+
+    # BM25 inverted index over the same chunks, for hybrid (lexical + dense) retrieval
+    write_bm25(os.path.join(staging, BM25_FILE), (m["text"] for m in metadata))
+
+    # Per-country sub-indexes (keyed off pdf_name) so routed queries search only their destination
+    partitions = write_partitions(staging, vectors, metadata, index_type, **index_options)
+    print("Partitions:", ", ".join(f"{k} ({p['chunks']})" for k, p in partitions.items()))
+
+    # Raw embeddings + manifest so the next incremental build can reuse them
+    # (.npy + .ids.jsonl sidecar, the same binary format faiss_store.py reads)
+    save_embeddings(os.path.join(staging, EMBEDDINGS_FILE), vectors, metadata)
+    with open(os.path.join(staging, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "generation": generation,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "index": {"type": index_config["type"], "factory": index_config["factory"]},
+            "documents": documents
+        }, f, indent=2)
+
+    snapshot = publish_snapshot(staging, generation, OUTPUT_DIR)
+    mirror_legacy(snapshot, OUTPUT_DIR)
+
     print("\nIndex + Metadata successfully created.")
     print("Total chunks:", len(metadata))
-    print("Index saved to:", OUTPUT_INDEX)
-    print("Metadata saved to:", OUTPUT_META)
+    if incremental:
+        print("Chunks reused from previous build:", reused)
+    print("Generation:", generation)
+    print("Snapshot published to:", snapshot)
 
 
 if __name__ == "__main__":
-    build_index()
+    parser = argparse.ArgumentParser(description="Build the FAISS visa index from the PDFs folder.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only re-extract and re-embed PDFs that changed since the last build")
+    parser.add_argument("--chunker", choices=("tokens", "words"), default=CHUNKER,
+                        help="tokens = sentence-aware chunks sized to the model window, "
+                             "words = fixed windows of --chunk-size words")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE,
+                        help="number of chunks encoded per forward pass")
+    parser.add_argument("--workers", type=int, default=EMBED_WORKERS,
+                        help="CPU worker processes for embedding (0 or 1 = in-process)")
+    parser.add_argument("--extract-workers", type=int, default=EXTRACT_WORKERS,
+                        help="processes used for PDF text extraction (default: one per CPU)")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default="flat",
+                        help="flat = exact search, ivf = IVF-Flat, hnsw = HNSW graph")
+    parser.add_argument("--nlist", type=int, default=None,
+                        help="IVF: number of inverted lists (default ~4*sqrt(chunks))")
+    parser.add_argument("--nprobe", type=int, default=IVF_NPROBE,
+                        help="IVF: lists visited per query")
+    parser.add_argument("--hnsw-m", type=int, default=HNSW_M,
+                        help="HNSW: neighbours per graph node")
+    parser.add_argument("--ef-search", type=int, default=HNSW_EF_SEARCH,
+                        help="HNSW: candidate list size per query")
+    parser.add_argument("--compression", choices=COMPRESSION_MODES, default="none",
+                        help="vector storage: float32, fp16/int8 scalar quantization or PQ")
+    parser.add_argument("--pq-m", type=int, default=None,
+                        help="PQ: number of sub-quantizers (default dim/8)")
+    parser.add_argument("--pca-dim", type=int, default=None,
+                        help="reduce vectors to this dimension with PCA before indexing")
+    parser.add_argument("--compare-compression", action="store_true",
+                        help="also report recall loss and size for every compression mode")
+    args = parser.parse_args()
+    if args.pca_dim is not None and args.pca_dim <= 0:
+        parser.error("--pca-dim must be a positive number of dimensions")
+
+    index_options = {"compression": args.compression, "pq_m": args.pq_m, "pca_dim": args.pca_dim}
+    if args.index_type == "ivf":
+        index_options.update(nlist=args.nlist, nprobe=args.nprobe)
+    elif args.index_type == "hnsw":
+        index_options.update(hnsw_m=args.hnsw_m, ef_search=args.ef_search)
+
+    build_index(incremental=args.incremental, batch_size=args.batch_size, workers=args.workers,
+                extract_workers=args.extract_workers, index_type=args.index_type,
+                index_options=index_options, compare_modes=args.compare_compression,
+                chunker=args.chunker)
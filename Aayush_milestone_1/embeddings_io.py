@@ -0,0 +1,79 @@
+import os
+import sys
+import json
+import numpy as np
+
+# Binary interchange format for chunk embeddings:
+#   <name>.npy       float32 matrix, one row per chunk (memory-mapped on load)
+#   <name>.ids.jsonl one {"pdf_name", "chunk_id", "text"} line per row, same order
+# The old <name>.json list of {"embedding": [...], ...} is still readable.
+
+
+def sidecar_path(npy_path):
+    return os.path.splitext(npy_path)[0] + ".ids.jsonl"
+
+
+# -- WRITE --
+def save_embeddings(npy_path, vectors, metadata):
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    if len(vectors) != len(metadata):
+        raise ValueError(f"{len(vectors)} vectors but {len(metadata)} metadata rows")
+
+    np.save(npy_path, vectors)
+    with open(sidecar_path(npy_path), "w", encoding="utf-8") as f:
+        for item in metadata:
+            row = {"pdf_name": item["pdf_name"], "chunk_id": item["chunk_id"], "text": item["text"]}
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+# -- READ --
+def _load_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    vectors = np.array([item["embedding"] for item in data], dtype="float32")
+    metadata = [
+        {"pdf_name": item["pdf_name"], "chunk_id": item["chunk_id"], "text": item["text"]}
+        for item in data
+    ]
+    return vectors, metadata
+
+
+def _load_npy(path, mmap=True):
+    # Map the file instead of reading it: no parse, no copy. Copy-on-write ("c")
+    # keeps the array writeable for libraries that expect that, without touching the file.
+    vectors = np.load(path, mmap_mode="c" if mmap else None)
+    if vectors.dtype != np.float32 or vectors.ndim != 2:
+        raise ValueError(f"{path}: expected a 2-d float32 matrix, got {vectors.dtype} {vectors.shape}")
+
+    with open(sidecar_path(path), "r", encoding="utf-8") as f:
+        metadata = [json.loads(line) for line in f if line.strip()]
+
+    if len(metadata) != len(vectors):
+        raise ValueError(f"{path}: {len(vectors)} vectors but {len(metadata)} sidecar rows")
+    return vectors, metadata
+
+
+def load_embeddings(path, mmap=True):
+    """Return (float32 vectors, metadata list) from a .npy + sidecar pair or a legacy .json file."""
+    if path.endswith(".npy"):
+        return _load_npy(path, mmap)
+    return _load_json(path)
+
+
+def convert(json_path, npy_path=None):
+    """Convert a legacy chunk_embeddings.json into the binary format."""
+    npy_path = npy_path or os.path.splitext(json_path)[0] + ".npy"
+    vectors, metadata = _load_json(json_path)
+    save_embeddings(npy_path, vectors, metadata)
+    return npy_path
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python embeddings_io.py chunk_embeddings.json [chunk_embeddings.npy]")
+        sys.exit(1)
+
+    out = convert(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+    print("Embeddings saved to:", out)
+    print("Ids + metadata saved to:", sidecar_path(out))
@@ -1,46 +1,48 @@
 import json
-import faiss
-import numpy as np
 import os
+from chunk_store import write_store
+from bm25_index import write_bm25
+from partitions import write_partitions
+from embeddings_io import load_embeddings
+from index_factory import build_ann_index, evaluate_index, print_report, save_index
 
-# Load your final embeddings JSON
-EMB_FILE = "chunk_embeddings.json"
+# flat / ivf / hnsw - see index_factory.py
+INDEX_TYPE = "flat"
 
-with open(EMB_FILE, "r", encoding="utf-8") as f:
-    data = json.load(f)
+# Load your final embeddings: binary .npy (+ .ids.jsonl sidecar) if present,
+# otherwise the old JSON list. Convert with: python embeddings_io.py chunk_embeddings.json
+EMB_FILE = "chunk_embeddings.npy"
+EMB_JSON_FILE = "chunk_embeddings.json"
 
-# Extract vectors + metadata
-vectors = []
-metadata = []
+if not os.path.exists(EMB_FILE):
+    EMB_FILE = EMB_JSON_FILE
 
-for item in data:
-    vectors.append(item["embedding"])
-    metadata.append({
-        "pdf_name": item["pdf_name"],
-        "chunk_id": item["chunk_id"],
-        "text": item["text"]
-    })
+# float32 vectors (memory-mapped for .npy) + metadata
+vectors_np, metadata = load_embeddings(EMB_FILE)
+print(f"Loaded {len(metadata)} embeddings from {EMB_FILE}")
 
-# Convert to numpy float32
-vectors_np = np.array(vectors).astype("float32")
-
-# Vector dimension
-d = vectors_np.shape[1]
-
-# Create FAISS index (L2 similarity)
-index = faiss.IndexFlatL2(d)
-
-# Add vectors to FAISS
-index.add(vectors_np)
+# Create FAISS index (L2 similarity) and add vectors to it
+index, index_config = build_ann_index(vectors_np, INDEX_TYPE)
 
 print("FAISS index created.")
 print("Total vectors stored:", index.ntotal)
 
+report = evaluate_index(index, vectors_np)
+print_report(index_config, report)
+index_config["evaluation"] = report
+
 # Save FAISS index + metadata
-faiss.write_index(index, "visa_index.faiss")
+save_index(index, index_config, "visa_index.faiss")
 
 with open("visa_metadata.json", "w", encoding="utf-8") as f:
     json.dump(metadata, f, indent=4)
 
+write_store("visa_chunks.store", metadata)
+write_bm25("visa_bm25.idx", (m["text"] for m in metadata))
+write_partitions(".", vectors_np, metadata, INDEX_TYPE)
+
 print("Index saved as visa_index.faiss")
 print("Metadata saved as visa_metadata.json")
+print("Chunk store saved as visa_chunks.store")
+print("BM25 index saved as visa_bm25.idx")
+print("Per-country partitions saved to partitions/")
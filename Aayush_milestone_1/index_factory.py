@@ -0,0 +1,202 @@
+import os
+import json
+import math
+import time
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivf", "hnsw")
+
+# How each vector is stored inside the index:
+#   none = float32, fp16 / int8 = scalar quantization, pq = product quantization
+COMPRESSION_MODES = ("none", "fp16", "int8", "pq")
+
+# Defaults; IVF nlist is derived from the corpus size when not given
+IVF_NPROBE = 8
+HNSW_M = 32
+HNSW_EF_SEARCH = 64
+
+EVAL_QUERIES = 200
+EVAL_K = 5
+
+
+# -- FACTORY --
+def _default_pq_m(dim):
+    # About 8 dimensions per sub-quantizer; m has to divide dim
+    for m in range(max(dim // 8, 1), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def _storage(compression, dim, n, pq_m=None):
+    """Factory fragment for the vector codec, e.g. "Flat", "SQ8", "PQ48x8"."""
+    if compression == "none":
+        return "Flat"
+    if compression == "fp16":
+        return "SQfp16"
+    if compression == "int8":
+        return "SQ8"
+    if compression == "pq":
+        m = pq_m or _default_pq_m(dim)
+        # 8-bit codebooks need 256 centroids; small corpora get smaller codebooks
+        nbits = max(1, min(8, int(math.log2(max(n, 2)))))
+        return f"PQ{m}x{nbits}"
+    raise ValueError(f"Unknown compression '{compression}', expected one of {COMPRESSION_MODES}")
+
+
+def index_spec(kind, n, dim, nlist=None, nprobe=IVF_NPROBE, hnsw_m=HNSW_M, ef_search=HNSW_EF_SEARCH,
+               compression="none", pq_m=None, pca_dim=None):
+    """Return (faiss factory string, search parameters) for an index type."""
+    prefix = ""
+    if pca_dim:
+        if not 0 < pca_dim < dim:
+            raise ValueError(f"pca_dim must be between 1 and {dim - 1} (vector dimension {dim}), got {pca_dim}")
+        if pca_dim > n:
+            # faiss needs at least pca_dim training vectors to fit the projection
+            print(f"PCA to {pca_dim} dims needs at least {pca_dim} vectors, only {n}; indexing without PCA")
+        else:
+            # PCA runs first, so the codec sees the reduced dimension
+            prefix = f"PCA{pca_dim},"
+            dim = pca_dim
+
+    storage = _storage(compression, dim, n, pq_m)
+
+    if kind == "flat":
+        return prefix + storage, {}
+
+    if kind == "ivf":
+        if nlist is None:
+            # ~4*sqrt(n) lists, but keep at least 39 training points per list
+            nlist = max(1, min(int(4 * math.sqrt(n)), n // 39))
+        return f"{prefix}IVF{nlist},{storage}", {"nprobe": min(nprobe, nlist)}
+
+    if kind == "hnsw":
+        suffix = "" if storage == "Flat" else f"_{storage}"
+        return f"{prefix}HNSW{hnsw_m}{suffix}", {"efSearch": ef_search}
+
+    raise ValueError(f"Unknown index type '{kind}', expected one of {INDEX_TYPES}")
+
+
+def apply_search_params(index, params):
+    if params:
+        ps = faiss.ParameterSpace()
+        ps.set_index_parameters(index, ",".join(f"{k}={v}" for k, v in params.items()))
+
+
+def build_ann_index(vectors, kind="flat", **options):
+    """Build (and train, if needed) an index over float32 vectors.
+
+    Returns (index, config); config is what gets saved next to the index.
+    """
+    n, d = vectors.shape
+    factory, search_params = index_spec(kind, n, d, **options)
+
+    index = faiss.index_factory(d, factory, faiss.METRIC_L2)
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    apply_search_params(index, search_params)
+
+    config = {
+        "type": kind,
+        "factory": factory,
+        "compression": options.get("compression", "none"),
+        "pca_dim": options.get("pca_dim") if factory.startswith("PCA") else None,
+        "search_params": search_params,
+        "dim": d,
+        "ntotal": int(index.ntotal)
+    }
+    return index, config
+
+
+# -- SAVE / LOAD --
+def config_path(index_path):
+    return os.path.splitext(index_path)[0] + "_config.json"
+
+
+def save_index(index, config, index_path):
+    faiss.write_index(index, index_path)
+    with open(config_path(index_path), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+
+
+def load_index(index_path):
+    """Read an index and re-apply the search parameters it was built with."""
+    index = faiss.read_index(index_path)
+
+    cfg = config_path(index_path)
+    if os.path.exists(cfg):
+        with open(cfg, "r", encoding="utf-8") as f:
+            apply_search_params(index, json.load(f).get("search_params", {}))
+
+    return index
+
+
+# -- RECALL / LATENCY REPORT --
+def evaluate_index(index, vectors, k=EVAL_K, n_queries=EVAL_QUERIES, seed=0):
+    """Compare an index against exact flat search on a sample of stored vectors."""
+    n = len(vectors)
+    k = min(k, n)
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.choice(n, size=min(n_queries, n), replace=False)]
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+
+    def timed_search(idx):
+        latencies = []
+        ids = []
+        for q in queries:
+            start = time.perf_counter()
+            _, I = idx.search(q[None, :], k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            ids.append(I[0])
+        return np.array(ids), np.array(latencies)
+
+    truth, flat_ms = timed_search(exact)
+    found, ann_ms = timed_search(index)
+
+    recall = np.mean([len(set(t) & set(f)) / k for t, f in zip(truth, found)])
+    index_bytes = int(faiss.serialize_index(index).nbytes)
+
+    return {
+        "k": k,
+        "queries": len(queries),
+        "recall_at_k": float(recall),
+        "recall_loss": float(1.0 - recall),
+        "index_bytes": index_bytes,
+        "float32_bytes": int(vectors.nbytes),
+        "bytes_per_vector": index_bytes / max(n, 1),
+        "latency_ms_p50": float(np.percentile(ann_ms, 50)),
+        "latency_ms_p95": float(np.percentile(ann_ms, 95)),
+        "flat_latency_ms_p50": float(np.percentile(flat_ms, 50))
+    }
+
+
+def print_report(config, report):
+    print(f"\nIndex type: {config['type']} ({config['factory']}) {config['search_params']}")
+    print(f"Recall@{report['k']} vs exact flat search: {report['recall_at_k']:.3f} "
+          f"over {report['queries']} queries")
+    print(f"Per-query latency: p50 {report['latency_ms_p50']:.3f} ms, "
+          f"p95 {report['latency_ms_p95']:.3f} ms "
+          f"(flat p50 {report['flat_latency_ms_p50']:.3f} ms)")
+    print(f"Index size: {report['index_bytes'] / 1e6:.2f} MB "
+          f"({report['bytes_per_vector']:.1f} bytes/vector, "
+          f"float32 vectors {report['float32_bytes'] / 1e6:.2f} MB)")
+
+
+def compare_compression(vectors, kind="flat", **options):
+    """Build the index once per compression mode and print recall loss vs float32."""
+    options.pop("compression", None)
+    rows = []
+    for mode in COMPRESSION_MODES:
+        index, config = build_ann_index(vectors, kind, compression=mode, **options)
+        report = evaluate_index(index, vectors)
+        rows.append((mode, config["factory"], report))
+
+    print(f"\n{'mode':<6} {'factory':<24} {'recall@k':>9} {'loss':>7} {'bytes/vec':>10} {'p50 ms':>8}")
+    for mode, factory, r in rows:
+        print(f"{mode:<6} {factory:<24} {r['recall_at_k']:>9.3f} {r['recall_loss']:>7.3f} "
+              f"{r['bytes_per_vector']:>10.1f} {r['latency_ms_p50']:>8.3f}")
+    return rows
@@ -0,0 +1,176 @@
+import os
+import re
+import json
+import numpy as np
+
+from index_factory import build_ann_index, save_index, load_index
+
+# Per-country sub-indexes, written next to the global index in every snapshot:
+#   partitions.json             {key: {"label", "pdfs", "chunks", "factory"}}
+#   partitions/<key>.faiss      index over that partition's vectors only (+ _config.json)
+#   partitions/<key>.ids.npy    global row id of each partition row
+# A query that names its destination searches only that country's chunks;
+# anything else goes to the global index.
+PARTITIONS_FILE = "partitions.json"
+PARTITIONS_DIR = "partitions"
+
+# Destination -> place names that identify it, in a PDF file name or in a question.
+# No demonyms ("American", "German"...): they describe who the applicant is,
+# not where they are going.
+COUNTRY_PATTERNS = {
+    "canada": r"canada",
+    "uk": r"uk|u\.k\.|united kingdom|great britain|britain|england|scotland|wales|london",
+    "usa": r"usa|u\.s\.a?\.?|united states|america",
+    "schengen": r"schengen|europe|germany|france|italy|spain|netherlands|austria|belgium|"
+                r"greece|portugal|switzerland|sweden",
+    "ireland": r"ireland|dublin",
+}
+COUNTRY_LABELS = {"canada": "Canada", "uk": "UK", "usa": "USA", "schengen": "Schengen", "ireland": "Ireland"}
+
+_COUNTRY_RE = {key: re.compile(rf"(?<![\w.])({pattern})(?![\w])", re.IGNORECASE)
+               for key, pattern in COUNTRY_PATTERNS.items()}
+# "US" only in capitals, so "help us" is not read as a destination
+_US_RE = re.compile(r"(?<![\w.])US(?![\w])")
+
+# Phrasing around a place name that marks it as the destination ("going to Canada",
+# "UK visa") or as where the applicant comes from ("I live in the US")
+_DEST_BEFORE_RE = re.compile(r"\b(to|for|visit|visiting|enter|entering|into)\s+(the\s+)?$", re.IGNORECASE)
+_DEST_AFTER_RE = re.compile(r"^('s|’s)?\s+((tourist|visitor|student|study|work|business|transit)\s+)?"
+                            r"(visas?|embassy|consulate|immigration|border|permit|eta|esta)\b", re.IGNORECASE)
+_LIST_SEP_RE = re.compile(r"^\s*(,|/|and|or|vs\.?|versus)\s*(the\s+)?$", re.IGNORECASE)
+_ORIGIN_BEFORE_RE = re.compile(r"\b(from|live in|living in|lives in|based in|born in|"
+                               r"citizen of|national of|resident of)\s+(the\s+)?$", re.IGNORECASE)
+
+
+# -- KEYS --
+def partition_key(pdf_name):
+    """Country key for a PDF ("USA_visa_eli.pdf" -> "usa"); unknown names get their own partition."""
+    stem = os.path.splitext(os.path.basename(pdf_name))[0]
+    words = " ".join(re.split(r"[_\W]+", stem))
+    for key, pattern in _COUNTRY_RE.items():
+        if pattern.search(words):
+            return key
+    return re.sub(r"[^a-z0-9]+", "_", stem.lower()).strip("_") or "other"
+
+
+def _mentions(text, available):
+    """[(key, match)] for every place name in `text` whose partition is in `available`."""
+    found = [(key, m) for key, pattern in _COUNTRY_RE.items() if key in available
+             for m in pattern.finditer(text)]
+    if "usa" in available:
+        found += [("usa", m) for m in _US_RE.finditer(text)]
+    # Per-document partitions (no country pattern) match on their own key
+    for key in available:
+        if key not in COUNTRY_PATTERNS:
+            pattern = re.compile(rf"(?<![\w]){re.escape(key.replace('_', ' '))}(?![\w])", re.IGNORECASE)
+            found += [(key, m) for m in pattern.finditer(text)]
+    return found
+
+
+def detect_partitions(text, available):
+    """Destination partition keys named in `text`, limited to the ones in `available` (may be empty).
+
+    When places are phrased as the destination ("to Canada", "a UK visa") only
+    those are returned; otherwise places the applicant comes from or lives in
+    are dropped as long as something else is left.
+    """
+    mentions = sorted(_mentions(text, available), key=lambda km: km[1].start())
+    keys = list(dict.fromkeys(key for key, _ in mentions))
+    if len(keys) <= 1:
+        return keys
+
+    destinations, origins = set(), set()
+    for i, (key, m) in enumerate(mentions):
+        before, after = text[:m.start()], text[m.end():]
+        if _DEST_BEFORE_RE.search(before) or _DEST_AFTER_RE.match(after):
+            destinations.add(key)
+            # "UK and Canada visas": the phrasing covers the whole list
+            j = i
+            while j > 0 and _LIST_SEP_RE.match(text[mentions[j - 1][1].end():mentions[j][1].start()]):
+                j -= 1
+                destinations.add(mentions[j][0])
+        elif _ORIGIN_BEFORE_RE.search(before):
+            origins.add(key)
+
+    if destinations:
+        return [key for key in keys if key in destinations]
+    return [key for key in keys if key not in origins] or keys
+
+
+# -- WRITER --
+def write_partitions(snapshot_dir, vectors, metadata, kind="flat", **options):
+    """Build one sub-index per partition key of metadata["pdf_name"]."""
+    groups = {}
+    for row, item in enumerate(metadata):
+        groups.setdefault(partition_key(item["pdf_name"]), []).append(row)
+
+    os.makedirs(os.path.join(snapshot_dir, PARTITIONS_DIR), exist_ok=True)
+    # A fixed nlist / PCA size chosen for the whole corpus may not fit a small partition
+    options = {k: v for k, v in options.items() if k not in ("nlist", "pca_dim")}
+
+    manifest = {}
+    for key, rows in sorted(groups.items()):
+        ids = np.asarray(rows, dtype="int64")
+        part_vectors = np.ascontiguousarray(vectors[ids], dtype="float32")
+        try:
+            index, config = build_ann_index(part_vectors, kind, **options)
+        except RuntimeError:
+            # Too few vectors to train this index type; exact search is cheap at that size
+            index, config = build_ann_index(part_vectors, "flat")
+
+        base = os.path.join(snapshot_dir, PARTITIONS_DIR, key)
+        save_index(index, config, base + ".faiss")
+        np.save(base + ".ids.npy", ids)
+
+        manifest[key] = {
+            "label": COUNTRY_LABELS.get(key, key),
+            "pdfs": sorted({metadata[r]["pdf_name"] for r in rows}),
+            "chunks": len(rows),
+            "factory": config["factory"]
+        }
+
+    with open(os.path.join(snapshot_dir, PARTITIONS_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+# -- READER --
+class Partition:
+    def __init__(self, snapshot_dir, key, info):
+        base = os.path.join(snapshot_dir, PARTITIONS_DIR, key)
+        self.key = key
+        self.label = info.get("label", key)
+        self.pdfs = info.get("pdfs", [])
+        self.index = load_index(base + ".faiss")
+        self.ids = np.load(base + ".ids.npy")
+
+
+def load_partitions(snapshot_dir):
+    """{key: Partition} for a snapshot, or {} if it was built without partitions."""
+    path = os.path.join(snapshot_dir, PARTITIONS_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    return {key: Partition(snapshot_dir, key, info) for key, info in manifest.items()}
+
+
+def search_partitions(parts, vectors, k):
+    """Search several partitions and merge by distance; returns (dists, global ids) like index.search."""
+    all_d, all_i = [], []
+    for part in parts:
+        depth = min(k, part.index.ntotal)
+        if depth == 0:
+            continue
+        D, I = part.index.search(vectors, depth)
+        all_d.append(D)
+        all_i.append(np.where(I >= 0, part.ids[np.maximum(I, 0)], -1))
+
+    if not all_d:
+        return np.full((len(vectors), k), np.inf, "float32"), np.full((len(vectors), k), -1, "int64")
+
+    D = np.concatenate(all_d, axis=1)
+    I = np.concatenate(all_i, axis=1)
+    D = np.where(I >= 0, D, np.inf)
+    order = np.argsort(D, axis=1)[:, :k]
+    return np.take_along_axis(D, order, 1), np.take_along_axis(I, order, 1)
@@ -0,0 +1,91 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from PyPDF2 import PdfReader
+from text_cache import TEXT_CACHE_DIR, file_hash, load_pages, save_pages
+
+# Bump this whenever the extraction logic changes so cached text is invalidated
+EXTRACTOR_VERSION = "pypdf2-1"
+
+# How many pages one worker task extracts before handing results back
+PAGES_PER_TASK = 8
+
+
+# -- SINGLE PAGE RANGE (runs inside a worker process) --
+def _extract_range(path, start, end):
+    reader = PdfReader(path)
+    pages = []
+    for page in reader.pages[start:end]:
+        try:
+            pages.append(page.extract_text() or "")
+        except Exception:
+            # A broken page should not kill the whole document
+            pages.append("")
+    return pages
+
+
+def page_count(path):
+    return len(PdfReader(path).pages)
+
+
+# -- PARALLEL EXTRACTION ENGINE --
+def extract_pages(paths, workers=None, pages_per_task=PAGES_PER_TASK,
+                  cache_dir=TEXT_CACHE_DIR, digests=None):
+    """Extract every page of every PDF in parallel.
+
+    Pages already in the text cache (same file hash + extractor version) are
+    not parsed again; pass cache_dir=None to bypass the cache.
+    Returns {path: [page_1_text, page_2_text, ...]} with pages in document order.
+    """
+    digests = dict(digests or {})
+    results = {}
+    missing = []
+
+    for path in paths:
+        if cache_dir is None:
+            missing.append(path)
+            continue
+
+        if path not in digests:
+            digests[path] = file_hash(path)
+        cached = load_pages(digests[path], EXTRACTOR_VERSION, cache_dir)
+        if cached is None:
+            missing.append(path)
+        else:
+            results[path] = cached
+
+    tasks = []
+    for path in missing:
+        results[path] = []
+        n = page_count(path)
+        for start in range(0, n, pages_per_task):
+            tasks.append((path, start, min(start + pages_per_task, n)))
+
+    if tasks:
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = min(workers, len(tasks))
+
+        if workers <= 1:
+            outputs = [_extract_range(*task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                # map() yields in submission order, so pages come back in order
+                outputs = list(pool.map(_extract_range, *zip(*tasks)))
+
+        for (path, _, _), pages in zip(tasks, outputs):
+            results[path].extend(pages)
+
+    if cache_dir is not None:
+        for path in missing:
+            save_pages(digests[path], EXTRACTOR_VERSION, results[path], cache_dir)
+
+    return results
+
+
+def join_pages(pages, sep=" "):
+    # One join instead of repeated `text += ...` keeps this linear in document size
+    return sep.join(p for p in pages if p).strip()
+
+
+def extract_text(path, sep=" ", workers=None, cache_dir=TEXT_CACHE_DIR):
+    return join_pages(extract_pages([path], workers=workers, cache_dir=cache_dir)[path], sep)
@@ -1,36 +1,22 @@
 import os
-import re
 import json
-from PyPDF2 import PdfReader
+from pdf_extract import extract_pages, extract_text, join_pages
+from token_chunker import (TokenChunker, CHUNK_TOKENS, load_tokenizer, special_tokens,
+                           truncation_report, print_truncation_report)
 
 # Input PDF folder and output locations
 PDF_FOLDER = "pdfs"
 CHUNK_FOLDER = "outputs/chunks"
 JSON_FOLDER = "outputs/json"
 
+# Chunks are sized to the embedding model's 256-token window (see token_chunker.py)
+MODEL_WINDOW = 256
+
 os.makedirs(CHUNK_FOLDER, exist_ok=True)
 os.makedirs(JSON_FOLDER, exist_ok=True)
 
 def extract_text_from_pdf(pdf_path):
-    reader = PdfReader(pdf_path)
-    full_text = ""
-
-    for page in reader.pages:
-        try:
-            text = page.extract_text()
-            if text:
-                full_text += "\n" + text
-        except:
-            pass
-    return full_text
-
-def clean_text(text):
-    text = re.sub(r'\s+', ' ', text)
-    return text.strip()
-
-def chunk_text(text, chunk_size=800):
-    words = text.split()
-    return [" ".join(words[i:i+chunk_size]) for i in range(0, len(words), chunk_size)]
+    return extract_text(pdf_path, sep="\n")
 
 def process_all_pdfs():
     if not os.path.exists(PDF_FOLDER):
@@ -39,13 +25,21 @@ def process_all_pdfs():
 
     pdf_files = [f for f in os.listdir(PDF_FOLDER) if f.endswith(".pdf")]
 
+    tokenizer = load_tokenizer()
+    chunker = TokenChunker(tokenizer, max_tokens=min(CHUNK_TOKENS, MODEL_WINDOW - special_tokens(tokenizer)))
+    all_chunks = []
+
+    # Extract every PDF up front, page ranges spread across processes
+    pages = extract_pages([os.path.join(PDF_FOLDER, f) for f in pdf_files])
+
     for pdf in pdf_files:
         print(f"Processing: {pdf}")
         pdf_path = os.path.join(PDF_FOLDER, pdf)
 
-        raw = extract_text_from_pdf(pdf_path)
-        cleaned = clean_text(raw)
-        chunks = chunk_text(cleaned)
+        # The chunker needs the line breaks to find headings; it normalizes whitespace itself
+        raw = join_pages(pages[pdf_path], sep="\n")
+        chunks = chunker.chunk(raw)
+        all_chunks.extend(chunks)
 
         base_name = os.path.splitext(pdf)[0]
         pdf_chunk_dir = os.path.join(CHUNK_FOLDER, base_name)
@@ -70,5 +64,8 @@ def process_all_pdfs():
 
         print(f"Done: {pdf} → Chunks: {len(chunks)}")
 
+    if all_chunks:
+        print_truncation_report(truncation_report(all_chunks, tokenizer, MODEL_WINDOW))
+
 if __name__ == "__main__":
     process_all_pdfs()
@@ -0,0 +1,247 @@
+import os
+import json
+import time
+import shutil
+import threading
+import numpy as np
+
+from chunk_store import load_chunks
+from index_factory import load_index, config_path
+from embeddings_io import sidecar_path
+from bm25_index import BM25Index, HYBRID_ALPHA, HYBRID_CANDIDATES, hybrid_rank
+from partitions import PARTITIONS_FILE, PARTITIONS_DIR, load_partitions, search_partitions
+
+# Every build is published as one immutable snapshot directory:
+#   outputs/snapshots/<generation>/  index + config + metadata + chunk store + BM25 + per-country
+#                                    partitions + embeddings + manifest
+#   outputs/CURRENT                  name of the live generation, swapped with one os.replace()
+# Readers only ever see a complete snapshot, and index + metadata always match.
+OUTPUT_DIR = "outputs"
+SNAPSHOT_DIR = "snapshots"
+CURRENT_FILE = "CURRENT"
+KEEP_SNAPSHOTS = 3
+
+INDEX_FILE = "visa_index.faiss"
+META_FILE = "visa_metadata.json"
+STORE_FILE = "visa_chunks.store"
+BM25_FILE = "visa_bm25.idx"
+EMBEDDINGS_FILE = "visa_embeddings.npy"
+MANIFEST_FILE = "index_manifest.json"
+
+LIVE_CHECK_INTERVAL = 1.0  # seconds between CURRENT checks in a running process
+
+
+# -- WRITER SIDE --
+def new_generation():
+    # Sortable by time (to the microsecond, so prune keeps the newest builds even
+    # within one second), random suffix so two builds never collide
+    now = time.time()
+    return time.strftime("%Y%m%d-%H%M%S", time.localtime(now)) + f".{int(now * 1e6) % 1000000:06d}-" \
+        + os.urandom(3).hex()
+
+
+def begin_snapshot(output_dir=OUTPUT_DIR):
+    """Create an empty staging directory; returns (generation, staging_dir)."""
+    generation = new_generation()
+    staging = os.path.join(output_dir, SNAPSHOT_DIR, f".staging-{generation}")
+    os.makedirs(staging)
+    return generation, staging
+
+
+def publish_snapshot(staging, generation, output_dir=OUTPUT_DIR, keep=KEEP_SNAPSHOTS):
+    """Atomically make a fully written staging directory the live index."""
+    final = os.path.join(output_dir, SNAPSHOT_DIR, generation)
+    os.replace(staging, final)
+
+    tmp = os.path.join(output_dir, CURRENT_FILE + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(generation + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(output_dir, CURRENT_FILE))
+
+    prune_snapshots(output_dir, keep)
+    return final
+
+
+def prune_snapshots(output_dir=OUTPUT_DIR, keep=KEEP_SNAPSHOTS):
+    root = os.path.join(output_dir, SNAPSHOT_DIR)
+    live = current_generation(output_dir)
+    generations = sorted(g for g in os.listdir(root) if not g.startswith("."))
+
+    for generation in generations[:-keep] if keep else []:
+        if generation != live:
+            # Processes still serving an old generation keep their open/mmapped
+            # files on POSIX; on Windows a busy snapshot is simply left for next time.
+            shutil.rmtree(os.path.join(root, generation), ignore_errors=True)
+
+
+def mirror_legacy(snapshot, output_dir=OUTPUT_DIR):
+    """Copy a snapshot's files to the old flat outputs/ paths for older readers."""
+    files = [INDEX_FILE, config_path(INDEX_FILE), META_FILE, STORE_FILE, BM25_FILE, PARTITIONS_FILE,
+             EMBEDDINGS_FILE, sidecar_path(EMBEDDINGS_FILE), MANIFEST_FILE]
+    for name in files:
+        src = os.path.join(snapshot, name)
+        if os.path.exists(src):
+            tmp = os.path.join(output_dir, name + ".tmp")
+            shutil.copyfile(src, tmp)
+            os.replace(tmp, os.path.join(output_dir, name))
+
+    src = os.path.join(snapshot, PARTITIONS_DIR)
+    if os.path.isdir(src):
+        dst = os.path.join(output_dir, PARTITIONS_DIR)
+        shutil.rmtree(dst + ".tmp", ignore_errors=True)
+        shutil.copytree(src, dst + ".tmp")
+        shutil.rmtree(dst, ignore_errors=True)
+        os.replace(dst + ".tmp", dst)
+
+
+# -- READER SIDE --
+def search_chunks(index, chunks, query_vectors, k=5, bm25=None, queries=None, alpha=HYBRID_ALPHA,
+                  partitions=None, routes=None):
+    """One FAISS search over a whole (n_queries, dim) matrix; returns a chunk list per query.
+
+    With a BM25 index and the query texts, each query's dense hits are fused
+    with its lexical scores (hybrid mode); otherwise this is plain dense search.
+    routes[i] lists the partition keys query i is limited to; queries with no
+    (known) route use the global index. Queries sharing a route are searched together.
+    """
+    vectors = np.ascontiguousarray(query_vectors, dtype="float32").reshape(-1, index.d)
+    if not len(vectors):
+        return []
+    n = len(chunks)
+    hybrid = bm25 is not None and queries is not None
+    depth = k * HYBRID_CANDIDATES if hybrid else k
+
+    # Route keys per query, dropping any this snapshot has no partition for
+    row_keys = [tuple(key for key in (routes[row] or ()) if key in partitions)
+                if routes and partitions else () for row in range(len(vectors))]
+    groups = {}
+    for row, keys in enumerate(row_keys):
+        groups.setdefault(keys, []).append(row)
+
+    dists = [None] * len(vectors)
+    dense_ids = [None] * len(vectors)
+    for keys, rows in groups.items():
+        if keys:
+            D, I = search_partitions([partitions[key] for key in keys], vectors[rows], depth)
+        else:
+            D, I = index.search(vectors[rows], depth)
+        for row, d, i in zip(rows, D, I):
+            dists[row], dense_ids[row] = d, i
+
+    if not hybrid:
+        ids = [row[:k] for row in dense_ids]
+    else:
+        ids = []
+        for row, q in enumerate(queries):
+            lexical = bm25.scores(q)
+            if row_keys[row]:
+                # Keyword hits outside the routed countries don't count
+                allowed = np.zeros(len(lexical), dtype=bool)
+                for key in row_keys[row]:
+                    allowed[partitions[key].ids] = True
+                lexical[~allowed] = 0
+            ids.append(hybrid_rank(dists[row], dense_ids[row], lexical, k, alpha))
+
+    return [[chunks[i] for i in row if 0 <= i < n] for row in ids]
+
+
+def current_generation(output_dir=OUTPUT_DIR):
+    try:
+        with open(os.path.join(output_dir, CURRENT_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _legacy_generation(output_dir):
+    # No snapshots yet: version the flat files by mtime + size instead
+    parts = []
+    for name in (INDEX_FILE, STORE_FILE, META_FILE):
+        try:
+            st = os.stat(os.path.join(output_dir, name))
+            parts.append(f"{st.st_mtime_ns}:{st.st_size}")
+        except OSError:
+            parts.append("missing")
+    return "legacy:" + "|".join(parts)
+
+
+def snapshot_path(output_dir=OUTPUT_DIR, generation=None):
+    """Directory holding the live index files (the flat outputs/ dir for old builds)."""
+    generation = generation or current_generation(output_dir)
+    if generation is None or generation.startswith("legacy:"):
+        return output_dir
+    return os.path.join(output_dir, SNAPSHOT_DIR, generation)
+
+
+class Snapshot:
+    """One consistent generation of index + chunk metadata."""
+
+    def __init__(self, output_dir=OUTPUT_DIR):
+        # Read CURRENT once so every file below comes from the same generation
+        self.generation = current_generation(output_dir) or _legacy_generation(output_dir)
+        self.path = snapshot_path(output_dir, self.generation)
+
+        self.index = load_index(os.path.join(self.path, INDEX_FILE))
+        self.chunks = load_chunks(os.path.join(self.path, STORE_FILE),
+                                  os.path.join(self.path, META_FILE))
+
+        # Lexical index for hybrid retrieval; builds before it simply don't have one
+        bm25 = os.path.join(self.path, BM25_FILE)
+        self.bm25 = BM25Index(bm25) if os.path.exists(bm25) else None
+
+        # Per-country sub-indexes ({} for builds without them)
+        self.partitions = load_partitions(self.path)
+
+        manifest = os.path.join(self.path, MANIFEST_FILE)
+        self.manifest = {}
+        if os.path.exists(manifest):
+            with open(manifest, "r", encoding="utf-8") as f:
+                self.manifest = json.load(f)
+
+    def search(self, query_vectors, k=5, queries=None, routes=None):
+        """Dense search, or hybrid dense + BM25 when the query texts are given.
+
+        routes: per query, the partition keys to search (None/empty = global index).
+        """
+        return search_chunks(self.index, self.chunks, query_vectors, k, self.bm25, queries,
+                             partitions=self.partitions, routes=routes)
+
+
+class LiveIndex:
+    """Serves the current snapshot and hot-swaps to a newly published one.
+
+    Callers take `snap = live.current()` once per request and use snap.index and
+    snap.chunks for the whole request. A swap only replaces the reference, so
+    in-flight requests finish on the generation they started with.
+    """
+
+    def __init__(self, output_dir=OUTPUT_DIR, check_interval=LIVE_CHECK_INTERVAL):
+        self.output_dir = output_dir
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot = Snapshot(output_dir)
+        self._last_check = time.monotonic()
+
+    def _latest_generation(self):
+        return current_generation(self.output_dir) or _legacy_generation(self.output_dir)
+
+    def current(self):
+        now = time.monotonic()
+        if now - self._last_check >= self.check_interval:
+            self._last_check = now
+            if self._latest_generation() != self._snapshot.generation:
+                with self._lock:
+                    # Another thread may have swapped while we waited for the lock
+                    if self._latest_generation() != self._snapshot.generation:
+                        try:
+                            self._snapshot = Snapshot(self.output_dir)
+                        except (OSError, RuntimeError, ValueError) as e:
+                            # Keep serving the old generation rather than failing requests
+                            print(f"Index swap failed, still serving {self._snapshot.generation}: {e}")
+        return self._snapshot
+
+    @property
+    def generation(self):
+        return self.current().generation
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from bm25_index import BM25Index, hybrid_rank, tokenize, write_bm25
+
+TEXTS = [
+    "Stamp 4 permission for spouses of Irish citizens",
+    "The Schengen visa fee is €90 for adults",
+    "Proof of funds: at least 30,000 in savings",
+    "",
+]
+
+
+def test_tokenize():
+    assert tokenize("The Stamp 4 fee is €90") == ["stamp", "stamp 4", "4", "fee", "€", "90"]
+    assert tokenize("30,000 and 30000") == ["30000", "30000"]
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "visa_bm25.idx")
+    write_bm25(path, TEXTS)
+    index = BM25Index(path)
+    try:
+        assert len(index) == 4 and index.doc_lens.tolist() == [len(tokenize(t)) for t in TEXTS]
+        ids, scores = index.search("stamp 4", k=3)
+        assert ids.tolist() == [0] and scores[0] > 0
+        assert index.search("30000 savings")[0].tolist() == [2]
+        assert index.search("schengen €")[0][0] == 1
+        assert not index.scores("unknown words").any()
+    finally:
+        index.close()
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "not_bm25.idx"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        BM25Index(str(path))
+
+
+def test_hybrid_rank_mixes_both_sides():
+    dists = np.array([0.1, 0.5, 0.9], dtype="float32")
+    ids = np.array([0, 1, -1])
+    lexical = np.array([0.0, 0.0, 5.0, 0.0], dtype="float32")
+
+    # Dense only, lexical only, and a keyword-only hit added as a candidate
+    assert hybrid_rank(dists, ids, lexical, k=3, alpha=1.0)[:2] == [0, 1]
+    assert hybrid_rank(dists, ids, lexical, k=1, alpha=0.0) == [2]
+    assert set(hybrid_rank(dists, ids, lexical, k=3)) == {0, 1, 2}
+    assert hybrid_rank(dists, ids, np.zeros(0, "float32"), k=2) == [0, 1]
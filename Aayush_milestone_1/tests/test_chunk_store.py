@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+from chunk_store import ChunkStore, load_chunks, write_store
+
+METADATA = [
+    {"pdf_name": "UK_eligible.pdf", "chunk_id": 0, "text": "Standard Visitor visa"},
+    {"pdf_name": "Schengen_visa.pdf", "chunk_id": 1, "text": "Fee: €90 – Größe"},
+    {"pdf_name": "USA.pdf", "chunk_id": 7, "text": ""},
+]
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "chunks.store")
+    write_store(path, iter(METADATA))
+    store = ChunkStore(path)
+    try:
+        assert len(store) == 3
+        assert list(store) == METADATA
+        assert store[-1] == METADATA[-1]
+        with pytest.raises(IndexError):
+            store[3]
+    finally:
+        store.close()
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "not_a_store"
+    path.write_bytes(b"X" * 64)
+    with pytest.raises(ValueError):
+        ChunkStore(str(path))
+
+
+def test_load_chunks_falls_back_to_json(tmp_path):
+    json_path = tmp_path / "meta.json"
+    json_path.write_text(json.dumps(METADATA), encoding="utf-8")
+    assert load_chunks(str(tmp_path / "missing.store"), str(json_path)) == METADATA
@@ -0,0 +1,23 @@
+import pytest
+
+pytest.importorskip("sentence_transformers")
+import create_index
+
+
+def test_settings_differ_between_chunkers():
+    assert create_index.build_settings("tokens") != create_index.build_settings("words")
+
+
+@pytest.mark.parametrize("chunker", ["tokens", "words"])
+def test_extractor_version_invalidates_settings(monkeypatch, chunker):
+    # A new PDF extractor changes the text, so an incremental build must not reuse old chunks
+    before = create_index.build_settings(chunker)
+    monkeypatch.setattr(create_index, "EXTRACTOR_VERSION", before["extractor"] + "-next")
+    assert create_index.build_settings(chunker) != before
+
+
+def test_token_settings_invalidate(monkeypatch):
+    before = create_index.build_settings("tokens")
+    assert create_index.build_settings("tokens", create_index.TokenChunker(min_tokens=32)) != before
+    monkeypatch.setattr(create_index, "TOKEN_CHUNKER_VERSION", before["chunker_version"] + 1)
+    assert create_index.build_settings("tokens") != before
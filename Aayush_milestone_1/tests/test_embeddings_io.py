@@ -0,0 +1,43 @@
+import json
+
+import numpy as np
+import pytest
+
+from embeddings_io import convert, load_embeddings, save_embeddings, sidecar_path
+
+METADATA = [
+    {"pdf_name": "UK_eligible.pdf", "chunk_id": 0, "text": "Visitor visa"},
+    {"pdf_name": "Schengen_visa.pdf", "chunk_id": 1, "text": "Fee €90"},
+]
+
+
+def test_npy_round_trip(tmp_path):
+    path = str(tmp_path / "emb.npy")
+    vectors = np.arange(8, dtype="float64").reshape(2, 4)
+    save_embeddings(path, vectors, METADATA)
+
+    loaded, metadata = load_embeddings(path)
+    assert loaded.dtype == np.float32 and np.array_equal(loaded, vectors)
+    assert metadata == METADATA
+    assert sidecar_path(path).endswith("emb.ids.jsonl")
+
+
+def test_row_count_mismatch(tmp_path):
+    path = str(tmp_path / "emb.npy")
+    with pytest.raises(ValueError):
+        save_embeddings(path, np.zeros((3, 4)), METADATA)
+
+    save_embeddings(path, np.zeros((2, 4)), METADATA)
+    with open(sidecar_path(path), "a", encoding="utf-8") as f:
+        f.write(json.dumps(METADATA[0]) + "\n")
+    with pytest.raises(ValueError):
+        load_embeddings(path)
+
+
+def test_convert_legacy_json(tmp_path):
+    legacy = tmp_path / "chunk_embeddings.json"
+    legacy.write_text(json.dumps([dict(m, embedding=[float(i)] * 3) for i, m in enumerate(METADATA)]),
+                      encoding="utf-8")
+    vectors, metadata = load_embeddings(convert(str(legacy)))
+    assert vectors.tolist() == [[0.0] * 3, [1.0] * 3]
+    assert metadata == METADATA
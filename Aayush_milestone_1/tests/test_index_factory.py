@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from index_factory import build_ann_index, evaluate_index, index_spec, load_index, save_index
+
+
+def vectors(n, d=32, seed=0):
+    return np.random.default_rng(seed).random((n, d), dtype="float32")
+
+
+def test_index_spec_strings():
+    assert index_spec("flat", 1000, 384) == ("Flat", {})
+    factory, params = index_spec("ivf", 10000, 384, nprobe=8)
+    assert factory.startswith("IVF") and factory.endswith(",Flat") and params == {"nprobe": 8}
+    assert index_spec("hnsw", 1000, 384, compression="int8")[0] == "HNSW32_SQ8"
+    with pytest.raises(ValueError):
+        index_spec("annoy", 1000, 384)
+
+
+@pytest.mark.parametrize("kind", ["flat", "ivf", "hnsw"])
+def test_exact_match_is_found(kind):
+    data = vectors(2000)
+    index, config = build_ann_index(data, kind)
+    _, ids = index.search(data[:20], 1)
+    assert (ids[:, 0] == np.arange(20)).mean() >= 0.9
+    assert config["ntotal"] == 2000
+
+
+def test_save_and_load_keep_search_params(tmp_path):
+    data = vectors(2000)
+    index, _ = build_ann_index(data, "ivf", nprobe=3)
+    path = str(tmp_path / "index.faiss")
+    save_index(index, _, path)
+    assert load_index(path).nprobe == 3
+
+
+@pytest.mark.parametrize("compression", ["fp16", "int8", "pq"])
+def test_compressed_index_is_smaller(compression):
+    data = vectors(1000)
+    index, _ = build_ann_index(data, "flat", compression=compression)
+    report = evaluate_index(index, data, n_queries=50)
+    assert report["index_bytes"] < report["float32_bytes"]
+
+
+def test_pca_dim_must_be_below_dimension():
+    with pytest.raises(ValueError):
+        build_ann_index(vectors(100), "flat", pca_dim=32)
+
+
+def test_pca_dim_above_corpus_size_builds_without_pca():
+    # Used to abort inside faiss PCAMatrix::prepare_Ab on the 16-chunk corpus
+    index, config = build_ann_index(vectors(16), "flat", pca_dim=24)
+    assert config["factory"] == "Flat" and config["pca_dim"] is None
+    assert index.ntotal == 16
+
+
+def test_pca_reduces_dimension():
+    index, config = build_ann_index(vectors(200), "flat", pca_dim=8)
+    assert config["factory"] == "PCA8,Flat" and config["pca_dim"] == 8
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from partitions import detect_partitions, load_partitions, partition_key, search_partitions, write_partitions
+
+ALL = {"canada", "uk", "usa", "schengen", "ireland"}
+
+
+@pytest.mark.parametrize("pdf_name, key", [
+    ("USA_visa_eli.pdf", "usa"),
+    ("UK_eligible.pdf", "uk"),
+    ("Schengen_visa.pdf", "schengen"),
+    ("data/Canada-study-permit.pdf", "canada"),
+    ("Japan eVisa.pdf", "japan_evisa"),
+])
+def test_partition_key(pdf_name, key):
+    assert partition_key(pdf_name) == key
+
+
+@pytest.mark.parametrize("question, keys", [
+    ("I am an American citizen, do I need a visa for Ireland?", ["ireland"]),
+    ("I'm from Europe, going to Canada for a conference", ["canada"]),
+    ("How long does a UK visa take? I live in the US", ["uk"]),
+    ("Compare UK and Canada visa fees", ["uk", "canada"]),
+    ("Can you help us with the Schengen rules?", ["schengen"]),
+    ("What documents do I need?", []),
+])
+def test_detect_destination(question, keys):
+    assert detect_partitions(question, ALL) == keys
+
+
+def test_detect_limited_to_available():
+    assert detect_partitions("Going to Canada", {"uk"}) == []
+
+
+def test_write_load_and_search(tmp_path):
+    metadata = [{"pdf_name": name} for name in ["UK_a.pdf", "Canada_b.pdf", "UK_c.pdf"]]
+    vectors = np.eye(3, 4, dtype="float32")
+    manifest = write_partitions(str(tmp_path), vectors, metadata)
+    assert manifest["uk"]["chunks"] == 2 and manifest["canada"]["pdfs"] == ["Canada_b.pdf"]
+
+    parts = load_partitions(str(tmp_path))
+    # Ids come back as global rows, nearest first
+    D, I = search_partitions([parts["uk"], parts["canada"]], vectors[2:3], 2)
+    assert I[0].tolist()[0] == 2 and D[0][0] <= D[0][1]
+    assert sorted(search_partitions([parts["uk"]], vectors[1:2], 3)[1][0].tolist()) == [0, 2]
+    assert load_partitions(str(tmp_path / "missing")) == {}
@@ -0,0 +1,59 @@
+import os
+
+import numpy as np
+
+from chunk_store import write_store
+from index_factory import build_ann_index, save_index
+from snapshots import (CURRENT_FILE, INDEX_FILE, SNAPSHOT_DIR, STORE_FILE, LiveIndex, Snapshot,
+                       begin_snapshot, current_generation, prune_snapshots, publish_snapshot,
+                       snapshot_path)
+
+
+def publish(output_dir, texts, keep=3):
+    generation, staging = begin_snapshot(output_dir)
+    vectors = np.eye(len(texts), 8, dtype="float32")
+    index, config = build_ann_index(vectors, "flat")
+    save_index(index, config, os.path.join(staging, INDEX_FILE))
+    write_store(os.path.join(staging, STORE_FILE),
+                [{"pdf_name": "UK_eligible.pdf", "chunk_id": i, "text": t} for i, t in enumerate(texts)])
+    publish_snapshot(staging, generation, output_dir, keep)
+    return generation
+
+
+def test_publish_switches_current(tmp_path):
+    out = str(tmp_path)
+    assert current_generation(out) is None and snapshot_path(out) == out
+
+    generation = publish(out, ["a", "b"])
+    assert current_generation(out) == generation
+    assert snapshot_path(out) == os.path.join(out, SNAPSHOT_DIR, generation)
+    assert not os.path.exists(os.path.join(out, CURRENT_FILE + ".tmp"))
+    assert not [g for g in os.listdir(os.path.join(out, SNAPSHOT_DIR)) if g.startswith(".staging")]
+
+    snap = Snapshot(out)
+    assert snap.generation == generation
+    assert snap.search(np.eye(2, 8, dtype="float32"), k=1)[1][0]["text"] == "b"
+
+
+def test_prune_keeps_newest_and_live(tmp_path):
+    out = str(tmp_path)
+    generations = [publish(out, ["a"], keep=2) for _ in range(4)]
+    root = os.path.join(out, SNAPSHOT_DIR)
+    assert sorted(os.listdir(root)) == sorted(generations)[-2:]
+
+    # A live generation older than the kept ones is never removed
+    with open(os.path.join(out, CURRENT_FILE), "w", encoding="utf-8") as f:
+        f.write(sorted(generations)[-2] + "\n")
+    prune_snapshots(out, keep=1)
+    assert sorted(os.listdir(root)) == sorted(generations)[-2:]
+
+
+def test_live_index_hot_swaps(tmp_path):
+    out = str(tmp_path)
+    first = publish(out, ["a"])
+    live = LiveIndex(out, check_interval=0)
+    pinned = live.current()
+
+    second = publish(out, ["a", "b"])
+    assert live.generation == second and len(live.current().chunks) == 2
+    assert pinned.generation == first and len(pinned.chunks) == 1
@@ -0,0 +1,27 @@
+from text_cache import file_hash, load_pages, save_pages
+
+
+def test_pages_round_trip(tmp_path):
+    pages = ["Page one", "", "Seite drei – €"]
+    save_pages("abc", "v1", pages, cache_dir=str(tmp_path))
+    assert load_pages("abc", "v1", cache_dir=str(tmp_path)) == pages
+
+
+def test_other_extractor_version_is_a_miss(tmp_path):
+    save_pages("abc", "v1", ["text"], cache_dir=str(tmp_path))
+    assert load_pages("abc", "v2", cache_dir=str(tmp_path)) is None
+
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    save_pages("abc", "v1", ["text"], cache_dir=str(tmp_path))
+    (tmp_path / "v1" / "abc.json").write_text('{"page_count": 1, "pages": {', encoding="utf-8")
+    assert load_pages("abc", "v1", cache_dir=str(tmp_path)) is None
+
+
+def test_file_hash_follows_content(tmp_path):
+    a, b = tmp_path / "a.pdf", tmp_path / "b.pdf"
+    a.write_bytes(b"%PDF-1.4 same")
+    b.write_bytes(b"%PDF-1.4 same")
+    assert file_hash(str(a)) == file_hash(str(b))
+    b.write_bytes(b"%PDF-1.4 changed")
+    assert file_hash(str(a)) != file_hash(str(b))
@@ -0,0 +1,59 @@
+from token_chunker import TokenChunker, count_tokens, is_heading, segments, truncation_report
+
+TEXT = """VISITOR VISA
+
+You can stay for up to 6 months. The U.S. rules differ, e.g. for transit.
+You must show proof of funds.
+
+2. Fees
+The fee is 115 pounds.
+"""
+
+
+def test_segments():
+    assert segments(TEXT) == [
+        ("heading", "VISITOR VISA"),
+        ("sentence", "You can stay for up to 6 months."),
+        ("sentence", "The U.S. rules differ, e.g. for transit."),
+        ("sentence", "You must show proof of funds."),
+        ("heading", "2. Fees"),
+        ("sentence", "The fee is 115 pounds."),
+    ]
+
+
+def test_is_heading():
+    assert is_heading("Documents for Visa Applications")
+    assert not is_heading("You must apply online.")
+    assert not is_heading(" ".join(["Word"] * 11))
+
+
+def test_chunks_fit_and_overlap_whole_sentences():
+    sentences = [f"Sentence number {i} says something about visas." for i in range(40)]
+    chunker = TokenChunker(max_tokens=60, overlap_tokens=20)
+    chunks = chunker.chunk(" ".join(sentences))
+
+    assert len(chunks) > 1
+    assert max(count_tokens(None, chunks)) <= 60
+    for prev, nxt in zip(chunks, chunks[1:]):
+        # The next chunk repeats the previous one's last sentence word for word
+        assert prev.endswith(nxt.split(". ")[0] + ".")
+    assert chunker.stats["overlap_tokens"] > 0
+
+
+def test_long_sentence_is_split_between_words():
+    chunker = TokenChunker(max_tokens=20)
+    chunks = chunker.chunk(" ".join(["word"] * 100) + ".")
+    assert chunker.stats["long_sentences_split"] == 1
+    assert max(count_tokens(None, chunks)) <= 20
+    assert " ".join(chunks).split().count("word") >= 99
+
+
+def test_heading_starts_new_chunk():
+    body = " ".join(f"Visitors must bring document {i}." for i in range(20))
+    chunks = TokenChunker(max_tokens=254, min_tokens=20).chunk(f"{body}\n\nFees and Charges\nThe fee is 115 pounds.\n")
+    assert chunks[-1] == "Fees and Charges The fee is 115 pounds."
+
+
+def test_truncation_report():
+    report = truncation_report(["a" * 35, "b" * 7], None, window=8)
+    assert report["max_tokens"] == 12 and report["truncated_chunks"] == 1 and report["tokens_lost"] == 4
@@ -0,0 +1,57 @@
+import os
+import json
+import hashlib
+
+# Extracted page text lives here, one file per (extractor version, PDF content hash)
+TEXT_CACHE_DIR = "outputs/text_cache"
+
+
+# -- CONTENT HASH --
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _cache_path(digest, version, cache_dir):
+    return os.path.join(cache_dir, version, f"{digest}.json")
+
+
+# -- READ / WRITE --
+def load_pages(digest, version, cache_dir=TEXT_CACHE_DIR):
+    """Return the cached page texts for a PDF, or None on a cache miss."""
+    path = _cache_path(digest, version, cache_dir)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        # Half-written or corrupted entry: treat as a miss and re-extract
+        return None
+
+    pages = entry.get("pages", {})
+    if len(pages) != entry.get("page_count"):
+        return None
+    return [pages[str(i)] for i in range(entry["page_count"])]
+
+
+def save_pages(digest, version, pages, cache_dir=TEXT_CACHE_DIR):
+    path = _cache_path(digest, version, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    entry = {
+        "sha256": digest,
+        "extractor_version": version,
+        "page_count": len(pages),
+        "pages": {str(i): text for i, text in enumerate(pages)}
+    }
+
+    # Write to a temp file first so a crash never leaves a truncated entry behind
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(entry, f)
+    os.replace(tmp, path)
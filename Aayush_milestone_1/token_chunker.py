@@ -0,0 +1,242 @@
+import re
+import math
+
+# Chunks are measured in the embedding model's own word-pieces, so nothing is
+# cut off when they are encoded. all-MiniLM-L6-v2 reads 256 pieces including
+# [CLS] and [SEP]; chunks are cut at sentence ends and a new chunk starts at a
+# section heading. The last sentences of a full chunk are repeated at the
+# start of the next one (the overlap), so a chunk is always a word-for-word
+# continuation that context_packer.py can merge back together.
+TOKENIZER_MODEL = "sentence-transformers/all-MiniLM-L6-v2"   # same model as EMBED_MODEL
+# Bump when segments() / TokenChunker.chunk() change how text is cut, so
+# incremental builds re-chunk every PDF (create_index.build_settings)
+TOKEN_CHUNKER_VERSION = 1
+CHUNK_TOKENS = 254        # 256-piece window minus [CLS] and [SEP]
+OVERLAP_TOKENS = 40       # at most this many tokens of whole sentences carried over
+MIN_CHUNK_TOKENS = 64     # a heading starts a new chunk once the current one has this many
+HEADING_MAX_WORDS = 10
+CHARS_PER_TOKEN = 3.5     # estimate when the tokenizer cannot be loaded
+
+# Sentence ends, but not after initials ("U.S."), "e.g." or "i.e."
+SENTENCE_RE = re.compile(r"(?<!\b[A-Z]\.)(?<!\be\.g\.)(?<!\bi\.e\.)(?<=[.!?])\s+(?=[\"“‘(\[]?[A-Z0-9])")
+BULLET_RE = re.compile(r"^([•●▪◦■*\-–—]|\d{1,2}[.)]\s|\(?[a-z]\)\s)")
+NUMBERED_HEADING_RE = re.compile(r"^(\d+(\.\d+)*\.?|section\s+\d+|part\s+[\dIVX]+)\s", re.IGNORECASE)
+WORD_STRIP = "()[]{}\"'“”‘’-—–:,/&"
+
+
+# -- TOKENIZER --
+def load_tokenizer(model_name=TOKENIZER_MODEL):
+    """Hugging Face tokenizer of the embedding model, or None (token counts are then estimated)."""
+    try:
+        from transformers import AutoTokenizer
+        return AutoTokenizer.from_pretrained(model_name)
+    except Exception as e:   # missing package, offline without a cached copy...
+        print(f"Tokenizer {model_name} unavailable, estimating tokens: {e}")
+        return None
+
+
+def count_tokens(tokenizer, texts):
+    """Word-piece count of each text, without special tokens."""
+    if not texts:
+        return []
+    if tokenizer is None:
+        return [math.ceil(len(t) / CHARS_PER_TOKEN) for t in texts]
+    ids = tokenizer(list(texts), add_special_tokens=False, verbose=False)["input_ids"]
+    return [len(i) for i in ids]
+
+
+def special_tokens(tokenizer):
+    return tokenizer.num_special_tokens_to_add() if tokenizer is not None else 2
+
+
+# -- SEGMENTATION --
+def is_heading(line):
+    """Short title-like line: numbered ("2. Fees"), Title Case or ALL CAPS, no sentence punctuation."""
+    words = line.split()
+    if not words or len(words) > HEADING_MAX_WORDS or line.endswith((".", ",", ";")):
+        return False
+    if NUMBERED_HEADING_RE.match(line):
+        return True
+    words = [w.strip(WORD_STRIP) for w in words]
+    alpha = [w for w in words if w and w[0].isalpha()]
+    if not alpha:
+        return False
+    # Short function words stay lower case in titles ("Documents for Visa")
+    capitalized = sum(w[0].isupper() or len(w) <= 3 for w in alpha)
+    return alpha[0][0].isupper() and capitalized / len(alpha) >= 0.8
+
+
+def segments(text):
+    """Split extracted PDF text into ("heading" | "sentence", text) units in document order.
+
+    Lines are the ones the PDF extractor produced: wrapped lines of one
+    paragraph are joined back together, blank lines and bullets start a new
+    paragraph, and each paragraph is split into sentences. Headings are
+    title-like lines, or short lines that make up a paragraph on their own.
+    """
+    units = []
+    paragraph = []
+
+    def end_paragraph():
+        if not paragraph:
+            return
+        body = " ".join(paragraph)
+        if (len(paragraph) == 1 and len(body.split()) <= HEADING_MAX_WORDS
+                and not body.endswith((".", "!", "?", ",", ";", ":")) and not BULLET_RE.match(body)):
+            units.append(("short", body))
+        else:
+            units.extend(("sentence", s) for s in SENTENCE_RE.split(body) if s)
+        paragraph.clear()
+
+    for raw in text.splitlines():
+        line = " ".join(raw.split())
+        if not line:
+            end_paragraph()
+            continue
+
+        # A wrapped line that continues an unfinished sentence is never a heading
+        open_sentence = paragraph and not paragraph[-1].endswith((".", "!", "?", ":"))
+        if not open_sentence and is_heading(line):
+            end_paragraph()
+            units.append(("heading", line))
+            continue
+
+        if BULLET_RE.match(line):
+            end_paragraph()
+        paragraph.append(line)
+    end_paragraph()
+
+    # A short unpunctuated line standing alone between blank lines is a sentence-case
+    # heading, unless its neighbours are too - then it is an item of an unmarked list
+    resolved = []
+    for i, (kind, unit) in enumerate(units):
+        if kind == "short":
+            in_list = any(0 <= j < len(units) and units[j][0] == "short" for j in (i - 1, i + 1))
+            kind = "sentence" if in_list else "heading"
+        if kind == "heading" and resolved and resolved[-1][0] == "heading":
+            resolved[-1] = ("heading", resolved[-1][1] + " " + unit)   # multi-line title
+        else:
+            resolved.append((kind, unit))
+    return resolved
+
+
+# -- CHUNKER --
+class TokenChunker:
+    """Pack sentence/heading units into chunks of at most `max_tokens` word-pieces.
+
+    A sentence that is longer than a whole chunk on its own is split between
+    words; that is the only place a chunk ends mid-sentence. Counters of what
+    was produced are kept in `self.stats`.
+    """
+
+    def __init__(self, tokenizer=None, max_tokens=CHUNK_TOKENS, overlap_tokens=OVERLAP_TOKENS,
+                 min_tokens=MIN_CHUNK_TOKENS):
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.overlap_tokens = min(overlap_tokens, max_tokens // 2)
+        self.min_tokens = min_tokens
+        self.stats = {"documents": 0, "chunks": 0, "headings": 0, "sentences": 0,
+                      "long_sentences_split": 0, "overlap_tokens": 0}
+
+    def _split_long(self, text):
+        """Cut an over-long sentence between words into pieces that each fit a chunk."""
+        words = text.split()
+        pieces, current, used = [], [], 0
+        for word, n in zip(words, count_tokens(self.tokenizer, words)):
+            if current and used + n > self.max_tokens:
+                pieces.append(" ".join(current))
+                current, used = [], 0
+            current.append(word)
+            used += n
+        if current:
+            pieces.append(" ".join(current))
+        return pieces
+
+    def _units(self, text):
+        """[(kind, text, tokens)] with every unit no longer than max_tokens."""
+        units = segments(text)
+        counts = count_tokens(self.tokenizer, [t for _, t in units])
+
+        out = []
+        for (kind, unit), n in zip(units, counts):
+            self.stats["headings" if kind == "heading" else "sentences"] += 1
+            if n <= self.max_tokens:
+                out.append((kind, unit, n))
+                continue
+            self.stats["long_sentences_split"] += 1
+            pieces = self._split_long(unit)
+            out.extend((kind, p, n) for p, n in zip(pieces, count_tokens(self.tokenizer, pieces)))
+        return out
+
+    def _overlap(self, current):
+        """Trailing whole sentences of a full chunk that fit in overlap_tokens."""
+        carried, used = [], 0
+        for unit in reversed(current):
+            if unit[0] == "heading" or used + unit[2] > self.overlap_tokens:
+                break
+            carried.insert(0, unit)
+            used += unit[2]
+        return carried
+
+    def chunk(self, text):
+        """Chunks of one document, as single-spaced strings."""
+        chunks = []
+        current, used = [], 0
+        carried = 0   # units at the start of `current` repeated from the previous chunk
+
+        for unit in self._units(text):
+            kind, _, n = unit
+            if kind == "heading" and len(current) == carried:
+                # A new section right after a cut: the overlap belongs to the old section
+                self.stats["overlap_tokens"] -= sum(u[2] for u in current)
+                current, used, carried = [], 0, 0
+
+            section_break = kind == "heading" and used >= self.min_tokens
+            if section_break or used + n > self.max_tokens:
+                # A heading at the end of a chunk belongs with the text after it
+                moved = [current.pop()] if len(current) > carried + 1 and current[-1][0] == "heading" else []
+                chunks.append(" ".join(u[1] for u in current))
+
+                overlap = [] if section_break else self._overlap(current)
+                if sum(u[2] for u in overlap + moved) + n > self.max_tokens:
+                    overlap = []
+                self.stats["overlap_tokens"] += sum(u[2] for u in overlap)
+                current, carried = overlap + moved, len(overlap)
+                used = sum(u[2] for u in current)
+
+            current.append(unit)
+            used += n
+
+        # Every chunk must add something new, so a tail of only carried-over text is dropped
+        if len(current) > carried:
+            chunks.append(" ".join(u[1] for u in current))
+
+        self.stats["documents"] += 1
+        self.stats["chunks"] += len(chunks)
+        return chunks
+
+
+# -- TRUNCATION REPORT --
+def truncation_report(texts, tokenizer, window):
+    """How much of each text the embedding model would drop at a `window`-piece input limit."""
+    specials = special_tokens(tokenizer)
+    lengths = [n + specials for n in count_tokens(tokenizer, texts)]
+    total = sum(lengths)
+    lost = sum(max(0, n - window) for n in lengths)
+    return {
+        "chunks": len(lengths),
+        "window": window,
+        "mean_tokens": round(total / len(lengths), 1) if lengths else 0.0,
+        "max_tokens": max(lengths, default=0),
+        "truncated_chunks": sum(n > window for n in lengths),
+        "tokens_lost": lost,
+        "tokens_lost_pct": round(100 * lost / total, 2) if total else 0.0,
+        "exact_tokens": tokenizer is not None
+    }
+
+
+def print_truncation_report(report):
+    print(f"Chunk tokens: mean {report['mean_tokens']}, max {report['max_tokens']} "
+          f"(model window {report['window']}{'' if report['exact_tokens'] else ', estimated'})")
+    print(f"Truncated at embedding time: {report['truncated_chunks']}/{report['chunks']} chunks, "
+          f"{report['tokens_lost']} tokens ({report['tokens_lost_pct']}%) never embedded")
@@ -0,0 +1,202 @@
+import os
+import re
+import json
+import hashlib
+import time
+import atexit
+import threading
+from collections import OrderedDict
+import numpy as np
+
+from embed_cache import normalize_query
+
+ANSWER_CACHE_SIZE = 512
+ANSWER_CACHE_TTL = 6 * 3600      # seconds
+SIMILARITY_THRESHOLD = 0.95     # cosine similarity between question embeddings
+AUTOSAVE_EVERY = 50             # new answers before a background save (and always at exit)
+
+# "17" vs "71", "$2,000" vs "$20,000": embeddings barely move, the answer does
+NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+class AnswerCache:
+    """Cache of LLM answers in front of the Groq call.
+
+    An answer is only reused when the same set of chunks of the same index
+    `generation` was retrieved (so the prompt context is identical), the `profile` - the structured applicant
+    fields that go into the prompt, name included - is exactly the same, and
+    the free-text question is the same after normalization. A question may also
+    match on embedding similarity (at least `threshold` cosine), but only if it
+    mentions the same numbers. Entries expire after `ttl` seconds and the oldest
+    are evicted past `max_size`; the generation is part of the key, so requests
+    still pinned to an old snapshot during a hot swap neither see nor wipe the
+    new generation's answers. With persist_path set, new answers are written out by a
+    background thread every `autosave_every` stores and at exit.
+    """
+
+    def __init__(self, max_size=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL,
+                 threshold=SIMILARITY_THRESHOLD, persist_path=None, autosave_every=AUTOSAVE_EVERY):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.threshold = threshold
+        self.persist_path = persist_path
+        self.autosave_every = autosave_every
+
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()   # (generation, chunk ids, profile, question) -> entry
+        self._unsaved = 0
+        self._saving = False
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+
+        if persist_path:
+            self.load()
+            atexit.register(self.save)
+
+    @staticmethod
+    def _profile(profile):
+        """SHA-256 of the exact-match fields in canonical form ("age=17|name=a"), or "" without any.
+
+        Only the hash is kept (and persisted), never the applicant's details.
+        """
+        if not profile:
+            return ""
+        text = "|".join(f"{k}={normalize_query(str(v))}" for k, v in sorted(profile.items()))
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def _key(cls, question, chunk_ids, profile=None, generation=None):
+        return (str(generation or ""), tuple(sorted(int(c) for c in chunk_ids)), cls._profile(profile),
+                normalize_query(question))
+
+    @staticmethod
+    def _unit(vec):
+        vec = np.asarray(vec, dtype="float32")
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _expire(self, now):
+        expired = [k for k, e in self._entries.items() if now - e["time"] > self.ttl]
+        for k in expired:
+            del self._entries[k]
+
+    # -- LOOKUP --
+    def lookup(self, question, query_vec, chunk_ids, profile=None, generation=None):
+        """Cached answer or None. `query_vec` is the embedding of `question` alone,
+        `generation` the index generation the chunks were retrieved from."""
+        key = self._key(question, chunk_ids, profile, generation)
+        now = time.time()
+
+        with self._lock:
+            self._expire(now)
+
+            entry = self._entries.get(key)
+            if entry is None and query_vec is not None:
+                q = self._unit(query_vec)
+                numbers = NUMBER_RE.findall(key[3])
+                best = None
+                for (gen, ids, prof, text), e in self._entries.items():
+                    if (gen, ids, prof) != key[:3] or NUMBER_RE.findall(text) != numbers:
+                        continue
+                    sim = float(np.dot(q, e["vector"]))
+                    if sim >= self.threshold and (best is None or sim > best[0]):
+                        best = (sim, e)
+                if best:
+                    entry = best[1]
+                    self.semantic_hits += 1
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return entry["answer"]
+
+    def store(self, question, query_vec, chunk_ids, answer, profile=None, generation=None):
+        key = self._key(question, chunk_ids, profile, generation)
+        with self._lock:
+            self._entries[key] = {
+                "answer": answer,
+                "vector": self._unit(query_vec) if query_vec is not None else np.zeros(1, "float32"),
+                "time": time.time()
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            self._unsaved += 1
+            autosave = self.persist_path and self._unsaved >= self.autosave_every and not self._saving
+            if autosave:
+                self._saving = True
+
+        if autosave:
+            # Off the request path: a miss already waited for the LLM
+            threading.Thread(target=self._autosave, name="answer-cache-save", daemon=True).start()
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses
+        }
+
+    # -- PERSISTENCE --
+    def load(self):
+        if not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        with self._lock:
+            for item in data.get("entries", []):
+                if "generation" not in item or "=" in item["profile"]:
+                    continue   # written by an older version (no generation / raw profile)
+                key = (item["generation"], tuple(item["chunk_ids"]), item["profile"], item["question"])
+                self._entries[key] = {
+                    "answer": item["answer"],
+                    "vector": np.array(item["vector"], dtype="float32"),
+                    "time": item["time"]
+                }
+
+    def _autosave(self):
+        try:
+            self.save()
+        except OSError as e:
+            print(f"Answer cache save failed: {e}")
+        finally:
+            self._saving = False
+
+    def save(self):
+        if not self.persist_path:
+            return
+        with self._lock:
+            data = {
+                "entries": [
+                    {
+                        "generation": gen,
+                        "chunk_ids": list(ids),
+                        "profile": prof,
+                        "question": q,
+                        "answer": e["answer"],
+                        "vector": e["vector"].tolist(),
+                        "time": e["time"]
+                    }
+                    for (gen, ids, prof, q), e in self._entries.items()
+                ]
+            }
+            self._unsaved = 0
+
+        with self._save_lock:
+            tmp = self.persist_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.persist_path)
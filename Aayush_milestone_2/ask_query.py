@@ -1,41 +1,105 @@
 # this is long file but the short version of file is in python notebook in file which is named 
 # (visa_rag_minimal) file contains minimal code 
 
-from groq import Groq
 from dotenv import load_dotenv
-import os, json, faiss
-import numpy as np
+import os, sys, re, time
 from sentence_transformers import SentenceTransformer
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Aayush_milestone_1"))
+from snapshots import LiveIndex
+from partitions import detect_partitions
+from embed_cache import EmbeddingCache
+from answer_cache import AnswerCache
+from llm_client import chat
+from reranker import Reranker, RERANK_CANDIDATES, RERANK_BUDGET_MS
+from context_packer import pack_context
+from decision_log import DecisionLog, now_iso
+
+OUTPUT_DIR = "../Aayush_milestone_1/outputs"
+
+# "dense" = FAISS only, "hybrid" = FAISS fused with BM25 keyword scores
+RETRIEVAL_MODE = "hybrid"
+
+# Search only the country sub-index when the question names a destination
+ROUTE_BY_DESTINATION = True
+
+# Cascade: ANN top-N, then a cross-encoder keeps the best k within a time budget
+RERANK = True
+
 
 
 # LOAD ENV + MODELS
 
 load_dotenv()
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
 embedder = SentenceTransformer("all-MiniLM-L6-v2")
 
-# Load FAISS index + metadata
-index = faiss.read_index("../Aayush_milestone_1/outputs/visa_index.faiss")
+# Repeated questions skip the forward pass; persisted so the next run starts warm
+query_cache = EmbeddingCache(embedder, "all-MiniLM-L6-v2", persist_path="query_embedding_cache.npz")
 
-with open("../Aayush_milestone_1/outputs/visa_metadata.json", "r", encoding="utf-8") as f:
-    metadata = json.load(f)
+# Load FAISS index + metadata from the live snapshot (memory-mapped chunk store)
+live_index = LiveIndex(OUTPUT_DIR)
+
+# Answers for repeat questions; emptied automatically when the index is rebuilt
+answer_cache = AnswerCache(persist_path="answer_cache.json")
+
+# Cross-encoder, loaded on first use
+reranker = Reranker()
 
 
 
 # EMBEDDING FUNCTION
 
 def embed_text(text):
-    return embedder.encode([text])[0].astype("float32")
+    return query_cache.embed(text)
 
 
 
 # RETRIEVAL FUNCTION
 
-def retrieve_chunks(query, k=5):
-    vec = embed_text(query)
-    _, ids = index.search(np.array([vec]), k)
-    return [metadata[cid] for cid in ids[0] if cid != -1]
+def retrieve_many(queries, k=5, mode=RETRIEVAL_MODE, routes=None, snap=None, vectors=None):
+    """Retrieve for a batch of queries: one encode pass, one FAISS search over the query matrix.
+
+    mode="hybrid" also fuses BM25 keyword scores in (when the snapshot has a BM25 index).
+    routes[i] limits query i to those country partitions; by default the
+    destination is detected from the question, falling back to the global index.
+    Pass `snap` to search a snapshot the caller already holds (and tags results with),
+    and `vectors` if the queries are already embedded.
+    """
+    snap = snap or live_index.current()
+    lexical = queries if mode == "hybrid" else None
+    if routes is None and ROUTE_BY_DESTINATION:
+        routes = [detect_partitions(q, snap.partitions) for q in queries]
+    if vectors is None:
+        vectors = query_cache.embed_many(queries)
+    return snap.search(vectors, k, lexical, routes)
+
+
+def retrieve_chunks(query, k=5, mode=RETRIEVAL_MODE, snap=None, vector=None):
+    vectors = None if vector is None else vector.reshape(1, -1)
+    return retrieve_many([query], k, mode, snap=snap, vectors=vectors)[0]
+
+
+def retrieve_cascade(query, k=5, n_candidates=RERANK_CANDIDATES, budget_ms=RERANK_BUDGET_MS,
+                     mode=RETRIEVAL_MODE, snap=None):
+    """ANN recall of n_candidates, then cross-encoder rerank down to k.
+
+    Returns (chunks, timings) with per-stage milliseconds and how many
+    candidates the reranker scored before the budget ran out.
+    """
+    t = time.perf_counter()
+    vector = embed_text(query)
+    embed_ms = (time.perf_counter() - t) * 1000
+
+    # ann_ms is the search alone: the vector is handed over, not looked up again
+    t = time.perf_counter()
+    candidates = retrieve_chunks(query, n_candidates if RERANK else k, mode, snap, vector)
+    ann_ms = (time.perf_counter() - t) * 1000
+
+    chunks, stats = reranker.rerank(query, candidates, k, budget_ms if RERANK else 0)
+
+    timings = {"embed_ms": round(embed_ms, 2), "ann_ms": round(ann_ms, 2)}
+    timings.update(stats)
+    return chunks, timings
 
 
 
@@ -54,12 +118,10 @@ def extract_confidence(text):
 
 # LLM CALL
 
-def ask_groq(question, chunks):
-    # Build context with hidden chunk IDs
-    ctx = "\n\n".join(
-        f"[CHUNK {c['chunk_id']}]\n{c['text']}"
-        for c in chunks
-    )
+def build_prompt(question, chunks):
+    # Build context with hidden chunk IDs: neighbouring chunks merged without
+    # their repeated overlap, capped at CONTEXT_TOKEN_BUDGET tokens
+    ctx, _ = pack_context(chunks)
 
     prompt = f"""
 You are a visa eligibility officer.
@@ -83,28 +145,37 @@ Explanation:
 - DO NOT show chunk IDs or chunk numbers.
 Confidence: (0 to 1)
 """
+    return prompt
+
 
-    # Model call
-    resp = client.chat.completions.create(
-        model="llama-3.1-8b-instant",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.0
-    )
+def ask_groq(question, chunks):
+    prompt = build_prompt(question, chunks)
 
-    return resp.choices[0].message.content
+    # Model call (shared pooled client, timeouts + retries in llm_client.py)
+    return chat(prompt, temperature=0.0)
 
 
+def cached_ask_groq(question, chunks, generation):
+    # generation of the snapshot the chunks came from, not whatever is live now
+    qvec = embed_text(question)
+    chunk_ids = [c["chunk_id"] for c in chunks]
+
+    answer = answer_cache.lookup(question, qvec, chunk_ids, generation=generation)
+    if answer is None:
+        answer = ask_groq(question, chunks)
+        answer_cache.store(question, qvec, chunk_ids, answer, generation=generation)
+    return answer
 
-# MAIN EXECUTION
 
-if __name__ == "__main__":
-    question = input("Enter your visa question: ")
 
-    chunks = retrieve_chunks(question)
-    model_answer = ask_groq(question, chunks)
+# CONFIDENCE CALIBRATION
 
-    # Extract confidence
+def finalize_answer(model_answer):
+    """Clamp the model's confidence by eligibility; returns (answer, confidence)."""
     confidence = extract_confidence(model_answer)
+    if confidence is None:
+        # No readable "Confidence:" line - rate it like an answer without a clear eligibility
+        confidence = 0.3
     answer_text = model_answer.lower()
 
     if "eligibility: yes" in answer_text:
@@ -115,20 +186,37 @@ if __name__ == "__main__":
         confidence = 0.3
 
     # FIX: overwrite confidence inside the model's text
-    import re
     model_answer = re.sub(r"Confidence:\s*\d+(\.\d+)?", f"Confidence: {confidence}", model_answer)
+    return model_answer, confidence
+
+
+
+# MAIN EXECUTION
+
+if __name__ == "__main__":
+    # Records are written by a background thread; close() below waits for them
+    decision_log = DecisionLog()
+
+    question = input("Enter your visa question: ")
+
+    # One snapshot for retrieval, the answer cache and the log, even if a new index is published meanwhile
+    snap = live_index.current()
+    chunks, timings = retrieve_cascade(question, snap=snap)
+    print(f"Retrieval: embed {timings['embed_ms']} ms, ANN {timings['ann_ms']} ms, "
+          f"rerank {timings['rerank_ms']} ms ({timings['scored']}/{timings['candidates']} scored)")
+
+    model_answer, confidence = finalize_answer(cached_ask_groq(question, chunks, snap.generation))
 
     print("\nResponse:\n")
     print(model_answer)
 
     # LOGGING
-    log_entry = {
+    decision_log.append({
+        "time": now_iso(),
         "question": question,
         "model_answer": model_answer,
-        "confidence": confidence
-    }
-
-    with open("decision_history.json", "a", encoding="utf-8") as f:
-        f.write(json.dumps(log_entry, indent=4) + "\n\n")
-
-    # print("\nSaved to decision_history.json") 
+        "confidence": confidence,
+        "chunk_ids": [c["chunk_id"] for c in chunks],
+        "index_generation": snap.generation
+    })
+    decision_log.close()
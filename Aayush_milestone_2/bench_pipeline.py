@@ -0,0 +1,179 @@
+# End-to-end latency benchmark for the query pipeline.
+#
+#   python bench_pipeline.py --mock --clients 8 --requests 200
+#
+# N client threads each run the full pipeline (embed -> search -> rerank ->
+# prompt build -> LLM -> parse) and every stage is timed separately. --mock starts mock_groq.py
+# in-process so no Groq key or network is needed; without it the calls go to
+# GROQ_BASE_URL or the real API. Reports p50/p95/p99 per stage plus throughput.
+
+import json
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+import llm_client
+from ask_query import (embedder, query_cache, live_index, build_prompt, finalize_answer,
+                       reranker, RETRIEVAL_MODE, ROUTE_BY_DESTINATION, RERANK)
+from reranker import RERANK_CANDIDATES, RERANK_BUDGET_MS
+from partitions import detect_partitions
+from bulk_eval import read_questions
+
+STAGES = ("embed", "search", "rerank", "prompt", "llm", "parse")
+PERCENTILES = (50, 95, 99)
+
+BENCH_CLIENTS = 4
+BENCH_REQUESTS = 100
+BENCH_K = 5
+
+SAMPLE_QUESTIONS = [
+    "Am I eligible for a USA tourist visa with a stable job and savings?",
+    "What documents do I need for a Schengen visa?",
+    "Can a student apply for a Canada visitor visa after a previous rejection?",
+    "How much bank balance is required for a UK visitor visa?",
+    "Is travel insurance mandatory for a Schengen short-stay visa?",
+    "Can I visit Australia on a tourist visa while self-employed?",
+    "What is the processing time for a US B1/B2 visa?",
+    "Do I need an invitation letter to visit family in Germany?",
+]
+
+
+def run_one(question, k=BENCH_K, use_cache=False):
+    """One pass through the pipeline; returns seconds spent in each stage."""
+    times = {}
+
+    t = time.perf_counter()
+    if use_cache:
+        vec = query_cache.embed(question)
+    else:
+        vec = embedder.encode([question], convert_to_numpy=True).astype("float32")[0]
+    times["embed"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    snap = live_index.current()
+    lexical = [question] if RETRIEVAL_MODE == "hybrid" else None
+    routes = [detect_partitions(question, snap.partitions)] if ROUTE_BY_DESTINATION else None
+    candidates = snap.search(vec, RERANK_CANDIDATES if RERANK else k, lexical, routes)[0]
+    times["search"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    chunks, _ = reranker.rerank(question, candidates, k, RERANK_BUDGET_MS if RERANK else 0)
+    times["rerank"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    prompt = build_prompt(question, chunks)
+    times["prompt"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    answer = llm_client.chat(prompt, temperature=0.0)
+    times["llm"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    finalize_answer(answer)
+    times["parse"] = time.perf_counter() - t
+
+    times["total"] = sum(times.values())
+    return times
+
+
+def summarize(samples):
+    ms = np.array(samples) * 1000
+    out = {f"p{p}_ms": round(float(np.percentile(ms, p)), 2) for p in PERCENTILES}
+    out["mean_ms"] = round(float(ms.mean()), 2)
+    return out
+
+
+def run_benchmark(questions, clients=BENCH_CLIENTS, requests=BENCH_REQUESTS, k=BENCH_K, use_cache=False):
+    # Warm up the model, index and connection pool outside the measurement
+    run_one(questions[0], k, use_cache)
+
+    results, errors = [], []
+    lock = threading.Lock()
+    next_request = iter(range(requests))
+
+    def client(seed):
+        rng = random.Random(seed)
+        while True:
+            with lock:
+                if next(next_request, None) is None:
+                    return
+            try:
+                timing = run_one(rng.choice(questions), k, use_cache)
+                with lock:
+                    results.append(timing)
+            except Exception as e:
+                with lock:
+                    errors.append(f"{type(e).__name__}: {e}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(client, range(clients)))
+    elapsed = time.perf_counter() - start
+
+    report = {
+        "clients": clients,
+        "requests": requests,
+        "completed": len(results),
+        "errors": len(errors),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "stages": {s: summarize([r[s] for r in results]) for s in STAGES + ("total",)} if results else {},
+        "index_generation": live_index.generation,
+    }
+    if errors:
+        report["sample_errors"] = errors[:5]
+    return report
+
+
+def print_report(report):
+    print(f"\n{report['completed']}/{report['requests']} requests, {report['clients']} clients, "
+          f"{report['errors']} errors, {report['elapsed_s']}s -> {report['throughput_rps']} req/s")
+    print(f"{'stage':<8}" + "".join(f"{'p' + str(p):>10}" for p in PERCENTILES) + f"{'mean':>10}  (ms)")
+    for stage, s in report["stages"].items():
+        print(f"{stage:<8}" + "".join(f"{s[f'p{p}_ms']:>10.2f}" for p in PERCENTILES) + f"{s['mean_ms']:>10.2f}")
+    for e in report.get("sample_errors", []):
+        print("  error:", e)
+
+
+# MAIN EXECUTION
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-stage latency benchmark of the RAG pipeline")
+    parser.add_argument("--clients", type=int, nargs="+", default=[BENCH_CLIENTS],
+                        help="concurrent clients; several values run one benchmark each")
+    parser.add_argument("--requests", type=int, default=BENCH_REQUESTS, help="requests per run")
+    parser.add_argument("--k", type=int, default=BENCH_K, help="chunks retrieved per query")
+    parser.add_argument("--questions", help="JSONL file of questions (same format as bulk_eval.py)")
+    parser.add_argument("--use-cache", action="store_true",
+                        help="embed through the query cache instead of timing the model every time")
+    parser.add_argument("--mock", action="store_true", help="start a local mock Groq server")
+    parser.add_argument("--mock-latency", type=float, default=0.3)
+    parser.add_argument("--mock-tokens-per-sec", type=float, default=200)
+    parser.add_argument("--mock-error-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="write the reports as JSON to this file")
+    args = parser.parse_args()
+
+    if args.mock:
+        from mock_groq import start_in_thread
+        server, base_url = start_in_thread(latency=args.mock_latency,
+                                           tokens_per_sec=args.mock_tokens_per_sec,
+                                           error_rate=args.mock_error_rate)
+        llm_client.reset_client()
+        llm_client.get_client(api_key="mock", base_url=base_url)
+        print(f"Mock Groq server on {base_url}")
+
+    questions = [q for _, q, _ in read_questions(args.questions)] if args.questions else SAMPLE_QUESTIONS
+
+    reports = []
+    for clients in args.clients:
+        report = run_benchmark(questions, clients, args.requests, args.k, args.use_cache)
+        report["mock"] = args.mock
+        print_report(report)
+        reports.append(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+        print(f"\nSaved -> {args.output}")
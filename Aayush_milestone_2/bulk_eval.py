@@ -0,0 +1,275 @@
+# Bulk evaluation: answer a JSONL file of visa questions concurrently.
+#
+#   python bulk_eval.py questions.jsonl --concurrency 8 --rpm 30
+#
+# Each input line is a JSON object with a "question" (or "query" / "body" / "text")
+# field and an optional "id". Results (and failures) are appended to
+# bulk_results.jsonl as each question finishes, so a crashed or interrupted run
+# can simply be started again: questions already answered in the output file
+# are skipped. Answers also go to the decision log (decision_log.py) in the
+# same record shape as ask_query.py, for the history store and audits.
+
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from ask_query import (live_index, query_cache, answer_cache, retrieve_many, reranker,
+                       ask_groq, finalize_answer, RERANK)
+from reranker import RERANK_CANDIDATES, RERANK_BUDGET_MS
+from decision_log import DecisionLog
+
+BULK_OUTPUT = "bulk_results.jsonl"
+BULK_CONCURRENCY = 8     # LLM calls in flight at once
+BULK_RPM = 30            # Groq requests per minute (0 = no limit)
+BULK_BATCH_SIZE = 32     # questions embedded + searched together
+BULK_K = 5               # chunks per prompt (after reranking)
+FSYNC_EVERY = 20         # results written between fsyncs
+
+QUESTION_FIELDS = ("question", "query", "body", "text")
+
+
+# -- INPUT --
+def question_id(record, lineno, question):
+    if record.get("id") is not None:
+        return str(record["id"])
+    if record.get("request_id") is not None:
+        return str(record["request_id"])
+    # No id given: line number + text hash, stable as long as the file is only appended to
+    return f"{lineno}:{hashlib.sha1(question.encode('utf-8')).hexdigest()[:12]}"
+
+
+def read_questions(path, skip=()):
+    """Yield (id, question, record) lazily, skipping ids in `skip`."""
+    with open(path, "r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                print(f"Skipping line {lineno}: not valid JSON")
+                continue
+
+            question = next((record[k] for k in QUESTION_FIELDS if record.get(k)), None)
+            if not question:
+                print(f"Skipping line {lineno}: no question field")
+                continue
+
+            qid = question_id(record, lineno, question)
+            if qid not in skip:
+                yield qid, question, record
+
+
+def batched(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# -- OUTPUT (resume) --
+def completed_ids(path):
+    """Ids already answered in a previous run; failed and half-written lines are retried."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    # errors="replace": a torn last line may end inside a multi-byte character
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue   # torn last line from a crash
+            if "error" not in entry and "id" in entry:
+                done.add(entry["id"])
+    return done
+
+
+class ResultWriter:
+    """Appends one JSON line per result, in completion order."""
+
+    def __init__(self, path, fsync_every=FSYNC_EVERY):
+        self.fsync_every = fsync_every
+        self.written = 0
+        self.f = open(path, "a", encoding="utf-8")
+
+        # A crash can leave a torn last line (possibly cut inside a multi-byte
+        # character); check the last byte in binary mode and start ours on a fresh line
+        if os.path.getsize(path) > 0:
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self.f.write("\n")
+
+    def write(self, entry):
+        self.f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.f.flush()
+        self.written += 1
+        if self.written % self.fsync_every == 0:
+            os.fsync(self.f.fileno())
+
+    def close(self):
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.f.close()
+
+
+# -- RATE LIMIT --
+class RateLimiter:
+    """Spaces request starts evenly so at most `rpm` begin per minute."""
+
+    def __init__(self, rpm):
+        self.interval = 60.0 / rpm if rpm else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+# -- PIPELINE --
+def answer_one(qid, question, candidates, generation, limiter_wait):
+    """Rerank + (cached) LLM call for one already-retrieved question; runs in a worker thread."""
+    start = time.perf_counter()
+    chunks, rerank = reranker.rerank(question, candidates, BULK_K, RERANK_BUDGET_MS if RERANK else 0)
+
+    qvec = query_cache.embed(question)      # already embedded in the batch step
+    chunk_ids = [c["chunk_id"] for c in chunks]
+
+    model_answer = answer_cache.lookup(question, qvec, chunk_ids, generation=generation)
+    cached = model_answer is not None
+    if not cached:
+        limiter_wait()
+        model_answer = ask_groq(question, chunks)
+        answer_cache.store(question, qvec, chunk_ids, model_answer, generation=generation)
+
+    model_answer, confidence = finalize_answer(model_answer)
+    return {
+        "id": qid,
+        "question": question,
+        "answer": model_answer,
+        "confidence": confidence,
+        "chunk_ids": chunk_ids,
+        "index_generation": generation,
+        "cached": cached,
+        "rerank_ms": rerank["rerank_ms"],
+        "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+
+
+async def run(input_path, output_path=BULK_OUTPUT, concurrency=BULK_CONCURRENCY,
+              rpm=BULK_RPM, batch_size=BULK_BATCH_SIZE):
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=concurrency + 1))
+
+    done = completed_ids(output_path)
+    if done:
+        print(f"Resuming: {len(done)} questions already answered in {output_path}")
+
+    limiter = RateLimiter(rpm)
+    queue = asyncio.Queue(maxsize=concurrency * 2)   # bounds how far embedding runs ahead
+    writer = ResultWriter(output_path)
+    decision_log = DecisionLog()
+    counts = {"answered": 0, "cached": 0, "errors": 0}
+    start = time.perf_counter()
+
+    def limiter_wait():
+        # Called from a worker thread: block it until the event loop grants a slot
+        asyncio.run_coroutine_threadsafe(limiter.acquire(), loop).result()
+
+    async def producer():
+        for batch in batched(read_questions(input_path, skip=done), batch_size):
+            # One forward pass + one FAISS search per batch; workers rerank and call the LLM
+            # Answers are tagged with the generation of the snapshot that was searched
+            snap = live_index.current()
+            retrieved = await asyncio.to_thread(retrieve_many, [q for _, q, _ in batch],
+                                                RERANK_CANDIDATES if RERANK else BULK_K, snap=snap)
+            for (qid, question, _), chunks in zip(batch, retrieved):
+                await queue.put((qid, question, chunks, snap.generation))
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            qid, question, chunks, generation = item
+            try:
+                entry = await asyncio.to_thread(answer_one, qid, question, chunks,
+                                                generation, limiter_wait)
+                counts["answered"] += 1
+                counts["cached"] += entry["cached"]
+                decision_log.append({
+                    "time": entry["time"],
+                    "question": question,
+                    "model_answer": entry["answer"],
+                    "confidence": entry["confidence"],
+                    "chunk_ids": entry["chunk_ids"],
+                    "index_generation": generation,
+                    "source": "bulk_eval"
+                })
+            except Exception as e:
+                entry = {"id": qid, "question": question, "error": f"{type(e).__name__}: {e}"}
+                counts["errors"] += 1
+            writer.write(entry)
+
+            finished = counts["answered"] + counts["errors"]
+            if finished % 10 == 0:
+                print(f"  {finished} done ({finished / (time.perf_counter() - start):.2f} q/s)")
+
+    try:
+        await asyncio.gather(producer(), *(worker() for _ in range(concurrency)))
+    finally:
+        writer.close()
+        decision_log.close()
+        query_cache.save()
+
+    elapsed = time.perf_counter() - start
+    finished = counts["answered"] + counts["errors"]
+    print(f"\nAnswered {counts['answered']} ({counts['cached']} from cache), "
+          f"{counts['errors']} failed, {len(done)} skipped in {elapsed:.1f}s"
+          + (f" ({finished / elapsed:.2f} q/s)" if elapsed and finished else ""))
+    print(f"Results -> {output_path}")
+    return counts
+
+
+# MAIN EXECUTION
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of visa questions")
+    parser.add_argument("input", help="JSONL file, one {\"question\": ...} object per line")
+    parser.add_argument("--output", default=BULK_OUTPUT,
+                        help=f"results file, appended to and resumed from (default {BULK_OUTPUT})")
+    parser.add_argument("--concurrency", type=int, default=BULK_CONCURRENCY,
+                        help=f"LLM calls in flight at once (default {BULK_CONCURRENCY})")
+    parser.add_argument("--rpm", type=float, default=BULK_RPM,
+                        help=f"max Groq requests per minute, 0 for no limit (default {BULK_RPM})")
+    parser.add_argument("--batch-size", type=int, default=BULK_BATCH_SIZE,
+                        help=f"questions embedded and searched per batch (default {BULK_BATCH_SIZE})")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        sys.exit(f"Input file not found: {args.input}")
+
+    try:
+        asyncio.run(run(args.input, args.output, args.concurrency, args.rpm, args.batch_size))
+    except KeyboardInterrupt:
+        print("\nInterrupted; run the same command again to resume.")
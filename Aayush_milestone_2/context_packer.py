@@ -0,0 +1,141 @@
+import os
+import math
+import threading
+
+# Context assembly between retrieval and the prompt:
+#   1. neighbouring chunks of the same PDF (chunk_id n, n+1, ...) are merged into one block
+#      and the words they share through the chunker's overlap are sent only once
+#   2. blocks keep the rank of their best chunk
+#   3. blocks are added until the token budget is used up; the last one is cut to fit
+CONTEXT_TOKEN_BUDGET = 1800
+MIN_PARTIAL_TOKENS = 60     # don't bother adding a cut block shorter than this
+MAX_OVERLAP_WORDS = 200     # longest overlap looked for between neighbouring chunks
+
+# Tokenizer of the Groq model (llama-3.1-8b-instant). The official repo is gated on the
+# Hugging Face hub; without access, a conservative characters-per-token estimate is used.
+CONTEXT_TOKENIZER = os.getenv("CONTEXT_TOKENIZER", "meta-llama/Llama-3.1-8B-Instruct")
+CHARS_PER_TOKEN = 3.5
+
+_tokenizer = None
+_tokenizer_failed = False
+_tokenizer_lock = threading.Lock()
+
+
+# -- TOKEN COUNTING --
+def get_tokenizer():
+    global _tokenizer, _tokenizer_failed
+    if _tokenizer is None and not _tokenizer_failed:
+        with _tokenizer_lock:
+            if _tokenizer is None and not _tokenizer_failed:
+                try:
+                    from transformers import AutoTokenizer
+                    _tokenizer = AutoTokenizer.from_pretrained(CONTEXT_TOKENIZER)
+                except Exception as e:   # missing package, gated repo, offline...
+                    print(f"Tokenizer {CONTEXT_TOKENIZER} unavailable, estimating tokens: {e}")
+                    _tokenizer_failed = True
+    return _tokenizer
+
+
+def count_tokens(text):
+    tokenizer = get_tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer.encode(text, add_special_tokens=False))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+# -- MERGING --
+def overlap_words(prev_words, next_words, max_overlap=MAX_OVERLAP_WORDS):
+    """Length of the longest suffix of prev_words that is also a prefix of next_words."""
+    for n in range(min(len(prev_words), len(next_words), max_overlap), 0, -1):
+        if prev_words[-n:] == next_words[:n]:
+            return n
+    return 0
+
+
+def merge_chunks(chunks):
+    """Group ranked chunks into blocks of consecutive chunks from the same PDF.
+
+    Returns blocks in rank order (a block ranks where its best chunk did), each
+    {"pdf_name", "chunk_ids", "text", "overlap_removed"}.
+    """
+    rank = {c["chunk_id"]: r for r, c in enumerate(chunks)}
+    ordered = sorted(chunks, key=lambda c: (c["pdf_name"], c["chunk_id"]))
+
+    blocks = []
+    for c in ordered:
+        last = blocks[-1] if blocks else None
+        if last and last["pdf_name"] == c["pdf_name"] and c["chunk_id"] == last["chunk_ids"][-1] + 1:
+            words = c["text"].split()
+            n = overlap_words(last["words"], words)
+            last["words"].extend(words[n:])
+            last["chunk_ids"].append(c["chunk_id"])
+            last["overlap_removed"] += n
+        else:
+            blocks.append({"pdf_name": c["pdf_name"], "chunk_ids": [c["chunk_id"]],
+                           "words": c["text"].split(), "overlap_removed": 0})
+
+    blocks.sort(key=lambda b: min(rank[i] for i in b["chunk_ids"]))
+    for b in blocks:
+        b["text"] = " ".join(b.pop("words"))
+    return blocks
+
+
+def _fit_words(text, budget):
+    """Longest word prefix of text that fits in `budget` tokens (binary search)."""
+    words = text.split()
+    lo, hi = 0, len(words)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count_tokens(" ".join(words[:mid])) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    return " ".join(words[:lo])
+
+
+# -- PACKING --
+def block_label(block):
+    ids = block["chunk_ids"]
+    return f"[CHUNK {ids[0]}]" if len(ids) == 1 else f"[CHUNK {ids[0]}-{ids[-1]}]"
+
+
+def pack_context(chunks, budget=CONTEXT_TOKEN_BUDGET, labels=True):
+    """Build the prompt context from ranked chunks; returns (context, stats)."""
+    blocks = merge_chunks(chunks)
+    parts = []
+    used = 0
+    truncated = False
+    dropped = 0
+
+    for block in blocks:
+        header = block_label(block) + "\n" if labels else ""
+        piece = header + block["text"]
+        cost = count_tokens(piece) + (2 if parts else 0)   # "\n\n" separator
+
+        if used + cost <= budget:
+            parts.append(piece)
+            used += cost
+            continue
+
+        remaining = budget - used - count_tokens(header) - (2 if parts else 0)
+        if remaining >= MIN_PARTIAL_TOKENS and not truncated:
+            text = _fit_words(block["text"], remaining)
+            if text:
+                piece = header + text
+                parts.append(piece)
+                used += count_tokens(piece) + (2 if len(parts) > 1 else 0)
+                truncated = True
+                continue
+        dropped += 1
+
+    stats = {
+        "chunks": len(chunks),
+        "blocks": len(blocks),
+        "overlap_words_removed": sum(b["overlap_removed"] for b in blocks),
+        "tokens": used,
+        "budget": budget,
+        "truncated": truncated,
+        "blocks_dropped": dropped,
+        "exact_tokens": get_tokenizer() is not None
+    }
+    return "\n\n".join(parts), stats
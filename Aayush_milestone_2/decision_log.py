@@ -0,0 +1,389 @@
+# Append-only log of answered questions, one compact JSON object per line.
+#
+#   decision_log/decisions-000007-20250101T120000.jsonl      active segment
+#   decision_log/decisions-000006-20241231T090000.jsonl.gz   rotated + compressed
+#
+# DecisionLog.append() only serializes the record and queues it; a background
+# thread writes queued records in batches, fsyncs according to FSYNC_POLICY and
+# starts a new segment once the active one is too big or too old.
+# read_decisions() streams every segment in order, compressed or not.
+#
+#   python decision_log.py cat --since 2025-01-01
+#   python decision_log.py import decision_history.json
+
+import os
+import re
+import gzip
+import json
+import time
+import queue
+import atexit
+import shutil
+import argparse
+import threading
+
+try:
+    import fcntl
+except ImportError:   # Windows: one writing process per log directory
+    fcntl = None
+
+DECISION_LOG_DIR = "decision_log"
+SEGMENT_PREFIX = "decisions"
+ROTATE_BYTES = 16 * 1024 * 1024   # start a new segment past this size...
+ROTATE_SECONDS = 24 * 3600        # ...or this age (0 = never by age)
+COMPRESS_ROTATED = True           # gzip segments once they are rotated out
+RETAIN_SECONDS = 90 * 24 * 3600   # rotated segments whose records are all older are deleted (0 = keep all)
+WRITE_BATCH_SIZE = 256            # records written per batch at most
+FLUSH_INTERVAL = 0.5              # seconds a queued record may wait to be written
+MAX_QUEUE = 10000                 # append() blocks when this many records are waiting
+
+# "always": fsync after every batch, "interval": at most every FSYNC_INTERVAL
+# seconds, "never": leave it to the OS. A crash loses at most the unsynced part.
+FSYNC_POLICIES = ("always", "interval", "never")
+FSYNC_POLICY = "interval"
+FSYNC_INTERVAL = 2.0
+
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+STAMP_FORMAT = "%Y%m%dT%H%M%S"
+SEGMENT_RE = re.compile(rf"^{SEGMENT_PREFIX}-(\d{{6}})-(\d{{8}}T\d{{6}})\.jsonl(\.gz)?$")
+LOCK_FILE = ".lock"
+
+_STOP = object()
+
+
+def now_iso():
+    return time.strftime(TIME_FORMAT)
+
+
+# -- SEGMENTS --
+def list_segments(directory=DECISION_LOG_DIR):
+    """[(seq, path, compressed, created ISO time)] of every segment, oldest first."""
+    if not os.path.isdir(directory):
+        return []
+    segments = []
+    for name in os.listdir(directory):
+        m = SEGMENT_RE.match(name)
+        if m:
+            created = time.strftime(TIME_FORMAT, time.strptime(m.group(2), STAMP_FORMAT))
+            segments.append((int(m.group(1)), os.path.join(directory, name), bool(m.group(3)), created))
+    return sorted(segments)
+
+
+def compress_segment(path):
+    """Gzip a rotated segment next to itself, then drop the plain copy."""
+    tmp = path + ".gz.tmp"
+    with open(path, "rb") as src, gzip.open(tmp, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.replace(tmp, path + ".gz")
+    os.remove(path)
+
+
+# -- WRITER --
+class DecisionLog:
+    """Background, batched JSONL writer with size/time rotation.
+
+    append() never waits for disk unless MAX_QUEUE records are already
+    waiting. flush() returns once everything appended before it is written
+    (and fsynced unless the policy is "never"); close() also stops the thread
+    and runs automatically at interpreter exit. Several processes may share a
+    directory: batches and rotations are serialized with a lock file. Rotated
+    segments past retain_seconds are deleted at the next rotation.
+    """
+
+    def __init__(self, directory=DECISION_LOG_DIR, rotate_bytes=ROTATE_BYTES,
+                 rotate_seconds=ROTATE_SECONDS, compress=COMPRESS_ROTATED, retain_seconds=RETAIN_SECONDS,
+                 fsync=FSYNC_POLICY, fsync_interval=FSYNC_INTERVAL, batch_size=WRITE_BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL, max_queue=MAX_QUEUE):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        self.directory = directory
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.compress = compress
+        self.retain_seconds = retain_seconds
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stats = {"written": 0, "batches": 0, "fsyncs": 0, "rotations": 0, "expired": 0}
+
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = open(os.path.join(directory, LOCK_FILE), "a")
+        self._file = None
+        self._dirty = False
+        self._last_sync = time.monotonic()
+        self._closed = False
+        self._queue = queue.Queue(max_queue)
+
+        with self._locked():
+            self._open_latest()
+
+        self._thread = threading.Thread(target=self._run, name="decision-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # Called from request threads
+    def append(self, record):
+        if self._closed:
+            raise ValueError("decision log is closed")
+        # Serialize here so a bad record fails in the caller, not in the writer thread
+        self._queue.put(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    def flush(self, timeout=None):
+        if self._closed:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._lock_file.close()
+        atexit.unregister(self.close)
+
+    # Writer thread
+    def _run(self):
+        stop = False
+        while not stop:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._idle()
+                continue
+
+            lines, waiting = [], []
+            while True:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiting.append(item)
+                else:
+                    lines.append(item)
+                if stop or len(lines) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            try:
+                if lines:
+                    self._write("".join(lines).encode("utf-8"), len(lines))
+                if waiting or stop:
+                    self._sync(force=True)
+            except OSError as e:
+                print(f"Decision log write failed, {len(lines)} records lost: {e}")
+            for done in waiting:
+                done.set()
+
+        if self._file is not None:
+            self._file.close()
+
+    def _idle(self):
+        try:
+            self._sync()
+            if self._file is not None and self._too_old():
+                with self._locked():
+                    self._rotate()
+        except OSError as e:
+            print(f"Decision log sync failed: {e}")
+
+    def _write(self, data, count):
+        with self._locked():
+            # Another process may have rotated the segment we had open
+            latest = list_segments(self.directory)
+            if not latest or latest[-1][1] != self._path:
+                self._open_latest()
+            # Other processes append to the same segment, so ask the file, not our own count
+            self._size = os.fstat(self._file.fileno()).st_size
+            if self._size and (self._size + len(data) > self.rotate_bytes or self._too_old()):
+                self._rotate()
+
+            self._file.write(data)
+            self._file.flush()
+            self._size += len(data)
+            self._dirty = True
+
+        self.stats["written"] += count
+        self.stats["batches"] += 1
+        self._sync(force=self.fsync == "always")
+
+    def _sync(self, force=False):
+        if not self._dirty or self.fsync == "never":
+            return
+        if force or time.monotonic() - self._last_sync >= self.fsync_interval:
+            os.fsync(self._file.fileno())
+            self._dirty = False
+            self._last_sync = time.monotonic()
+            self.stats["fsyncs"] += 1
+
+    def _too_old(self):
+        return bool(self.rotate_seconds) and self._size > 0 and \
+            time.time() - self._created >= self.rotate_seconds
+
+    # Segment files (callers hold the lock)
+    def _locked(self):
+        return _FileLock(self._lock_file)
+
+    def _open_latest(self):
+        """Reopen the newest plain segment if it still has room, otherwise start one."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        segments = list_segments(self.directory)
+        last = segments[-1] if segments else None
+        if last and not last[2]:
+            self._path = last[1]
+            self._created = time.mktime(time.strptime(last[3], TIME_FORMAT))
+            self._file = open(self._path, "ab")
+            self._size = self._file.tell()
+            # A crash can leave a torn last line; start ours on a fresh one
+            if self._size:
+                with open(self._path, "rb") as f:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        self._file.write(b"\n")
+                        self._size += 1
+            if self._size < self.rotate_bytes and not self._too_old():
+                return
+            self._rotate()
+            return
+
+        self._new_segment(last[0] + 1 if last else 0)
+
+    def _new_segment(self, seq):
+        self._created = time.time()
+        name = f"{SEGMENT_PREFIX}-{seq:06d}-{time.strftime(STAMP_FORMAT, time.localtime(self._created))}.jsonl"
+        self._path = os.path.join(self.directory, name)
+        self._file = open(self._path, "ab")
+        self._size = 0
+
+    def _rotate(self):
+        old = self._path
+        self._file.flush()
+        if self.fsync != "never":
+            os.fsync(self._file.fileno())
+        self._file.close()
+        self._dirty = False
+        seq = int(SEGMENT_RE.match(os.path.basename(old)).group(1))
+        self._new_segment(seq + 1)
+        if self.compress:
+            compress_segment(old)
+        self.stats["rotations"] += 1
+        if self.retain_seconds:
+            self._expire()
+
+    def _expire(self):
+        """Delete rotated segments that only hold records older than retain_seconds."""
+        cutoff = time.strftime(TIME_FORMAT, time.localtime(time.time() - self.retain_seconds))
+        segments = list_segments(self.directory)
+        for (_, path, _, _), following in zip(segments, segments[1:]):
+            # A segment's records are all older than the next segment's creation time
+            if following[3] >= cutoff:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue   # another writer expired it first
+            self.stats["expired"] += 1
+
+
+class _FileLock:
+    def __init__(self, f):
+        self.f = f
+
+    def __enter__(self):
+        if fcntl is not None:
+            fcntl.flock(self.f.fileno(), fcntl.LOCK_EX)
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.f.fileno(), fcntl.LOCK_UN)
+
+
+# -- READER --
+def read_decisions(directory=DECISION_LOG_DIR, since=None):
+    """Yield every logged record, oldest segment first; `since` is an ISO time prefix.
+
+    Records without a time (imported from old history files) always pass the
+    `since` filter, since there is no telling how old they are.
+    """
+    segments = list_segments(directory)
+    for i, (_, path, compressed, _) in enumerate(segments):
+        # Records in a segment are older than the next segment's creation time
+        if since and i + 1 < len(segments) and segments[i + 1][3] < since:
+            continue
+        # errors="replace": a torn last line may end inside a multi-byte character
+        try:
+            f = gzip.open(path, "rt", encoding="utf-8", errors="replace") if compressed \
+                else open(path, "r", encoding="utf-8", errors="replace")
+        except FileNotFoundError:
+            # Rotated + compressed while we were reading the list
+            if compressed or not os.path.exists(path + ".gz"):
+                continue
+            f = gzip.open(path + ".gz", "rt", encoding="utf-8", errors="replace")
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue   # torn last line from a crash
+                if since and record.get("time") and record["time"] < since:
+                    continue
+                yield record
+
+
+def read_legacy(path):
+    """Records of an old decision_history file: JSON objects one after another, pretty-printed or not."""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    decoder = json.JSONDecoder()
+    pos = 0
+    while True:
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+        if pos >= len(text):
+            return
+        try:
+            record, pos = decoder.raw_decode(text, pos)
+        except ValueError:
+            print(f"{path}: stopped at unreadable data (offset {pos})")
+            return
+        yield record
+
+
+# MAIN EXECUTION
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read or import the decision log")
+    parser.add_argument("--dir", default=DECISION_LOG_DIR, help="log directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    cat = sub.add_parser("cat", help="print every record as one JSON line")
+    cat.add_argument("--since", help="only records at or after this ISO time, e.g. 2025-01-01")
+    imp = sub.add_parser("import", help="append the records of old decision_history files")
+    imp.add_argument("paths", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "cat":
+        for record in read_decisions(args.dir, args.since):
+            print(json.dumps(record, ensure_ascii=False))
+    else:
+        log = DecisionLog(args.dir)
+        for path in args.paths:
+            # Old records carry no time; they were written no later than the file's last change
+            written_by = time.strftime(TIME_FORMAT, time.localtime(os.path.getmtime(path)))
+            count = 0
+            for record in read_legacy(path):
+                record.setdefault("source", os.path.basename(path))
+                if not record.get("time"):
+                    record["time"] = written_by
+                    record["time_estimated"] = True
+                log.append(record)
+                count += 1
+            print(f"{path}: {count} records")
+        log.close()
+        print("Written:", log.stats["written"])
@@ -0,0 +1,390 @@
+# Indexed copy of the decision history for audits and the app's history sidebar.
+#
+#   python decision_store.py ingest                      # decision_log/ (+ any files given)
+#   python decision_store.py find --eligibility No --destination schengen --max-confidence 0.5
+#   python decision_store.py stats --by destination --since 2025-01-01
+#   python decision_store.py purge --before 2025-01-01
+#
+# Records from the decision log segments (decision_log.py) and from older history
+# files (decision_history.json / .jsonl, pretty-printed or not) are loaded into
+# SQLite, with eligibility, confidence and destination pulled out of each answer
+# into indexed columns. Ingest is incremental: every source remembers how many
+# bytes of it were read, so a re-run only parses what was appended since.
+
+import os
+import re
+import sys
+import json
+import gzip
+import time
+import sqlite3
+import argparse
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Aayush_milestone_1"))
+from partitions import COUNTRY_PATTERNS, detect_partitions
+from decision_log import DECISION_LOG_DIR, list_segments
+
+DECISION_DB = "decision_history.db"
+ELIGIBILITY_VALUES = ("Yes", "No", "Partial")
+GROUP_BY = {
+    "eligibility": "{t}.eligibility",
+    "destination": "{t}.destination",
+    "day": "substr({t}.time, 1, 10)",
+    "month": "substr({t}.time, 1, 7)",
+}
+
+ELIGIBILITY_RE = re.compile(r"Eligibility:\W*(yes|no|partial)\b", re.IGNORECASE)
+CONFIDENCE_RE = re.compile(r"Confidence:\W*([0-9]*\.?[0-9]+)", re.IGNORECASE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS decisions (
+    id          INTEGER PRIMARY KEY,
+    source_key  TEXT NOT NULL UNIQUE,   -- "<source>:<end byte offset>", makes re-ingest a no-op
+    time        TEXT,                   -- ISO local time, NULL for old records without one
+    question    TEXT,
+    answer      TEXT,
+    eligibility TEXT,
+    confidence  REAL,
+    applicant   TEXT,
+    session     TEXT,                   -- app session that logged it (its sidebar shows only these)
+    record      TEXT NOT NULL           -- the full original record (JSON)
+);
+-- One row per destination a decision is about. time / eligibility / confidence are
+-- copied (logged records never change), so destination queries need no row lookups.
+CREATE TABLE IF NOT EXISTS decision_destinations (
+    destination TEXT NOT NULL,
+    decision_id INTEGER NOT NULL REFERENCES decisions(id),
+    time        TEXT,
+    eligibility TEXT,
+    confidence  REAL,
+    PRIMARY KEY (destination, decision_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS ingest_state (
+    source   TEXT PRIMARY KEY,
+    offset   INTEGER NOT NULL,           -- bytes read so far
+    complete INTEGER NOT NULL DEFAULT 0  -- 1 once a rotated segment has been read in full
+);
+CREATE INDEX IF NOT EXISTS decisions_time ON decisions(time, eligibility, confidence);
+CREATE INDEX IF NOT EXISTS decisions_eligibility ON decisions(eligibility, confidence, time);
+CREATE INDEX IF NOT EXISTS decisions_confidence ON decisions(confidence, time);
+CREATE INDEX IF NOT EXISTS destinations_eligibility
+    ON decision_destinations(destination, eligibility, confidence, time);
+CREATE INDEX IF NOT EXISTS destinations_time ON decision_destinations(destination, time);
+CREATE INDEX IF NOT EXISTS destinations_decision ON decision_destinations(decision_id);
+"""
+# Run after SCHEMA, once a store created before the session column has been migrated
+SESSION_INDEX = "CREATE INDEX IF NOT EXISTS decisions_session ON decisions(session, time)"
+
+
+# -- FIELD EXTRACTION --
+def parse_record(record):
+    """Indexed columns of one logged record: (time, question, answer, eligibility, confidence, destinations)."""
+    answer = record.get("model_answer") or record.get("answer") or ""
+    question = record.get("question") or ""
+
+    m = ELIGIBILITY_RE.search(answer)
+    eligibility = m.group(1).capitalize() if m else None
+
+    confidence = record.get("confidence")
+    if not isinstance(confidence, (int, float)):
+        m = CONFIDENCE_RE.search(answer)
+        confidence = float(m.group(1)) if m else None
+
+    # Destinations chosen in the app are logged; otherwise take the countries the question names
+    destinations = record.get("destinations") or detect_partitions(question, COUNTRY_PATTERNS)
+    return record.get("time"), question, answer, eligibility, confidence, destinations
+
+
+def iter_objects(data):
+    """Yield (end byte offset, record) for each JSON object in `data` (bytes).
+
+    Objects may be compact lines or pretty-printed; a torn line (crash) is
+    skipped, and an unfinished object at the very end is left for next time.
+    """
+    # surrogateescape keeps one character per undecodable byte, so offsets map back exactly
+    text = data.decode("utf-8", errors="surrogateescape")
+    decoder = json.JSONDecoder()
+    pos = 0
+    byte_pos, char_pos = 0, 0
+    while True:
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+        if pos >= len(text):
+            return
+        try:
+            record, pos = decoder.raw_decode(text, pos)
+        except ValueError:
+            newline = text.find("\n", pos)
+            if newline == -1:
+                return      # still being written
+            pos = newline + 1
+            continue
+        if isinstance(record, dict):
+            byte_pos += len(text[char_pos:pos].encode("utf-8", errors="surrogateescape"))
+            char_pos = pos
+            yield byte_pos, record
+
+
+# -- STORE --
+class DecisionStore:
+    """SQLite store of decisions; safe to share between threads (one lock around the connection)."""
+
+    def __init__(self, path=DECISION_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        # WAL lets the app read while a CLI ingest writes
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        columns = {r["name"] for r in self._db.execute("PRAGMA table_info(decisions)")}
+        if "session" not in columns:
+            with self._db:
+                self._db.execute("ALTER TABLE decisions ADD COLUMN session TEXT")
+                self._db.execute("UPDATE decisions SET session = json_extract(record, '$.session')")
+        self._db.execute(SESSION_INDEX)
+        self._last_ingest = {}
+
+    def close(self):
+        self._db.close()
+
+    # Ingest
+    def _ingest_source(self, source, f):
+        """Insert the records of file `f` past the stored offset of `source`; returns (new records, bytes)."""
+        row = self._db.execute("SELECT offset FROM ingest_state WHERE source = ?", (source,)).fetchone()
+        offset = row["offset"] if row else 0
+        # Only the appended part is read (a gzip file decompresses up to the offset)
+        f.seek(offset)
+        data = f.read()
+
+        added = 0
+        consumed = 0
+        for end, record in iter_objects(data):
+            consumed = end
+            time_, question, answer, eligibility, confidence, destinations = parse_record(record)
+            cur = self._db.execute(
+                "INSERT OR IGNORE INTO decisions (source_key, time, question, answer, eligibility, confidence, "
+                "applicant, session, record) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (f"{source}:{offset + end}", time_, question, answer, eligibility, confidence,
+                 record.get("applicant"), record.get("session"), json.dumps(record, ensure_ascii=False)))
+            if cur.rowcount:
+                added += 1
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO decision_destinations "
+                    "(destination, decision_id, time, eligibility, confidence) VALUES (?, ?, ?, ?, ?)",
+                    [(d, cur.lastrowid, time_, eligibility, confidence) for d in destinations])
+
+        if consumed:
+            self._db.execute("INSERT OR REPLACE INTO ingest_state (source, offset) VALUES (?, ?)",
+                             (source, offset + consumed))
+        return added, offset + len(data)
+
+    def ingest_file(self, path):
+        """Load an old history file (JSON objects one after another, pretty-printed or not)."""
+        with self._lock, self._db, open(path, "rb") as f:
+            before = self._rows()
+            added, _ = self._ingest_source(os.path.abspath(path), f)
+            self._refresh_stats(added, before)
+        return added
+
+    def ingest_log(self, directory=DECISION_LOG_DIR, min_interval=0):
+        """Load new records from every decision log segment; compressed segments are read once.
+
+        With min_interval set, a call within that many seconds of the previous
+        one for the same directory does nothing (the app calls this on every rerun).
+        """
+        added = 0
+        with self._lock, self._db:
+            now = time.monotonic()
+            if min_interval and now - self._last_ingest.get(directory, -min_interval) < min_interval:
+                return 0
+            self._last_ingest[directory] = now
+            before = self._rows()
+            complete = {r["source"] for r in self._db.execute("SELECT source FROM ingest_state WHERE complete")}
+            for _, path, compressed, _ in list_segments(directory):
+                # Keyed by the plain segment name, so gzipping it on rotation does not re-read it
+                source = os.path.join(os.path.abspath(directory), os.path.basename(path).removesuffix(".gz"))
+                if source in complete:
+                    continue
+                try:
+                    f = gzip.open(path, "rb") if compressed else open(path, "rb")
+                except FileNotFoundError:
+                    continue   # rotated + compressed meanwhile; picked up next time
+                with f:
+                    new, size = self._ingest_source(source, f)
+                added += new
+                if compressed:
+                    # A rotated segment never changes again
+                    self._db.execute("INSERT OR REPLACE INTO ingest_state (source, offset, complete) "
+                                     "VALUES (?, ?, 1)", (source, size))
+            self._refresh_stats(added, before)
+        return added
+
+    def purge(self, before):
+        """Delete decisions logged before `before` (ISO time); records without a time are kept."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM decision_destinations WHERE time < ?", (before,))
+            removed = self._db.execute("DELETE FROM decisions WHERE time < ?", (before,)).rowcount
+        return removed
+
+    def _rows(self):
+        return self._db.execute("SELECT count(*) FROM decisions").fetchone()[0]
+
+    def _refresh_stats(self, added, before):
+        # The planner needs fresh statistics to pick between the indexes; only worth
+        # redoing when the table grew noticeably
+        if added and added * 10 >= before:
+            self._db.execute("ANALYZE")
+
+    # Queries
+    @staticmethod
+    def _where(t, eligibility=None, destination=None, min_confidence=None, max_confidence=None,
+               since=None, until=None, text=None, session=None):
+        """WHERE clause + params on table alias `t` (its time / eligibility / confidence columns)."""
+        clauses, params = [], []
+        if destination:
+            clauses.append(f"{t}.destination = ?")
+            params.append(destination.lower())
+        if eligibility:
+            clauses.append(f"{t}.eligibility = ?")
+            params.append(eligibility.capitalize())
+        if min_confidence is not None:
+            clauses.append(f"{t}.confidence >= ?")
+            params.append(min_confidence)
+        if max_confidence is not None:
+            clauses.append(f"{t}.confidence < ?")
+            params.append(max_confidence)
+        if since:
+            clauses.append(f"{t}.time >= ?")
+            params.append(since)
+        if until:
+            clauses.append(f"{t}.time < ?")
+            params.append(until)
+        if text:
+            clauses.append("d.question LIKE ?")
+            params.append(f"%{text}%")
+        if session:
+            clauses.append("d.session = ?")
+            params.append(session)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def find(self, limit=50, **filters):
+        """Matching decisions, newest first (records without a time last).
+
+        Filters: eligibility, destination (partition key), min_confidence (>=),
+        max_confidence (<), since / until (ISO time prefixes), text (in the question),
+        session (app session id).
+        """
+        if filters.get("destination"):
+            source = "decision_destinations f JOIN decisions d ON d.id = f.decision_id"
+            t, key = "f", "decision_id"
+        else:
+            source, t, key = "decisions d", "d", "id"
+        where, params = self._where(t, **filters)
+        sql = (f"SELECT d.*, (SELECT group_concat(destination) FROM decision_destinations "
+               f"WHERE decision_id = d.id) AS destinations FROM {source}{where} "
+               f"ORDER BY {t}.time DESC, {t}.{key} DESC LIMIT ?")
+        with self._lock:
+            rows = self._db.execute(sql, params + [limit]).fetchall()
+        results = []
+        for row in rows:
+            item = dict(row)
+            item["record"] = json.loads(item["record"])
+            item["destinations"] = item["destinations"].split(",") if item["destinations"] else []
+            results.append(item)
+        return results
+
+    def aggregate(self, by="eligibility", **filters):
+        """[{group, count, avg_confidence}] over the matching decisions, largest group first.
+
+        by="destination" counts a decision once per destination it names and
+        leaves out decisions that name none.
+        """
+        if by not in GROUP_BY:
+            raise ValueError(f"by must be one of {tuple(GROUP_BY)}, got {by!r}")
+        if by == "destination" or filters.get("destination"):
+            source, t = "decision_destinations f", "f"
+            if filters.get("text") or filters.get("session"):
+                source += " JOIN decisions d ON d.id = f.decision_id"
+        else:
+            source, t = "decisions d", "d"
+        where, params = self._where(t, **filters)
+        sql = (f"SELECT {GROUP_BY[by].format(t=t)} AS grp, count(*) AS count, "
+               f"avg({t}.confidence) AS avg_confidence FROM {source}{where} GROUP BY grp ORDER BY count DESC")
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [{"group": r["grp"], "count": r["count"],
+                 "avg_confidence": round(r["avg_confidence"], 3) if r["avg_confidence"] is not None else None}
+                for r in rows]
+
+    def count(self):
+        with self._lock:
+            return self._rows()
+
+
+# MAIN EXECUTION
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Indexed queries over the decision history")
+    parser.add_argument("--db", default=DECISION_DB, help="SQLite file")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ing = sub.add_parser("ingest", help="load new records from decision logs and history files")
+    ing.add_argument("files", nargs="*", help="old history files, e.g. decision_history.json")
+    ing.add_argument("--log-dir", nargs="*", default=[DECISION_LOG_DIR], help="decision log directories")
+
+    def add_filters(p):
+        p.add_argument("--eligibility", choices=ELIGIBILITY_VALUES)
+        p.add_argument("--destination", help="partition key: " + ", ".join(COUNTRY_PATTERNS))
+        p.add_argument("--min-confidence", type=float)
+        p.add_argument("--max-confidence", type=float, help="exclusive upper bound")
+        p.add_argument("--since", help="ISO time, e.g. 2025-01-01")
+        p.add_argument("--until", help="ISO time, exclusive")
+        p.add_argument("--text", help="substring of the question")
+
+    find = sub.add_parser("find", help="list matching decisions, newest first")
+    add_filters(find)
+    find.add_argument("--limit", type=int, default=20)
+    find.add_argument("--json", action="store_true", help="print full records as JSON lines")
+
+    stats = sub.add_parser("stats", help="count and mean confidence per group")
+    add_filters(stats)
+    stats.add_argument("--by", choices=tuple(GROUP_BY), default="eligibility")
+
+    purge = sub.add_parser("purge", help="delete decisions logged before a date")
+    purge.add_argument("--before", required=True, help="ISO time, e.g. 2025-01-01")
+
+    args = parser.parse_args()
+    store = DecisionStore(args.db)
+    start = time.perf_counter()
+
+    if args.command == "ingest":
+        added = sum(store.ingest_log(d) for d in args.log_dir if os.path.isdir(d))
+        added += sum(store.ingest_file(f) for f in args.files)
+        print(f"Ingested {added} new decisions ({store.count()} total) "
+              f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+    elif args.command == "purge":
+        print(f"Deleted {store.purge(args.before)} decisions ({store.count()} left)")
+    else:
+        filters = {k: getattr(args, k) for k in ("eligibility", "destination", "min_confidence",
+                                                 "max_confidence", "since", "until", "text")}
+        if args.command == "find":
+            rows = store.find(limit=args.limit, **filters)
+            elapsed = (time.perf_counter() - start) * 1000
+            for r in rows:
+                if args.json:
+                    print(json.dumps(r["record"], ensure_ascii=False))
+                    continue
+                conf = f"{r['confidence']:.2f}" if r["confidence"] is not None else "  - "
+                print(f"{r['time'] or '-':19}  {r['eligibility'] or '-':7}  {conf}  "
+                      f"{','.join(r['destinations']) or '-':10}  {r['question'][:80]}")
+            print(f"{len(rows)} decisions in {elapsed:.1f} ms")
+        else:
+            rows = store.aggregate(by=args.by, **filters)
+            elapsed = (time.perf_counter() - start) * 1000
+            for r in rows:
+                avg = f"{r['avg_confidence']:.3f}" if r["avg_confidence"] is not None else "-"
+                print(f"{str(r['group']):12} {r['count']:>8}  avg confidence {avg}")
+            print(f"{len(rows)} groups in {elapsed:.1f} ms")
+
+    store.close()
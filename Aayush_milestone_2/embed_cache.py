@@ -0,0 +1,136 @@
+import os
+import atexit
+import threading
+from collections import OrderedDict
+import numpy as np
+
+EMBED_CACHE_SIZE = 2048
+
+
+def normalize_query(text):
+    # all-MiniLM-L6-v2 is uncased and splits on whitespace, so case and spacing
+    # changes give the same embedding - they should hit the same cache entry.
+    return " ".join(text.lower().split())
+
+
+class EmbeddingCache:
+    """Bounded LRU cache of query embeddings, keyed on the normalized text.
+
+    Thread-safe, so one instance can be shared by every Streamlit session.
+    With persist_path set, entries are loaded on start and written back on exit
+    (and every `autosave_every` new entries, by a background thread so no query
+    waits for the disk), so a restarted worker starts warm.
+    """
+
+    def __init__(self, embedder, model_name, max_size=EMBED_CACHE_SIZE,
+                 persist_path=None, autosave_every=100):
+        self.embedder = embedder
+        self.model_name = model_name
+        self.max_size = max_size
+        self.persist_path = persist_path
+        self.autosave_every = autosave_every
+
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._unsaved = 0
+        self._saving = False
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+
+        if persist_path:
+            self.load()
+            atexit.register(self.save)
+
+    # -- LOOKUP --
+    def _get(self, key):
+        with self._lock:
+            vec = self._entries.get(key)
+            if vec is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vec
+
+    def _put(self, key, vec):
+        with self._lock:
+            self._entries[key] = vec
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            self._unsaved += 1
+            autosave = self.persist_path and self._unsaved >= self.autosave_every and not self._saving
+            if autosave:
+                self._saving = True
+
+        if autosave:
+            threading.Thread(target=self._autosave, name="embed-cache-save", daemon=True).start()
+
+    def embed(self, text):
+        return self.embed_many([text])[0]
+
+    def embed_many(self, texts):
+        """Embed a list of texts, running the model once for all cache misses."""
+        keys = [normalize_query(t) for t in texts]
+        out = [self._get(k) for k in keys]
+
+        missing = sorted({k for k, v in zip(keys, out) if v is None})
+        if missing:
+            vectors = self.embedder.encode(missing, convert_to_numpy=True).astype("float32")
+            fresh = dict(zip(missing, vectors))
+            for k, vec in fresh.items():
+                self._put(k, vec)
+            out = [fresh[k] if v is None else v for k, v in zip(keys, out)]
+
+        return np.array(out, dtype="float32")
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+    # -- PERSISTENCE --
+    def load(self):
+        if not self.persist_path or not os.path.exists(self.persist_path):
+            return
+        try:
+            data = np.load(self.persist_path, allow_pickle=False)
+            if str(data["model"]) != self.model_name:
+                return
+            with self._lock:
+                for key, vec in zip(data["keys"], data["vectors"]):
+                    self._entries[str(key)] = vec
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        except (OSError, KeyError, ValueError):
+            # A damaged cache file only costs us a cold start
+            pass
+
+    def _autosave(self):
+        try:
+            self.save()
+        except OSError as e:
+            print(f"Query embedding cache save failed: {e}")
+        finally:
+            self._saving = False
+
+    def save(self):
+        if not self.persist_path:
+            return
+        with self._lock:
+            if not self._entries:
+                return
+            keys = np.array(list(self._entries.keys()))
+            vectors = np.stack(list(self._entries.values()))
+            self._unsaved = 0
+
+        with self._save_lock:
+            tmp = self.persist_path + ".tmp.npz"
+            np.savez(tmp, model=np.array(self.model_name), keys=keys, vectors=vectors)
+            os.replace(tmp, self.persist_path)
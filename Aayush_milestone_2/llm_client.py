@@ -0,0 +1,140 @@
+import os
+import time
+import random
+import threading
+import httpx
+import groq
+from groq import Groq
+
+LLM_MODEL = "llama-3.1-8b-instant"
+
+# Per-attempt timeout and overall deadline for one chat call (seconds)
+LLM_TIMEOUT = 30.0
+LLM_DEADLINE = 60.0
+
+# Retries on rate limits / server errors / dropped connections, with full-jitter backoff
+LLM_MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+RETRY_STATUS = (408, 409, 429, 500, 502, 503, 504)
+
+# Kept-alive HTTP connection pool shared by every call in the process
+POOL_MAX_CONNECTIONS = 20
+POOL_MAX_KEEPALIVE = 10
+POOL_KEEPALIVE_EXPIRY = 60.0
+
+_client = None
+_client_lock = threading.Lock()
+
+
+# -- SHARED CLIENT --
+def get_client(api_key=None, base_url=None):
+    """Return the process-wide Groq client, creating it on first use.
+
+    base_url (or the GROQ_BASE_URL env var) points the client at another
+    endpoint, e.g. a local mock server in tests and benchmarks.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                http_client = httpx.Client(
+                    limits=httpx.Limits(max_connections=POOL_MAX_CONNECTIONS,
+                                        max_keepalive_connections=POOL_MAX_KEEPALIVE,
+                                        keepalive_expiry=POOL_KEEPALIVE_EXPIRY),
+                    timeout=LLM_TIMEOUT
+                )
+                _client = Groq(
+                    api_key=api_key or os.getenv("GROQ_API_KEY"),
+                    base_url=base_url or os.getenv("GROQ_BASE_URL"),
+                    http_client=http_client,
+                    max_retries=0  # retries are handled below, within the call deadline
+                )
+    return _client
+
+
+def reset_client():
+    """Close the shared client (and its connections); the next call creates a new one."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+# -- RETRY POLICY --
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _should_retry(error):
+    if isinstance(error, groq.APIConnectionError):   # includes APITimeoutError
+        return True
+    return isinstance(error, groq.APIStatusError) and error.status_code in RETRY_STATUS
+
+
+def _backoff(attempt):
+    # Full jitter: spread retries from many workers instead of retrying in lockstep
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+# -- CHAT CALL --
+def create_completion(messages, model=LLM_MODEL, temperature=0.0, timeout=LLM_TIMEOUT,
+                      deadline=LLM_DEADLINE, max_retries=LLM_MAX_RETRIES, client=None, **kwargs):
+    """chat.completions.create with a per-attempt timeout, an overall deadline
+    and jittered retries on 429/5xx/connection errors."""
+    client = client or get_client()
+    start = time.monotonic()
+    attempt = 0
+
+    while True:
+        remaining = deadline - (time.monotonic() - start)
+        if remaining <= 0:
+            raise groq.APITimeoutError(request=httpx.Request("POST", str(client.base_url)))
+
+        try:
+            return client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                timeout=min(timeout, remaining),
+                **kwargs
+            )
+        except groq.APIError as e:
+            if attempt >= max_retries or not _should_retry(e):
+                raise
+
+            delay = _retry_after(e)
+            if delay is None:
+                delay = _backoff(attempt)
+            if delay >= deadline - (time.monotonic() - start):
+                raise
+
+            time.sleep(delay)
+            attempt += 1
+
+
+def chat(prompt, **kwargs):
+    """Send one user prompt and return the answer text."""
+    resp = create_completion([{"role": "user", "content": prompt}], **kwargs)
+    return resp.choices[0].message.content
+
+
+def chat_stream(prompt, **kwargs):
+    """Send one user prompt and yield the answer text piece by piece as it arrives.
+
+    Retries only cover opening the stream; once tokens flow, errors are raised.
+    """
+    stream = create_completion([{"role": "user", "content": prompt}], stream=True, **kwargs)
+    try:
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        stream.close()
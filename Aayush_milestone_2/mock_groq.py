@@ -0,0 +1,180 @@
+# Local stand-in for the Groq chat-completions endpoint, for load tests and CI.
+#
+#   python mock_groq.py --port 8765 --latency 0.3 --tokens-per-sec 200 --error-rate 0.05
+#   GROQ_BASE_URL=http://127.0.0.1:8765 GROQ_API_KEY=mock python ask_query.py
+#
+# It answers POST /openai/v1/chat/completions (plain and stream=true) with a canned
+# answer in the eligibility format, after a configurable time-to-first-token and
+# at a configurable token rate, and fails a configurable share of requests with
+# 429 / 5xx so the client's retry path is exercised too.
+
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+MOCK_HOST = "127.0.0.1"
+MOCK_PORT = 8765
+MOCK_LATENCY = 0.3          # seconds before the first token
+MOCK_JITTER = 0.1           # +/- uniform jitter on the latency
+MOCK_TOKENS_PER_SEC = 200   # generation speed after the first token (0 = instant)
+MOCK_ERROR_RATE = 0.0       # share of requests answered with an error status
+MOCK_ERROR_STATUS = (429, 500, 503)
+
+CHAT_PATH = "/openai/v1/chat/completions"
+
+MOCK_ANSWER = """Eligibility: Partial
+Final Answer: The applicant meets the basic requirements in the provided documents, but financial proof and travel purpose must be confirmed before a decision.
+Explanation:
+- A valid passport and a completed application form are required.
+- Proof of sufficient funds for the whole stay must be shown.
+- The purpose of travel has to match the visa category applied for.
+- Previous refusals must be declared and may lead to extra checks.
+Confidence: 0.7"""
+
+
+def _tokens(text):
+    # Roughly one token per word, keeping whitespace so the joined stream equals the text
+    words = text.split(" ")
+    return [w if i == len(words) - 1 else w + " " for i, w in enumerate(words)]
+
+
+class MockGroqHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, like the real API behind the pooled client
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+    config = None                   # set on the subclass built by make_server()
+
+    def log_message(self, format, *args):
+        pass  # quiet; the benchmark prints its own summary
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._send_json(400, {"error": {"message": "invalid JSON", "type": "invalid_request_error"}})
+
+        if self.path.rstrip("/") != CHAT_PATH:
+            return self._send_json(404, {"error": {"message": f"unknown path {self.path}", "type": "not_found"}})
+
+        cfg = self.config
+        cfg.count("requests")
+        time.sleep(max(0.0, cfg.latency + random.uniform(-cfg.jitter, cfg.jitter)))
+
+        if random.random() < cfg.error_rate:
+            cfg.count("errors")
+            status = random.choice(MOCK_ERROR_STATUS)
+            headers = {"retry-after": "0.1"} if status == 429 else None
+            return self._send_json(status, {"error": {"message": "mock failure", "type": "server_error"}}, headers)
+
+        model = request.get("model", "mock")
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in request.get("messages", []))
+        tokens = _tokens(cfg.answer)
+        delay = 1.0 / cfg.tokens_per_sec if cfg.tokens_per_sec else 0.0
+        created = int(time.time())
+        completion_id = f"chatcmpl-mock-{random.getrandbits(48):012x}"
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                 "total_tokens": prompt_tokens + len(tokens)}
+
+        if not request.get("stream"):
+            time.sleep(delay * len(tokens))
+            return self._send_json(200, {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": cfg.answer}}],
+                "usage": usage
+            })
+
+        # Server-sent events, one chunk per token, then [DONE]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send(payload):
+            data = f"data: {payload}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        for i, token in enumerate(tokens):
+            last = i == len(tokens) - 1
+            send(json.dumps({
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {"content": token} if i else {"role": "assistant", "content": token},
+                             "finish_reason": "stop" if last else None}]
+            }))
+            if not last:
+                time.sleep(delay)
+        send("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class MockConfig:
+    def __init__(self, latency=MOCK_LATENCY, jitter=MOCK_JITTER, tokens_per_sec=MOCK_TOKENS_PER_SEC,
+                 error_rate=MOCK_ERROR_RATE, answer=MOCK_ANSWER):
+        self.latency = latency
+        self.jitter = min(jitter, latency)
+        self.tokens_per_sec = tokens_per_sec
+        self.error_rate = error_rate
+        self.answer = answer
+        self.stats = {"requests": 0, "errors": 0}
+        self._lock = threading.Lock()
+
+    def count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+
+def make_server(host=MOCK_HOST, port=MOCK_PORT, **options):
+    """Build (but don't start) a mock server; port=0 picks a free port."""
+    config = MockConfig(**options)
+    handler = type("ConfiguredMockGroqHandler", (MockGroqHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.config = config
+    return server
+
+
+def start_in_thread(host=MOCK_HOST, port=0, **options):
+    """Run a mock server in a daemon thread; returns (server, base_url)."""
+    server = make_server(host, port, **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+# MAIN EXECUTION
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local mock of the Groq chat-completions API")
+    parser.add_argument("--host", default=MOCK_HOST)
+    parser.add_argument("--port", type=int, default=MOCK_PORT)
+    parser.add_argument("--latency", type=float, default=MOCK_LATENCY,
+                        help=f"seconds before the first token (default {MOCK_LATENCY})")
+    parser.add_argument("--jitter", type=float, default=MOCK_JITTER,
+                        help=f"+/- random jitter on the latency (default {MOCK_JITTER})")
+    parser.add_argument("--tokens-per-sec", type=float, default=MOCK_TOKENS_PER_SEC,
+                        help=f"generation speed, 0 for instant (default {MOCK_TOKENS_PER_SEC})")
+    parser.add_argument("--error-rate", type=float, default=MOCK_ERROR_RATE,
+                        help="share of requests failed with 429/500/503 (default 0)")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, latency=args.latency, jitter=args.jitter,
+                         tokens_per_sec=args.tokens_per_sec, error_rate=args.error_rate)
+    print(f"Mock Groq server on http://{args.host}:{server.server_address[1]}  "
+          f"(set GROQ_BASE_URL to this, GROQ_API_KEY to anything)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nServed {server.config.stats['requests']} requests "
+              f"({server.config.stats['errors']} failed on purpose)")
@@ -0,0 +1,77 @@
+import time
+import threading
+
+# Second retrieval stage: a small CPU cross-encoder rescores the ANN candidates
+# (question and chunk read together) and only the best k go into the prompt.
+RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANK_CANDIDATES = 20     # ANN top-N handed to the reranker
+RERANK_BUDGET_MS = 250     # stop scoring new batches once this is spent
+RERANK_BATCH_SIZE = 8      # candidates scored per forward pass
+RERANK_MAX_LENGTH = 384    # tokens of question + chunk; shorter is faster on CPU
+
+
+class Reranker:
+    """Cross-encoder reranking under a time budget.
+
+    Candidates are scored in ANN order, one batch at a time; a batch is only
+    started if the time left covers what the previous batch took. Scored
+    candidates are ranked by cross-encoder score, the unscored rest keep their
+    ANN order behind them, and the list is trimmed to k. The model is loaded on
+    first use; if it cannot be loaded, the ANN order is returned unchanged.
+    """
+
+    def __init__(self, model_name=RERANK_MODEL, batch_size=RERANK_BATCH_SIZE,
+                 max_length=RERANK_MAX_LENGTH, device="cpu"):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.device = device
+        self._model = None
+        self._failed = False
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None and not self._failed:
+            with self._lock:
+                if self._model is None and not self._failed:
+                    try:
+                        from sentence_transformers import CrossEncoder
+                        self._model = CrossEncoder(self.model_name, max_length=self.max_length,
+                                                   device=self.device)
+                    except Exception as e:   # missing package, offline, broken weights...
+                        print(f"Reranker unavailable, using ANN order: {e}")
+                        self._failed = True
+        return self._model
+
+    def rerank(self, query, chunks, k=5, budget_ms=RERANK_BUDGET_MS):
+        """Return (best k chunks, stats) for one query."""
+        model = self.model if budget_ms and budget_ms > 0 else None
+        start = time.perf_counter()
+        scores = []
+        last_batch_ms = 0.0
+        budget_hit = False
+
+        if model is not None:
+            for i in range(0, len(chunks), self.batch_size):
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                if scores and elapsed_ms + last_batch_ms > budget_ms:
+                    budget_hit = True
+                    break
+
+                batch_start = time.perf_counter()
+                pairs = [(query, c["text"]) for c in chunks[i:i + self.batch_size]]
+                scores.extend(float(s) for s in model.predict(pairs, batch_size=self.batch_size,
+                                                                show_progress_bar=False))
+                last_batch_ms = (time.perf_counter() - batch_start) * 1000
+
+        order = sorted(range(len(scores)), key=lambda j: scores[j], reverse=True)
+        ranked = [chunks[j] for j in order] + list(chunks[len(scores):])
+
+        return ranked[:k], {
+            "candidates": len(chunks),
+            "scored": len(scores),
+            "budget_ms": budget_ms,
+            "budget_hit": budget_hit,
+            "rerank_ms": round((time.perf_counter() - start) * 1000, 2)
+        }
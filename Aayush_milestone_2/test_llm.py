@@ -1,49 +1,19 @@
-from groq import Groq
-from dotenv import load_dotenv
-import os
-import json
-import faiss
-import numpy as np
-from sentence_transformers import SentenceTransformer
+from llm_client import chat
+from context_packer import pack_context
 
-#  load enviroment variables 
-
-load_dotenv()
-api_key = os.getenv("GROQ_API_KEY")
-client = Groq(api_key=api_key)
-
-# Load embedder + FAISS + metadata
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
-index = faiss.read_index("../Aayush_milestone_1/outputs/visa_index.faiss")
-
-
-with open("../Aayush_milestone_1/outputs/json/visa_metadata.json", "r", encoding="utf-8") as f:
-    metadata = json.load(f)
-
-
-def embed_text(text):
-    return embedder.encode([text])[0].astype("float32")
-
-
-def retrieve_chunks(query, k=5):
-    qvec = embed_text(query)
-    _, ids = index.search(np.array([qvec]), k)
-
-    chunks = []
-    for cid in ids[0]:
-        if cid == -1:
-            continue
-        chunks.append(metadata[cid])
-
-    return chunks
+# Embedder, query cache, live index and the batched retrieval (routing, hybrid
+# mode, snapshot pinning) are shared with ask_query.py rather than repeated here
+from ask_query import live_index, query_cache, embed_text, retrieve_many, retrieve_chunks
 
 
 def format_chunks(chunks):
-    """Cleaner chunk formatting before sending to model."""
-    formatted = []
-    for c in chunks:
-        formatted.append(f"[CHUNK {c['chunk_id']}]\n{c['text']}")
-    return "\n\n".join(formatted)
+    """Cleaner chunk formatting before sending to model.
+
+    Neighbouring chunks of a PDF are merged with their overlap removed, and the
+    whole context is kept within the token budget (context_packer.py).
+    """
+    context, _ = pack_context(chunks)
+    return context
 
 
 def ask_groq_from_pdf(question, chunks):
@@ -64,13 +34,7 @@ Return:
 3. Confidence (0–1)
 """
 
-    resp = client.chat.completions.create(
-        model="llama-3.1-8b-instant",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.0
-    )
-
-    return resp.choices[0].message.content
+    return chat(prompt, temperature=0.0)
 
 
 if __name__ == "__main__":
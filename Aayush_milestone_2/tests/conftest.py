@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Same import layout as the scripts: milestone 2 modules plus milestone 1 on the path
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(1, os.path.join(HERE, "..", "..", "Aayush_milestone_1"))
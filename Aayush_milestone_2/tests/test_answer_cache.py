@@ -0,0 +1,62 @@
+import json
+
+import numpy as np
+
+from answer_cache import AnswerCache
+
+PROFILE = {"name": "Priya Sharma", "age": "17", "nationality": "India"}
+
+
+def vec(*values):
+    return np.array(values, dtype="float32")
+
+
+def test_exact_and_semantic_hits():
+    cache = AnswerCache()
+    cache.store("Do I need a visa?", vec(1, 0), [3, 1], "yes", PROFILE, "g1")
+
+    assert cache.lookup("do i need  a VISA?", None, [1, 3], PROFILE, "g1") == "yes"
+    assert cache.lookup("Is a visa required?", vec(1, 0.01), [1, 3], PROFILE, "g1") == "yes"
+    assert cache.lookup("Is a visa required?", vec(0, 1), [1, 3], PROFILE, "g1") is None
+    assert cache.stats()["semantic_hits"] == 1
+
+
+def test_profile_chunks_and_numbers_must_match():
+    cache = AnswerCache()
+    cache.store("Can I stay 90 days?", vec(1, 0), [1], "yes", PROFILE, "g1")
+
+    assert cache.lookup("Can I stay 90 days?", vec(1, 0), [1], dict(PROFILE, age="71"), "g1") is None
+    assert cache.lookup("Can I stay 90 days?", vec(1, 0), [2], PROFILE, "g1") is None
+    assert cache.lookup("Can I stay 180 days?", vec(1, 0), [1], PROFILE, "g1") is None
+
+
+def test_generations_are_isolated():
+    cache = AnswerCache()
+    cache.store("Fee?", vec(1, 0), [1], "old", generation="g1")
+    cache.store("Fee?", vec(1, 0), [1], "new", generation="g2")
+
+    assert cache.lookup("Fee?", vec(1, 0), [1], generation="g1") == "old"
+    assert cache.lookup("Fee?", vec(1, 0), [1], generation="g2") == "new"
+
+
+def test_persisted_file_has_no_applicant_details(tmp_path):
+    path = tmp_path / "answer_cache.json"
+    cache = AnswerCache(persist_path=str(path))
+    cache.store("Do I need a visa?", vec(1, 0), [1], "yes", PROFILE, "g1")
+    cache.save()
+
+    text = path.read_text(encoding="utf-8")
+    assert "Priya" not in text and "India" not in text
+
+    warm = AnswerCache(persist_path=str(path))
+    assert warm.lookup("Do I need a visa?", None, [1], PROFILE, "g1") == "yes"
+
+
+def test_entries_from_older_versions_are_dropped(tmp_path):
+    path = tmp_path / "answer_cache.json"
+    path.write_text(json.dumps({"entries": [
+        {"chunk_ids": [1], "profile": "", "question": "fee?", "answer": "a", "vector": [1.0], "time": 0},
+        {"generation": "", "chunk_ids": [1], "profile": "name=priya", "question": "fee?",
+         "answer": "b", "vector": [1.0], "time": 0},
+    ]}), encoding="utf-8")
+    assert AnswerCache(persist_path=str(path)).stats()["size"] == 0
@@ -0,0 +1,39 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+MILESTONE_2 = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def bulk_eval(monkeypatch):
+    # ask_query loads the index from a path relative to milestone 2
+    monkeypatch.chdir(MILESTONE_2)
+    import bulk_eval
+    return bulk_eval
+
+
+def test_resume_after_torn_multibyte_line(tmp_path, bulk_eval):
+    path = tmp_path / "bulk_results.jsonl"
+    done = json.dumps({"id": "1", "answer": "Fee is €90"}, ensure_ascii=False) + "\n"
+    failed = json.dumps({"id": "2", "error": "timeout"}) + "\n"
+    # Crash mid-write: the last line stops after the first byte of "€"
+    torn = '{"id": "3", "answer": "€90"}'.encode("utf-8")
+    path.write_bytes((done + failed).encode("utf-8") + torn[:torn.index(b"\xe2") + 1])
+
+    assert bulk_eval.completed_ids(str(path)) == {"1"}
+
+    writer = bulk_eval.ResultWriter(str(path))
+    writer.write({"id": "3", "answer": "€90"})
+    writer.close()
+    assert bulk_eval.completed_ids(str(path)) == {"1", "3"}
+
+
+def test_question_ids(tmp_path, bulk_eval):
+    path = tmp_path / "questions.jsonl"
+    path.write_text('{"id": 7, "question": "a"}\nnot json\n{"body": "b"}\n{"id": 9}\n', encoding="utf-8")
+    questions = list(bulk_eval.read_questions(str(path), skip={"7"}))
+    assert [(q, text) for q, text, _ in questions] == [(bulk_eval.question_id({}, 3, "b"), "b")]
@@ -0,0 +1,51 @@
+import pytest
+
+import context_packer
+from context_packer import count_tokens, merge_chunks, overlap_words, pack_context
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    # Never download the gated tokenizer in tests; use the characters-per-token estimate
+    monkeypatch.setattr(context_packer, "_tokenizer", None)
+    monkeypatch.setattr(context_packer, "_tokenizer_failed", True)
+
+
+def chunk(pdf, cid, text):
+    return {"pdf_name": pdf, "chunk_id": cid, "text": text}
+
+
+def test_overlap_words():
+    assert overlap_words("a b c d".split(), "c d e".split()) == 2
+    assert overlap_words("a b".split(), "c d".split()) == 0
+    assert overlap_words("a b c".split(), "b c d".split(), max_overlap=1) == 0
+
+
+def test_neighbours_merge_without_repeating_overlap():
+    chunks = [
+        chunk("UK.pdf", 11, "fee is 115 pounds. Apply online"),
+        chunk("Canada.pdf", 3, "study permit rules"),
+        chunk("UK.pdf", 10, "Visitor visa. The fee is 115 pounds."),
+        chunk("UK.pdf", 13, "biometrics appointment"),
+    ]
+    blocks = merge_chunks(chunks)
+
+    # The merged block ranks where chunk 11 did; chunk 13 is not adjacent to 11
+    assert [b["chunk_ids"] for b in blocks] == [[10, 11], [3], [13]]
+    assert blocks[0]["text"] == "Visitor visa. The fee is 115 pounds. Apply online"
+    assert blocks[0]["overlap_removed"] == 4
+
+    context, stats = pack_context(chunks)
+    assert context.startswith("[CHUNK 10-11]\nVisitor visa.")
+    assert stats["blocks"] == 3 and stats["overlap_words_removed"] == 4 and not stats["truncated"]
+
+
+def test_budget_cuts_last_block_and_drops_the_rest():
+    chunks = [chunk("A.pdf", i * 10, " ".join(["word"] * 200)) for i in range(3)]
+    budget = count_tokens("[CHUNK 0]\n" + chunks[0]["text"]) + 100
+    context, stats = pack_context(chunks, budget=budget)
+
+    assert stats["tokens"] <= budget
+    assert stats["truncated"] and stats["blocks_dropped"] == 1
+    assert context.count("[CHUNK") == 2 and "[CHUNK 20]" not in context
+    assert not stats["exact_tokens"]
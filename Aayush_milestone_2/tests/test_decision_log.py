@@ -0,0 +1,78 @@
+import gzip
+import os
+
+import pytest
+
+from decision_log import DecisionLog, list_segments, read_decisions, read_legacy
+
+
+@pytest.fixture
+def open_log(tmp_path):
+    logs = []
+
+    def open_log(**options):
+        log = DecisionLog(str(tmp_path), fsync="never", **options)
+        logs.append(log)
+        return log
+
+    yield open_log
+    for log in logs:
+        log.close()
+
+
+def test_append_flush_read(tmp_path, open_log):
+    log = open_log()
+    log.append({"time": "2025-01-01T10:00:00", "question": "Fee for €90?"})
+    log.append({"question": "imported, no time"})
+    assert log.flush(timeout=5)
+
+    assert [r["question"] for r in read_decisions(str(tmp_path))] == ["Fee for €90?", "imported, no time"]
+    # Records without a time always pass the filter
+    assert [r["question"] for r in read_decisions(str(tmp_path), since="2025-02")] == ["imported, no time"]
+    with pytest.raises(TypeError):
+        log.append({"bad": object()})
+
+
+def test_rotation_compresses_and_keeps_order(tmp_path, open_log):
+    log = open_log(rotate_bytes=100)
+    for i in range(6):
+        log.append({"i": i, "text": "x" * 40})
+        log.flush(timeout=5)
+
+    segments = list_segments(str(tmp_path))
+    assert len(segments) > 2 and log.stats["rotations"] == len(segments) - 1
+    assert all(compressed for _, _, compressed, _ in segments[:-1]) and not segments[-1][2]
+    assert [r["i"] for r in read_decisions(str(tmp_path))] == list(range(6))
+
+
+def test_torn_last_line(tmp_path, open_log):
+    path = tmp_path / "decisions-000000-20250101T120000.jsonl"
+    path.write_bytes('{"i":0}\n{"i":1,"answer":"€'.encode("utf-8")[:-2])
+
+    log = open_log(rotate_seconds=0)
+    log.append({"i": 2})
+    log.flush(timeout=5)
+    assert [r["i"] for r in read_decisions(str(tmp_path))] == [0, 2]
+
+
+def test_old_segments_expire_at_rotation(tmp_path, open_log):
+    for seq, stamp in enumerate(["20200101T000000", "20200102T000000"]):
+        with gzip.open(tmp_path / f"decisions-{seq:06d}-{stamp}.jsonl.gz", "wt") as f:
+            f.write('{"i":0}\n')
+    (tmp_path / "decisions-000002-20200103T000000.jsonl").write_text('{"i":1}\n')
+
+    log = open_log(retain_seconds=3600, rotate_bytes=10)
+    log.append({"i": 2})
+    log.flush(timeout=5)
+
+    # Opening rotated the day-old segment 2; 0 and 1 only hold records from before
+    # segment 2 was created, segment 2 may hold some up to now
+    names = sorted(os.listdir(tmp_path))
+    assert not any(n.startswith(("decisions-000000", "decisions-000001")) for n in names)
+    assert log.stats["expired"] == 2 and [r["i"] for r in read_decisions(str(tmp_path))] == [1, 2]
+
+
+def test_read_legacy(tmp_path):
+    path = tmp_path / "decision_history.json"
+    path.write_text('{\n  "question": "a"\n}\n{"question": "b"}\n{"question": ', encoding="utf-8")
+    assert [r["question"] for r in read_legacy(str(path))] == ["a", "b"]
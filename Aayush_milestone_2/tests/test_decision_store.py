@@ -0,0 +1,92 @@
+import json
+import sqlite3
+
+import pytest
+
+from decision_log import compress_segment
+from decision_store import DecisionStore, iter_objects
+
+
+def line(question, answer, time="2025-01-01T10:00:00", **extra):
+    return json.dumps(dict(extra, time=time, question=question, model_answer=answer)) + "\n"
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = DecisionStore(str(tmp_path / "decisions.db"))
+    yield store
+    store.close()
+
+
+def test_iter_objects_offsets():
+    data = '{"a": "€"}\n{"b":\n  1}\n{"torn": \n{"c": 2}\n{"unfinished": '.encode("utf-8")
+    objects = list(iter_objects(data))
+    assert [r for _, r in objects] == [{"a": "€"}, {"b": 1}, {"c": 2}]
+    assert data[:objects[-1][0]].endswith(b'{"c": 2}')
+
+
+def test_ingest_is_incremental(tmp_path, store):
+    logs = tmp_path / "decision_log"
+    logs.mkdir()
+    segment = logs / "decisions-000000-20250101T100000.jsonl"
+    segment.write_text(line("UK visa fee?", "Eligibility: Yes\nConfidence: 0.9"), encoding="utf-8")
+
+    assert store.ingest_log(str(logs)) == 1
+    assert store.ingest_log(str(logs)) == 0
+
+    with open(segment, "a", encoding="utf-8") as f:
+        f.write(line("Going to Canada?", "Eligibility: No", confidence=0.4, session="s1"))
+        f.write('{"question": "half writ')
+    assert store.ingest_log(str(logs)) == 1
+
+    # Rotation gzips the segment; what was already read is not read again
+    compress_segment(str(segment))
+    assert store.ingest_log(str(logs)) == 0
+    assert store.count() == 2
+
+
+def test_min_interval(tmp_path, store):
+    logs = tmp_path / "decision_log"
+    logs.mkdir()
+    store.ingest_log(str(logs), min_interval=60)
+    (logs / "decisions-000000-20250101T100000.jsonl").write_text(line("a", "b"), encoding="utf-8")
+    assert store.ingest_log(str(logs), min_interval=60) == 0
+    assert store.ingest_log(str(logs)) == 1
+
+
+def test_find_and_purge(tmp_path, store):
+    path = tmp_path / "decision_history.json"
+    path.write_text(
+        line("Schengen visa from India?", "Eligibility: No\nConfidence: 0.3", time="2024-06-01T09:00:00")
+        + line("UK visitor visa?", "Eligibility: Yes", confidence=0.8, session="s1")
+        + json.dumps({"question": "Old record for Canada", "answer": "Eligibility: Partial"}, indent=2) + "\n",
+        encoding="utf-8")
+    assert store.ingest_file(str(path)) == 3
+
+    assert [r["question"] for r in store.find(destination="schengen")] == ["Schengen visa from India?"]
+    assert [r["confidence"] for r in store.find(eligibility="yes")] == [0.8]
+    assert [r["question"] for r in store.find(session="s1")] == ["UK visitor visa?"]
+    assert [r["question"] for r in store.find(max_confidence=0.5)] == ["Schengen visa from India?"]
+    assert store.find()[-1]["time"] is None
+
+    assert store.purge("2025-01-01") == 1
+    assert store.count() == 2 and store.find(destination="schengen") == []
+    with pytest.raises(ValueError):
+        store.aggregate(by="applicant")
+
+
+def test_migrates_store_without_session_column(tmp_path):
+    path = str(tmp_path / "old.db")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE decisions (id INTEGER PRIMARY KEY, source_key TEXT NOT NULL UNIQUE, time TEXT, "
+               "question TEXT, answer TEXT, eligibility TEXT, confidence REAL, applicant TEXT, record TEXT NOT NULL)")
+    db.execute("INSERT INTO decisions (source_key, question, record) VALUES ('x:1', 'q', ?)",
+               (json.dumps({"question": "q", "session": "s9"}),))
+    db.commit()
+    db.close()
+
+    store = DecisionStore(path)
+    try:
+        assert [r["question"] for r in store.find(session="s9")] == ["q"]
+    finally:
+        store.close()
@@ -0,0 +1,52 @@
+import time
+
+import numpy as np
+
+from embed_cache import EmbeddingCache
+
+
+class FakeEmbedder:
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, convert_to_numpy=True):
+        self.calls.append(list(texts))
+        return np.array([[len(t), t.count(" ")] for t in texts], dtype="float64")
+
+
+def test_normalized_hits_and_one_batch_for_misses():
+    embedder = FakeEmbedder()
+    cache = EmbeddingCache(embedder, "fake")
+    vectors = cache.embed_many(["UK visa", "  uk   VISA ", "Canada visa"])
+
+    assert embedder.calls == [["canada visa", "uk visa"]]
+    assert vectors.dtype == np.float32 and np.array_equal(vectors[0], vectors[1])
+    cache.embed("Uk Visa")
+    assert cache.stats()["hits"] == 1 and len(embedder.calls) == 1
+
+
+def test_lru_eviction():
+    cache = EmbeddingCache(FakeEmbedder(), "fake", max_size=2)
+    cache.embed("a")
+    cache.embed("b")
+    cache.embed("a")
+    cache.embed("c")
+    assert list(cache._entries) == ["a", "c"]
+
+
+def test_background_save_and_reload(tmp_path):
+    path = str(tmp_path / "embed_cache.npz")
+    cache = EmbeddingCache(FakeEmbedder(), "fake", persist_path=path, autosave_every=2)
+    cache.embed_many(["uk visa", "schengen visa"])
+    for _ in range(100):
+        if not cache._saving and cache._unsaved == 0:
+            break
+        time.sleep(0.01)
+
+    embedder = FakeEmbedder()
+    warm = EmbeddingCache(embedder, "fake", persist_path=path)
+    warm.embed_many(["UK visa", "Schengen visa"])
+    assert embedder.calls == []
+
+    other_model = EmbeddingCache(FakeEmbedder(), "other", persist_path=path)
+    assert other_model.stats()["size"] == 0
@@ -1,13 +1,11 @@
 import streamlit as st
 import os
-import json
-import numpy as np
-import faiss
 import re
 import html
+import time
+import uuid
 from datetime import datetime
 from dotenv import load_dotenv
-from sentence_transformers import SentenceTransformer
 
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -26,21 +24,47 @@ load_dotenv(os.path.join(PROJECT_ROOT, ".env"))
 
 GROQ_KEY = os.getenv("GROQ_API_KEY")
 
-# ROOT = "."
-M1 = os.path.join(PROJECT_ROOT, "Aayush_milestone_1")
-INDEX_PATH = os.path.join(M1, "outputs", "visa_index.faiss")
-METADATA_PATH = os.path.join(M1, "outputs", "visa_metadata.json")
+# Embedder, caches, index and metadata are loaded once per process (resources.py)
+from resources import (get_query_cache, get_answer_cache, get_reranker, get_snapshot, memory_report,
+                       get_decision_log, get_decision_store, DECISION_LOG_DIR)
+from decision_log import now_iso, RETAIN_SECONDS, TIME_FORMAT
+from llm_client import chat, chat_stream
+from snapshots import search_chunks
+from partitions import detect_partitions
+from reranker import RERANK_CANDIDATES, RERANK_BUDGET_MS
+from context_packer import pack_context
 
+# Stream tokens into the assessment card as they arrive instead of waiting for the full answer
+STREAM_ANSWERS = True
+STREAM_REFRESH = 0.05  # seconds between card redraws while streaming
 
-embedder = SentenceTransformer("all-MiniLM-L6-v2", device="cpu")
+# Fuse BM25 keyword scores with the dense search (exact terms like "Stamp 4", "Guide 5256")
+HYBRID_SEARCH = True
 
-# ---------------- SESSION STATE ----------------
-if "history" not in st.session_state:
-    st.session_state.history = []
+# Search only the destination country's sub-index when it is chosen or named in the question
+ROUTE_BY_DESTINATION = True
+AUTO_DESTINATION = "Auto-detect"
+
+# Cascade: ANN top-N, then a cross-encoder keeps the best k within a time budget
+RERANK = True
+
+# Sidebar history: latest cases this session logged. HISTORY_AUDIT=1 lists every
+# session's cases instead - only for a deployment that is not open to applicants.
+HISTORY_LIMIT = 20
+HISTORY_AUDIT = os.getenv("HISTORY_AUDIT") == "1"
+HISTORY_REFRESH = 5.0   # seconds between decision log ingests, however often the page reruns
 
+query_cache = get_query_cache()
+answer_cache = get_answer_cache()
+
+# ---------------- SESSION STATE ----------------
 if "selected_case" not in st.session_state:
     st.session_state.selected_case = None
 
+if "session_id" not in st.session_state:
+    # Tags this session's log records so its history shows only its own cases
+    st.session_state.session_id = uuid.uuid4().hex
+
 if "current_page" not in st.session_state:
     st.session_state.current_page = "Home"
 
@@ -323,22 +347,59 @@ pre {
 
 # ---------------- FUNCTIONS ----------------
 def embed_text(text):
-    return embedder.encode([text])[0].astype("float32")
+    return query_cache.embed(text)
 
 def load_index():
-    idx = faiss.read_index(INDEX_PATH)
-    with open(METADATA_PATH, "r", encoding="utf-8") as f:
-        meta = json.load(f)
-    return idx, meta
-
-def retrieve(idx, meta, query, k=5):
-    qv = embed_text(query)
-    _, I = idx.search(np.array([qv]), k)
-    return [meta[i] for i in I[0] if 0 <= i < len(meta)]
-
-def ask_groq(q, chunks, applicant_name):
-    if not GROQ_KEY:
-        return """Eligibility: Partial
+    # One consistent snapshot per request, shared across sessions and
+    # hot-swapped when a new index generation is published
+    snap = get_snapshot()
+    return snap.index, snap.chunks, snap.bm25, snap.partitions, snap.generation
+
+def retrieve_many(idx, meta, queries, k=5, bm25=None, lexical_queries=None,
+                  partitions=None, routes=None, vectors=None):
+    # All queries encoded in one batch (unless already embedded), one FAISS search over
+    # the query matrix; with a BM25 index, keyword scores (of lexical_queries, default:
+    # queries) are fused in, and routes[i] limits query i to those country partitions
+    lexical = (lexical_queries or queries) if HYBRID_SEARCH and bm25 is not None else None
+    if vectors is None:
+        vectors = query_cache.embed_many(queries)
+    return search_chunks(idx, meta, vectors, k, bm25, lexical,
+                         partitions=partitions, routes=routes)
+
+def retrieve(idx, meta, query, k=5, bm25=None, lexical_query=None, partitions=None, route=None,
+             vector=None):
+    return retrieve_many(idx, meta, [query], k, bm25, [lexical_query or query],
+                         partitions, [route] if route else None,
+                         None if vector is None else vector.reshape(1, -1))[0]
+
+def retrieve_cascade(idx, meta, query, k=5, bm25=None, lexical_query=None, partitions=None,
+                     route=None, rerank_query=None):
+    # ANN recall of RERANK_CANDIDATES, cross-encoder rerank down to k; returns (chunks, timings)
+    t = time.perf_counter()
+    vector = embed_text(query)
+    embed_ms = (time.perf_counter() - t) * 1000
+
+    # ann_ms is the search alone: the vector is handed over, not looked up again
+    t = time.perf_counter()
+    candidates = retrieve(idx, meta, query, RERANK_CANDIDATES if RERANK else k, bm25,
+                          lexical_query, partitions, route, vector)
+    ann_ms = (time.perf_counter() - t) * 1000
+
+    chunks, stats = get_reranker().rerank(rerank_query or query, candidates, k,
+                                          RERANK_BUDGET_MS if RERANK else 0)
+    timings = {"embed_ms": round(embed_ms, 2), "ann_ms": round(ann_ms, 2)}
+    timings.update(stats)
+    return chunks, timings
+
+def route_for(destination, question, partitions):
+    """Partition keys to search: the chosen destination, else countries named in the question."""
+    if not ROUTE_BY_DESTINATION or not partitions:
+        return None
+    if destination != AUTO_DESTINATION:
+        return [key for key, part in partitions.items() if part.label == destination] or None
+    return detect_partitions(question, partitions) or None
+
+OFFLINE_ANSWER = """Eligibility: Partial
 Final Answer: Missing or unclear information.
 Explanation:
 - Financial proof insufficient
@@ -346,12 +407,11 @@ Explanation:
 - Travel purpose unclear
 Confidence: 0.45"""
 
-    from groq import Groq
-    client = Groq(api_key=GROQ_KEY)
+def build_prompt(q, chunks, applicant_name):
+    # Overlapping neighbour chunks merged, total kept within the token budget
+    ctx, _ = pack_context(chunks, labels=False)
 
-    ctx = "\n\n".join(c["text"] for c in chunks)
-
-    prompt = f"""
+    return f"""
 Applicant: {applicant_name}
 
 Answer ONLY using the context provided.
@@ -371,17 +431,124 @@ Explanation:
 Confidence: (0 to 1)
 """
 
-    res = client.chat.completions.create(
-        model="llama-3.1-8b-instant",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0
-    )
-    return res.choices[0].message.content.strip()
+def ask_groq(q, chunks, applicant_name):
+    if not GROQ_KEY:
+        return OFFLINE_ANSWER
+
+    # Shared kept-alive client with per-call deadline and jittered retries
+    return chat(build_prompt(q, chunks, applicant_name), temperature=0).strip()
+
+def ask_groq_streaming(q, chunks, applicant_name, on_update):
+    """Like ask_groq, but calls on_update(text_so_far, done) as tokens arrive.
+
+    Redraws happen at most every STREAM_REFRESH seconds and whenever a line
+    completes, plus once with done=True when the stream ends.
+    """
+    if not GROQ_KEY:
+        return OFFLINE_ANSWER
+
+    pieces = []
+    last_render = 0.0
+    for piece in chat_stream(build_prompt(q, chunks, applicant_name), temperature=0):
+        pieces.append(piece)
+        now = time.monotonic()
+        if now - last_render >= STREAM_REFRESH or "\n" in piece:
+            last_render = now
+            on_update("".join(pieces), False)
+    text = "".join(pieces)
+    on_update(text, True)
+    return text.strip()
+
+def cached_ask_groq(q, chunks, applicant_name, generation, question, profile, on_update=None):
+    """Answer the prompt built from `q`, reusing a cached answer for the same case.
+
+    `profile` holds the structured form fields: they must match exactly, so
+    only the free-text `question` is compared on embedding similarity.
+    """
+    # Keyed on the generation too: chunk ids only mean something within one index build
+    qvec = embed_text(question)
+    chunk_ids = [c["chunk_id"] for c in chunks]
+
+    answer = answer_cache.lookup(question, qvec, chunk_ids, profile, generation)
+    if answer is None:
+        if on_update is not None:
+            answer = ask_groq_streaming(q, chunks, applicant_name, on_update)
+        else:
+            answer = ask_groq(q, chunks, applicant_name)
+        if GROQ_KEY:
+            # Don't cache the offline placeholder answer
+            answer_cache.store(question, qvec, chunk_ids, answer, profile, generation)
+    return answer
 
 def extract_conf(text):
     m = re.search(r"Confidence:\s*([0-9]*\.?[0-9]+)", text)
     return float(m.group(1)) if m else 0.0
 
+def format_answer_html(answer, complete=True):
+    """Render the model answer as the assessment card body.
+
+    While streaming (complete=False) the last line may still be growing: finished
+    lines get their normal styling (Eligibility appears as soon as its line ends)
+    and the partial line is shown as plain text after them.
+    """
+    answer_lines = answer.split('\n')
+    partial = ""
+    if not complete:
+        partial = answer_lines.pop()
+
+    formatted_answer = '<div style="background: #ffffff; padding: 20px; border-radius: 10px; margin: 15px 0; border: 1px solid #e5e7eb;">'
+
+    for line in answer_lines:
+        line = line.strip()
+        if line.startswith('Eligibility:'):
+            formatted_answer += f'<p style="color: #1e40af; font-weight: 700; font-size: 17px; margin: 10px 0;">{html.escape(line)}</p>'
+        elif line.startswith('Final Answer:'):
+            formatted_answer += f'<p style="color: #0f172a; font-weight: 600; margin: 15px 0 8px 0; font-size: 15px;">{html.escape(line)}</p>'
+        elif line.startswith('Explanation:'):
+            formatted_answer += f'<p style="color: #0f172a; font-weight: 600; margin: 15px 0 8px 0; font-size: 15px;">{html.escape(line)}</p>'
+        elif line.startswith('Confidence:'):
+            # Skip this as we show it separately
+            continue
+        elif line.startswith('-'):
+            formatted_answer += f'<p style="color: #334155; margin: 6px 0 6px 20px; line-height: 1.6;">{html.escape(line)}</p>'
+        elif line:
+            formatted_answer += f'<p style="color: #334155; margin: 6px 0; line-height: 1.6;">{html.escape(line)}</p>'
+
+    if partial.strip() and not partial.strip().startswith('Confidence:'):
+        formatted_answer += f'<p style="color: #64748b; margin: 6px 0; line-height: 1.6;">{html.escape(partial.strip())}▌</p>'
+
+    formatted_answer += '</div>'
+    return formatted_answer
+
+def case_from_row(row):
+    """A decision store row as the case dict the results view renders."""
+    record = row["record"]
+    snap = get_snapshot()
+    # Chunk ids are only meaningful in the index generation that produced them
+    same_index = record.get("index_generation") == snap.generation
+    return {
+        "name": record.get("applicant") or "Anonymous",
+        "time": (row["time"] or "")[5:16].replace("T", " "),
+        "answer": row["answer"],
+        "confidence": row["confidence"] if row["confidence"] is not None else 0.0,
+        "chunks": [snap.chunks[i] for i in record.get("chunk_ids", [])] if same_index else [],
+        "timings": record.get("timings")
+    }
+
+def conf_bar_html(confidence):
+    if confidence is None:
+        # Not parsed yet: empty bar
+        return """
+        <div class="conf-bar"><div class="conf-fill" style="width:0%"></div></div>
+        <p style='color: #64748b; font-size: 14px; margin-top: 8px;'>Calculating confidence...</p>
+        """
+    return f"""
+        <div class="conf-bar">
+            <div class="conf-fill" style="width:{confidence*100}%"></div>
+        </div>
+        <p style='color: #000080; font-size: 14px; margin-top: 8px;'>{confidence*100:.1f}% Confidence</p>
+        """
+
 # ---------------- NAVIGATION ----------------
 col1, col2, col3, col4 = st.columns([3, 1, 1, 1])
 
@@ -407,14 +574,40 @@ with st.sidebar:
     st.markdown("📋 Application History")
     st.markdown("---")
 
-    if not st.session_state.history:
+    # Pick up whatever the log writer has flushed (at most every HISTORY_REFRESH seconds,
+    # shared by all sessions), then an indexed lookup
+    decision_store = get_decision_store()
+    if decision_store.ingest_log(DECISION_LOG_DIR, min_interval=HISTORY_REFRESH):
+        # Same retention as the log segments
+        decision_store.purge(time.strftime(TIME_FORMAT, time.localtime(time.time() - RETAIN_SECONDS)))
+
+    destination_keys = {p.label: key for key, p in get_snapshot().partitions.items()}
+    with st.expander("🔎 Filter"):
+        hist_eligibility = st.selectbox("Eligibility", ["All", "Yes", "No", "Partial"], key="hist_eligibility")
+        hist_destination = st.selectbox("Destination", ["All"] + sorted(destination_keys), key="hist_destination")
+
+    history = decision_store.find(limit=HISTORY_LIMIT,
+                                  eligibility=None if hist_eligibility == "All" else hist_eligibility,
+                                  destination=destination_keys.get(hist_destination),
+                                  session=None if HISTORY_AUDIT else st.session_state.session_id)
+    if not history:
         st.markdown("<div class='small'>No cases yet</div>", unsafe_allow_html=True)
 
-    for i, case in enumerate(reversed(st.session_state.history)):
-        if st.button(f"👤 {case['name']} • {case['time']}", key=f"hist_{i}"):
+    for row in history:
+        case = case_from_row(row)
+        if st.button(f"👤 {case['name']} • {case['time']}", key=f"hist_{row['id']}"):
             st.session_state.selected_case = case
             st.session_state.current_page = "Home"
 
+    st.markdown("---")
+    with st.expander("⚙️ Shared Resources"):
+        for name, size in memory_report().items():
+            value = f"{size / 1e6:.1f} MB" if size is not None else "n/a"
+            st.markdown(f"<div class='small'>{name}: {value}</div>", unsafe_allow_html=True)
+        stats = query_cache.stats()
+        st.markdown(f"<div class='small'>embedding cache hit rate: {stats['hit_rate'] * 100:.0f}%</div>",
+                    unsafe_allow_html=True)
+
 # ============================================
 # HOME PAGE
 # ============================================
@@ -437,6 +630,10 @@ if st.session_state.current_page == "Home":
             # st.markdown('<div class="section">', unsafe_allow_html=True)
             st.markdown('<div class="section-title">✈️ Trip Info</div>', unsafe_allow_html=True)
             purpose = st.selectbox("Purpose of Travel", ["Tourism", "Study", "Work", "Business" , "other"])
+            destination = st.selectbox(
+                "Destination",
+                [AUTO_DESTINATION] + sorted(p.label for p in get_snapshot().partitions.values())
+            )
             visa_rejection = st.radio("Previous Visa Rejection?", ["No", "Yes" , "First time "])
             st.markdown('</div>', unsafe_allow_html=True)
 
@@ -449,34 +646,89 @@ if st.session_state.current_page == "Home":
 
     # ---------------- PROCESS ----------------
     if submit:
-        idx, meta = load_index()
+        idx, meta, bm25, partitions, generation = load_index()
 
         enriched_query = f"""
         Name: {applicant_name}
         Age: {age}
         Nationality: {nationality}
         Purpose: {purpose}
+        Destination: {destination if destination != AUTO_DESTINATION else "Not specified"}
         Previous Rejection: {visa_rejection}
 
         Question:
         {question}
         """
 
-        chunks = retrieve(idx, meta, enriched_query)
-        answer = ask_groq(enriched_query, chunks, applicant_name)
+        # The search text leaves out name, age, nationality and rejection history: it is the
+        # key of the persisted query-embedding cache, and the policy text is found by
+        # purpose, destination and question anyway (the prompt still gets every field)
+        retrieval_query = f"""
+        Purpose: {purpose}
+        Destination: {destination if destination != AUTO_DESTINATION else "Not specified"}
+
+        Question:
+        {question}
+        """
+
+        # Form labels ("Purpose:" ...) would only add noise to keyword matching;
+        # nationality is where the applicant is from, not where they are going
+        route = route_for(destination, question, partitions)
+        chunks, timings = retrieve_cascade(idx, meta, retrieval_query, bm25=bm25,
+                                           lexical_query=f"{purpose} {question}", partitions=partitions,
+                                           route=route, rerank_query=f"{purpose} visa: {question}")
+
+        on_update = None
+        live = st.empty()
+        if STREAM_ANSWERS:
+            def on_update(text, done):
+                # Completed lines go into the card as they arrive; the bar fills once a
+                # full "Confidence: x" line has been parsed - or the stream ended on it
+                conf_line = re.search(r"Confidence:\s*([0-9]*\.?[0-9]+)" + ("" if done else r"\s*\n"), text)
+                with live.container():
+                    st.markdown(f"📊 Assessment Results for {applicant_name}")
+                    st.markdown(format_answer_html(text, complete=done), unsafe_allow_html=True)
+                    st.markdown("Confidence Score")
+                    st.markdown(conf_bar_html(float(conf_line.group(1)) if conf_line else None),
+                                unsafe_allow_html=True)
+
+        t = time.perf_counter()
+        profile = {"name": applicant_name, "age": age, "nationality": nationality, "purpose": purpose,
+                   "destination": destination, "previous_rejection": visa_rejection}
+        answer = cached_ask_groq(enriched_query, chunks, applicant_name, generation, question, profile, on_update)
+        timings["llm_ms"] = round((time.perf_counter() - t) * 1000, 2)
         conf = extract_conf(answer)
+        # The finished case is rendered below like any history item
+        live.empty()
 
         case = {
             "name": applicant_name,
             "time": datetime.now().strftime("%H:%M"),
             "answer": answer,
             "confidence": conf,
-            "chunks": chunks
+            "chunks": chunks,
+            "timings": timings
         }
 
-        st.session_state.history.append(case)
         st.session_state.selected_case = case
 
+        # Queued for the background writer; shows up in the sidebar at the next ingest
+        # Age, nationality and rejection history stay out of the log: audits need the
+        # outcome and its sources, and the sidebar only the name
+        get_decision_log().append({
+            "time": now_iso(),
+            "session": st.session_state.session_id,
+            "applicant": applicant_name,
+            "purpose": purpose,
+            "question": question,
+            "model_answer": answer,
+            "confidence": conf,
+            "destinations": route or [],
+            "chunk_ids": [c["chunk_id"] for c in chunks],
+            "index_generation": generation,
+            "timings": timings
+        })
+
     # ---------------- DISPLAY SELECTED CASE ----------------
     if st.session_state.selected_case:
         case = st.session_state.selected_case
@@ -485,40 +737,22 @@ if st.session_state.current_page == "Home":
         st.markdown(f"📊 Assessment Results for {case['name']}")
 
         # Parse and format the answer
-        answer_lines = case['answer'].split('\n')
-        formatted_answer = '<div style="background: #ffffff; padding: 20px; border-radius: 10px; margin: 15px 0; border: 1px solid #e5e7eb;">'
-        
-        for line in answer_lines:
-            line = line.strip()
-            if line.startswith('Eligibility:'):
-                formatted_answer += f'<p style="color: #1e40af; font-weight: 700; font-size: 17px; margin: 10px 0;">{html.escape(line)}</p>'
-            elif line.startswith('Final Answer:'):
-                formatted_answer += f'<p style="color: #0f172a; font-weight: 600; margin: 15px 0 8px 0; font-size: 15px;">{html.escape(line)}</p>'
-            elif line.startswith('Explanation:'):
-                formatted_answer += f'<p style="color: #0f172a; font-weight: 600; margin: 15px 0 8px 0; font-size: 15px;">{html.escape(line)}</p>'
-            elif line.startswith('Confidence:'):
-                # Skip this as we show it separately
-                
-                continue
-            elif line.startswith('-'):
-                formatted_answer += f'<p style="color: #334155; margin: 6px 0 6px 20px; line-height: 1.6;">{html.escape(line)}</p>'
-            elif line:
-                formatted_answer += f'<p style="color: #334155; margin: 6px 0; line-height: 1.6;">{html.escape(line)}</p>'
-        
-        formatted_answer += '</div>'
-        st.markdown(formatted_answer, unsafe_allow_html=True)
+        st.markdown(format_answer_html(case['answer']), unsafe_allow_html=True)
 
         st.markdown("Confidence Score")
-        st.markdown(f"""
-        <div class="conf-bar">
-            <div class="conf-fill" style="width:{case['confidence']*100}%"></div>
-        </div>
-        <p style='color: #000080; font-size: 14px; margin-top: 8px;'>{case['confidence']*100:.1f}% Confidence</p>
-        """, unsafe_allow_html=True)
+        st.markdown(conf_bar_html(case['confidence']), unsafe_allow_html=True)
 
         st.markdown('</div>', unsafe_allow_html=True)
 
         with st.expander("📄 View Retrieved Policy Documents"):
+            t = case.get("timings")
+            if t:
+                st.caption(f"Embed {t['embed_ms']:.0f} ms · ANN top-{t['candidates']} {t['ann_ms']:.0f} ms · "
+                           f"rerank {t['scored']}/{t['candidates']} in {t['rerank_ms']:.0f} ms"
+                           + (" (budget hit)" if t["budget_hit"] else "")
+                           + f" · LLM {t['llm_ms']:.0f} ms")
+            if not case["chunks"]:
+                st.caption("Documents are only shown for cases answered with the current index.")
             st.markdown('<div style="background: #ffffff; padding: 15px; border-radius: 8px;">', unsafe_allow_html=True)
             for i, c in enumerate(case["chunks"], 1):
                 st.markdown(f'<p style="color: #1e40af; font-weight: 600; margin: 10px 0;">Document {i}:</p>', unsafe_allow_html=True)
@@ -0,0 +1,135 @@
+import os
+import sys
+import faiss
+import streamlit as st
+from sentence_transformers import SentenceTransformer
+
+# Process-wide resources for the Streamlit app.
+# st.cache_resource keeps one instance per server process, shared by every session
+# and every rerun, instead of rebuilding the model / re-reading the index per click.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, ".."))
+
+M1 = os.path.join(PROJECT_ROOT, "Aayush_milestone_1")
+M2 = os.path.join(PROJECT_ROOT, "Aayush_milestone_2")
+OUTPUT_DIR = os.path.join(M1, "outputs")
+EMBED_CACHE_PATH = os.path.join(BASE_DIR, "query_embedding_cache.npz")
+ANSWER_CACHE_PATH = os.path.join(BASE_DIR, "answer_cache.json")
+DECISION_LOG_DIR = os.path.join(BASE_DIR, "decision_log")
+DECISION_DB_PATH = os.path.join(BASE_DIR, "decision_history.db")
+
+EMBED_MODEL = "all-MiniLM-L6-v2"
+
+sys.path.append(M1)
+sys.path.append(M2)
+from chunk_store import ChunkStore
+from snapshots import LiveIndex, STORE_FILE
+from embed_cache import EmbeddingCache
+from answer_cache import AnswerCache
+from reranker import Reranker
+from decision_log import DecisionLog
+from decision_store import DecisionStore
+
+
+# -- MODEL + CACHES (loaded once per process) --
+@st.cache_resource(show_spinner="Loading embedding model...")
+def get_embedder():
+    return SentenceTransformer(EMBED_MODEL, device="cpu")
+
+
+@st.cache_resource
+def get_query_cache():
+    return EmbeddingCache(get_embedder(), EMBED_MODEL, persist_path=EMBED_CACHE_PATH)
+
+
+@st.cache_resource
+def get_answer_cache():
+    return AnswerCache(persist_path=ANSWER_CACHE_PATH)
+
+
+@st.cache_resource(show_spinner="Loading reranker...")
+def get_reranker():
+    reranker = Reranker()
+    reranker.model  # load now rather than inside the first request's time budget
+    return reranker
+
+
+# -- DECISION HISTORY --
+@st.cache_resource
+def get_decision_log():
+    # One background writer per process; every session appends to it
+    return DecisionLog(DECISION_LOG_DIR)
+
+
+@st.cache_resource
+def get_decision_store():
+    return DecisionStore(DECISION_DB_PATH)
+
+
+# -- INDEX + METADATA --
+@st.cache_resource(show_spinner="Loading visa index...")
+def get_live_index():
+    # Swaps to a newly published snapshot by itself; sessions mid-request keep theirs
+    return LiveIndex(OUTPUT_DIR)
+
+
+def get_snapshot():
+    return get_live_index().current()
+
+
+# -- MEMORY REPORT --
+_index_bytes = {}   # generation -> serialized index size
+
+
+def _process_rss():
+    """(label, bytes): current RSS with psutil, else the peak RSS the OS reports."""
+    try:
+        import psutil
+        return "process RSS", psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        import resource
+        # ru_maxrss is the peak RSS, in KB on Linux
+        return "process peak RSS", resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except ImportError:
+        return "process RSS", None
+
+
+def _index_size(snap):
+    # Serialized size = codes + codebooks / PCA matrix / graph, whatever the compression;
+    # computed once per generation since it copies the index
+    if snap.generation not in _index_bytes:
+        _index_bytes[snap.generation] = int(faiss.serialize_index(snap.index).nbytes)
+    return _index_bytes[snap.generation]
+
+
+def memory_report():
+    """Approximate bytes held by each shared resource, plus the process total."""
+    embedder = get_embedder()
+    snap = get_snapshot()
+    meta = snap.chunks
+
+    model_bytes = sum(p.numel() * p.element_size() for p in embedder.parameters())
+    index_bytes = _index_size(snap)
+    if isinstance(meta, ChunkStore):
+        meta_bytes = os.path.getsize(os.path.join(snap.path, STORE_FILE))   # mmap'd, shared via the page cache
+    else:
+        meta_bytes = sum(len(m["text"]) for m in meta)
+
+    cross_encoder = get_reranker().model
+    rerank_bytes = sum(p.numel() * p.element_size() for p in cross_encoder.model.parameters()) if cross_encoder else 0
+
+    query_cache = get_query_cache()
+    cache_bytes = query_cache.stats()["size"] * embedder.get_sentence_embedding_dimension() * 4
+
+    rss_label, rss = _process_rss()
+    return {
+        "embedding model": model_bytes,
+        "reranker model": rerank_bytes,
+        "faiss index": index_bytes,
+        "chunk metadata": meta_bytes,
+        "query embedding cache": cache_bytes,
+        rss_label: rss
+    }